@@ -1,9 +1,10 @@
 from django.contrib import admin
 from .models import (
-    UserProfile, LearningTopic, Course, Module, Lesson, 
+    UserProfile, FirebaseIdentity, LearningTopic, Course, Module, Lesson, 
     UserProgress, Badge, UserBadge,
     # Import new Quiz models
-    Quiz, Question, Choice, QuizAttempt, Answer 
+    Quiz, Question, Choice, QuizAttempt, Answer,
+    MediaSummaryJob, MediaSummaryCache, ChatSession, ChatMessage, XPEvent,
 )
 
 # Register your models here.
@@ -11,6 +12,19 @@ from .models import (
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
     list_display = ('user', 'level', 'xp')
+    readonly_fields = ('level', 'xp')  # folded from the XP ledger
+
+@admin.register(XPEvent)
+class XPEventAdmin(admin.ModelAdmin):
+    list_display = ('user_profile', 'source_type', 'source_id', 'amount', 'created_at')
+    list_filter = ('source_type',)
+    search_fields = ('user_profile__user__username',)
+
+@admin.register(FirebaseIdentity)
+class FirebaseIdentityAdmin(admin.ModelAdmin):
+    list_display = ('uid', 'user', 'created_at')
+    search_fields = ('uid', 'user__email')
+    readonly_fields = ('created_at',)
 
 @admin.register(LearningTopic)
 class LearningTopicAdmin(admin.ModelAdmin):
@@ -73,7 +87,8 @@ class UserProgressAdmin(admin.ModelAdmin):
 
 @admin.register(Badge)
 class BadgeAdmin(admin.ModelAdmin):
-    list_display = ('name', 'description', 'icon_emoji')
+    list_display = ('name', 'description', 'icon_emoji', 'rule', 'threshold', 'topic')
+    list_filter = ('rule',)
 
 @admin.register(UserBadge)
 class UserBadgeAdmin(admin.ModelAdmin):
@@ -118,4 +133,30 @@ admin.site.register(Quiz, QuizAdmin)
 admin.site.register(Question, QuestionAdmin)
 # Choice is managed via QuestionAdmin inline
 admin.site.register(QuizAttempt, QuizAttemptAdmin)
-# Answer is managed via QuizAttemptAdmin inline 
\ No newline at end of file
+# Answer is managed via QuizAttemptAdmin inline
+
+# --- AI Tool Jobs ---
+
+@admin.register(MediaSummaryJob)
+class MediaSummaryJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user_profile', 'file_name', 'model_name', 'status', 'created_at', 'finished_at')
+    list_filter = ('status', 'model_name')
+    readonly_fields = ('created_at', 'updated_at', 'finished_at')
+
+@admin.register(MediaSummaryCache)
+class MediaSummaryCacheAdmin(admin.ModelAdmin):
+    list_display = ('content_hash', 'model_name', 'hit_count', 'created_at', 'last_used_at')
+    list_filter = ('model_name',)
+
+# --- Chatbot ---
+
+class ChatMessageInline(admin.TabularInline):
+    model = ChatMessage
+    extra = 0
+    readonly_fields = ('role', 'text', 'token_estimate', 'created_at')
+
+@admin.register(ChatSession)
+class ChatSessionAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user_profile', 'title', 'created_at', 'updated_at')
+    readonly_fields = ('summary', 'summarized_until', 'created_at', 'updated_at')
+    inlines = [ChatMessageInline]
@@ -0,0 +1,247 @@
+"""
+Admission control for the Gemini-backed endpoints.
+
+A Gemini call must hold a per-user slot and a global slot for as long as it
+runs, including an SSE stream. Views take them with admitted() /
+aadmitted() around the upstream call only, so response-cache and dedup hits,
+validation errors and job-mode 202s never wait for a slot. Background
+summary jobs take the job owner's slots too (summary_jobs.py).
+
+Slots are keys in the shared 'coordination' cache, claimed with cache.add(),
+which is atomic on every backend. That way the limits hold across all
+gunicorn workers:
+
+- AI_MAX_CONCURRENT_PER_USER: a user already at the limit is rejected at
+  once, so one client cannot fill the queue.
+- AI_MAX_CONCURRENT_CALLS: when every global slot is taken, the request waits
+  for up to AI_ADMISSION_QUEUE_TIMEOUT seconds in a queue of
+  AI_ADMISSION_QUEUE_SIZE places (slots as well). If no place is free, or the
+  wait times out, it is rejected.
+
+Rejections are 429 with Retry-After, so nothing piles up in the accept
+backlog. Slots are leases (AI_ADMISSION_LEASE): a crashed worker's slots
+expire on their own.
+"""
+import asyncio
+import logging
+import math
+import random
+import time
+import uuid
+from contextlib import asynccontextmanager, contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import JsonResponse
+
+logger = logging.getLogger(__name__)
+
+CACHE_ALIAS = 'coordination'
+POLL_INTERVAL = 0.1  # seconds between attempts while queued (jittered)
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _backend():
+    return caches[CACHE_ALIAS]
+
+
+def _limits():
+    return {
+        'global': getattr(settings, 'AI_MAX_CONCURRENT_CALLS', 2),
+        'user': getattr(settings, 'AI_MAX_CONCURRENT_PER_USER', 1),
+        'queue': getattr(settings, 'AI_ADMISSION_QUEUE_SIZE', 1),
+        'queue_timeout': getattr(settings, 'AI_ADMISSION_QUEUE_TIMEOUT', 10),
+        'lease': getattr(settings, 'AI_ADMISSION_LEASE', 2400),
+    }
+
+
+def _slot_keys(scope, count):
+    # Random order spreads concurrent claimers over the slots
+    keys = [f"admission:{scope}:{i}" for i in range(count)]
+    random.shuffle(keys)
+    return keys
+
+
+def _poll_delay():
+    return POLL_INTERVAL * random.uniform(0.5, 1.5)
+
+
+def _rejected(message, limits):
+    return AdmissionRejected(message, retry_after=max(1, math.ceil(limits['queue_timeout'])))
+
+
+class Lease:
+    """ The slots held by one request. release() is idempotent. """
+
+    def __init__(self, token=None):
+        self.token = token or uuid.uuid4().hex
+        self.keys = []
+
+    def claim(self, scope, count, timeout):
+        backend = _backend()
+        for key in _slot_keys(scope, count):
+            if backend.add(key, self.token, timeout):
+                self.keys.append(key)
+                return True
+        return False
+
+    async def aclaim(self, scope, count, timeout):
+        backend = _backend()
+        for key in _slot_keys(scope, count):
+            if await backend.aadd(key, self.token, timeout):
+                self.keys.append(key)
+                return True
+        return False
+
+    def release(self):
+        backend = _backend()
+        while self.keys:
+            key = self.keys.pop()
+            # Only free the slot if our lease on it has not expired and been re-claimed
+            if backend.get(key) == self.token:
+                backend.delete(key)
+
+    async def arelease(self):
+        backend = _backend()
+        while self.keys:
+            key = self.keys.pop()
+            if await backend.aget(key) == self.token:
+                await backend.adelete(key)
+
+
+def acquire(user_id):
+    """ Claims a per-user and a global slot, queueing for the latter. Raises AdmissionRejected. """
+    limits = _limits()
+    lease = Lease()
+    if not lease.claim(f"user:{user_id}", limits['user'], limits['lease']):
+        raise _rejected("Too many AI requests in progress for this user.", limits)
+    try:
+        if lease.claim('global', limits['global'], limits['lease']):
+            return lease
+        queue_place = Lease(lease.token)
+        if not queue_place.claim('queue', limits['queue'], math.ceil(limits['queue_timeout']) + 5):
+            raise _rejected("AI service is busy, please retry shortly.", limits)
+        try:
+            deadline = time.monotonic() + limits['queue_timeout']
+            while time.monotonic() < deadline:
+                time.sleep(_poll_delay())
+                if lease.claim('global', limits['global'], limits['lease']):
+                    return lease
+        finally:
+            queue_place.release()
+        raise _rejected("AI service is busy, please retry shortly.", limits)
+    except BaseException:
+        lease.release()
+        raise
+
+
+async def aacquire(user_id):
+    """ Async acquire(): waits in the queue without blocking the event loop. """
+    limits = _limits()
+    lease = Lease()
+    if not await lease.aclaim(f"user:{user_id}", limits['user'], limits['lease']):
+        raise _rejected("Too many AI requests in progress for this user.", limits)
+    try:
+        if await lease.aclaim('global', limits['global'], limits['lease']):
+            return lease
+        queue_place = Lease(lease.token)
+        if not await queue_place.aclaim('queue', limits['queue'], math.ceil(limits['queue_timeout']) + 5):
+            raise _rejected("AI service is busy, please retry shortly.", limits)
+        try:
+            deadline = time.monotonic() + limits['queue_timeout']
+            while time.monotonic() < deadline:
+                await asyncio.sleep(_poll_delay())
+                if await lease.aclaim('global', limits['global'], limits['lease']):
+                    return lease
+        finally:
+            await queue_place.arelease()
+        raise _rejected("AI service is busy, please retry shortly.", limits)
+    except BaseException:
+        await lease.arelease()
+        raise
+
+
+# --- Holding slots around upstream calls ---
+
+def admit(user_id):
+    """ acquire(), or an empty Lease when admission control is disabled. Raises AdmissionRejected. """
+    if not getattr(settings, 'AI_ADMISSION_ENABLED', True):
+        return Lease()
+    try:
+        return acquire(user_id)
+    except AdmissionRejected as e:
+        logger.info(f"Admission rejected for user {user_id}: {e}")
+        raise
+
+
+async def aadmit(user_id):
+    """ Async admit(). """
+    if not getattr(settings, 'AI_ADMISSION_ENABLED', True):
+        return Lease()
+    try:
+        return await aacquire(user_id)
+    except AdmissionRejected as e:
+        logger.info(f"Admission rejected for user {user_id}: {e}")
+        raise
+
+
+@contextmanager
+def admitted(user_id):
+    """ Holds the user's slots for the block. Wrap only the Gemini calls, not cache hits or validation. """
+    lease = admit(user_id)
+    try:
+        yield lease
+    finally:
+        lease.release()
+
+
+@asynccontextmanager
+async def aadmitted(user_id):
+    """ Async admitted(). """
+    lease = await aadmit(user_id)
+    try:
+        yield lease
+    finally:
+        await lease.arelease()
+
+
+def rejection_response(error):
+    """ 429 with Retry-After for an AdmissionRejected (same shape as DRF's Throttled). """
+    return JsonResponse({'detail': str(error)}, status=429, headers={'Retry-After': str(error.retry_after)})
+
+
+# --- Releasing after streamed responses ---
+
+def _release_after(events, lease):
+    try:
+        yield from events
+    finally:
+        lease.release()
+
+
+async def _arelease_after(events, lease):
+    try:
+        async for event in events:
+            yield event
+    finally:
+        await lease.arelease()
+
+
+def hand_over(response, lease):
+    """
+    Moves the lease's slots to a streaming response: they are released when
+    the stream finishes (or the client goes away) instead of when the
+    admitted() block exits.
+    """
+    held = Lease(lease.token)
+    held.keys, lease.keys = lease.keys, []
+    if response.is_async:
+        response.streaming_content = _arelease_after(response.streaming_content, held)
+    else:
+        response.streaming_content = _release_after(response.streaming_content, held)
+    return response
@@ -40,3 +40,11 @@ class ApiConfig(AppConfig):
         else:
             print("Firebase Admin SDK already initialized.")
         print("--- Firebase Admin SDK Initialization Check Complete ---\n")
+
+        # Connect the catalog/quiz answer-key invalidation and leaderboard bucket signals
+        from . import catalog_cache, leaderboard, quiz_grading  # noqa: F401
+
+        # Serializer time for the request metrics (Server-Timing)
+        from .request_metrics import instrument_serializers
+        instrument_serializers()
+
@@ -0,0 +1,334 @@
+"""
+Async (ASGI) versions of the Gemini-backed endpoints.
+
+Under an ASGI server (see Procfile: gunicorn with the uvicorn worker class)
+these views await the Gemini calls instead of blocking a worker, so many
+in-flight generations share one event loop while the DRF course, quiz and
+profile views keep running on Django's sync thread. They are wired into
+api/urls.py when settings.ASYNC_AI_VIEWS is True and return the same
+payloads as their counterparts in views.py.
+"""
+import functools
+import json
+import traceback
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.urls import reverse
+from django.utils import timezone
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions
+
+from . import admission, chat_sessions, llm, prompts, singleflight, summarization, summary_cache
+from .chat_streaming import astream_chat_reply, sse_response
+from .firebase_auth import FirebaseAuthentication
+from .models import MediaSummaryJob
+from .response_cache import case_study_cache
+from .singleflight import assignment_flight, case_study_flight
+from .serializers import MediaSummaryJobSerializer
+from .summary_jobs import enqueue_summary_job
+from .views import is_truthy
+
+
+def firebase_async_view(view):
+    """
+    Minimal async stand-in for @api_view(['POST']) + FirebaseAuthentication +
+    IsAuthenticated. DRF views are sync-only, so authentication is run in a
+    thread and the response shape mirrors DRF's error payloads.
+    """
+    authenticator = FirebaseAuthentication()
+
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method != 'POST':
+            return JsonResponse({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+        try:
+            result = await sync_to_async(authenticator.authenticate)(request)
+        except exceptions.AuthenticationFailed as e:
+            result, error = None, str(e.detail)
+        else:
+            error = 'Authentication credentials were not provided.'
+        if result is None:
+            return JsonResponse(
+                {'detail': error}, status=401,
+                headers={'WWW-Authenticate': authenticator.authenticate_header(request)},
+            )
+        request.user = result[0]
+        return await view(request, *args, **kwargs)
+
+    return csrf_exempt(wrapper)
+
+
+def _parse_body(request):
+    """ (data, files) for JSON or form/multipart requests (like DRF's request.data and request.FILES). """
+    if request.content_type == 'application/json':
+        try:
+            return json.loads(request.body or b'{}'), {}
+        except ValueError:
+            return {}, {}
+    return request.POST, request.FILES
+
+
+async def _request_data(request):
+    """ _parse_body() in a thread: multipart parsing reads the body and spools large uploads to disk. """
+    return await sync_to_async(_parse_body, thread_sensitive=False)(request)
+
+
+def _upload_media(file_obj):
+    """ Reads the upload (path or bytes) and sends it to Google AI; blocking, so run it off the event loop. """
+    return summarization.upload_media(summarization.file_content(file_obj), file_obj.name)
+
+
+def _configure_genai():
+    try:
+        llm.configure()
+    except llm.LLMConfigurationError as e:
+        return JsonResponse({"error": str(e)}, status=500)
+    return None
+
+
+# --- Video/Audio Summarization View ---
+
+@firebase_async_view
+async def summarize_media(request):
+    """ Async version of views.summarize_media. """
+    error_response = _configure_genai()
+    if error_response:
+        return error_response
+
+    data, files = await _request_data(request)
+    file_obj = files.get('file')
+    if not file_obj:
+        return JsonResponse({"error": "No file provided. Please upload a file named 'file'."}, status=400)
+
+    user_prompt = data.get('prompt', '')
+    model_name = data.get('model_name', prompts.DEFAULT_SUMMARY_MODEL)
+    if model_name not in prompts.AVAILABLE_SUMMARY_MODELS:
+        return JsonResponse({"error": f"Invalid model name '{model_name}'. Available: {prompts.AVAILABLE_SUMMARY_MODELS}"},
+                            status=400)
+
+    content_hash = await sync_to_async(summary_cache.hash_upload, thread_sensitive=False)(file_obj)
+    cached = await sync_to_async(summary_cache.get_cached_summary)(content_hash, model_name, user_prompt)
+
+    if data.get('mode') == 'job':
+        job = await sync_to_async(_create_summary_job)(
+            request.user, file_obj, user_prompt, model_name, content_hash, cached)
+        if cached:
+            return JsonResponse(MediaSummaryJobSerializer(job).data, status=200, headers={'X-Cache': 'HIT'})
+        status_url = request.build_absolute_uri(reverse('api:summarize-job-status', args=[job.id]))
+        return JsonResponse({'job_id': str(job.id), 'status': job.status, 'status_url': status_url},
+                            status=202, headers={'Location': status_url})
+
+    if cached:
+        return JsonResponse({
+            'transcript': cached[0],
+            'summary': cached[1],
+            'model_used': model_name
+        }, status=200, headers={'X-Cache': 'HIT'})
+
+    try:
+        # Only the Google AI calls hold an admission slot (see admission.py)
+        async with admission.aadmitted(request.user.pk):
+            # Reads and may delete the RemoteMediaFile row, so it runs on the ORM's thread
+            uploaded_file = await sync_to_async(summary_cache.get_active_remote_file)(content_hash)
+            if uploaded_file is None:
+                # The SDK has no async upload; read and upload the file off the event loop
+                uploaded_file = await sync_to_async(_upload_media, thread_sensitive=False)(file_obj)
+                uploaded_file = await summarization.await_until_active(uploaded_file)
+                await sync_to_async(summary_cache.remember_remote_file)(content_hash, uploaded_file.name)
+
+            model = llm.get_model(model_name)
+            prompt = prompts.build_summary_prompt(user_prompt, file_obj.name)
+            response = await model.generate_content_async([uploaded_file, prompt], request_options={"timeout": 600})
+        transcript_part, summary_part = prompts.parse_summary_response(response.text)
+        await sync_to_async(summary_cache.store_summary)(
+            content_hash, model_name, user_prompt, transcript_part, summary_part)
+
+        return JsonResponse({
+            'transcript': transcript_part,
+            'summary': summary_part,
+            'model_used': model_name
+        }, status=200, headers={'X-Cache': 'MISS'})
+
+    except admission.AdmissionRejected as e:
+        return admission.rejection_response(e)
+    except summarization.SummarizationError as e:
+        print(f"Media processing error: {e}")
+        return JsonResponse({"error": str(e)}, status=500)
+    except Exception as e:
+        print(f"Error during media summarization: {e}")
+        return JsonResponse({"error": f"An unexpected error occurred: {str(e)}"}, status=500)
+
+
+def _create_summary_job(user, file_obj, user_prompt, model_name, content_hash, cached):
+    if cached:
+        # Nothing to run; record the job as already completed
+        return MediaSummaryJob.objects.create(
+            user_profile=user.profile, file_name=file_obj.name, prompt=user_prompt,
+            model_name=model_name, content_hash=content_hash, status=MediaSummaryJob.STATUS_COMPLETED,
+            transcript=cached[0], summary=cached[1], finished_at=timezone.now(),
+        )
+    job = MediaSummaryJob.objects.create(
+        user_profile=user.profile,
+        upload=file_obj,
+        file_name=file_obj.name,
+        prompt=user_prompt,
+        model_name=model_name,
+        content_hash=content_hash,
+    )
+    enqueue_summary_job(job)
+    return job
+
+
+# --- Case Study Generation View ---
+
+@firebase_async_view
+async def generate_case_study(request):
+    """ Async version of views.generate_case_study. """
+    error_response = _configure_genai()
+    if error_response:
+        return error_response
+
+    data, _ = await _request_data(request)
+    user_prompt = data.get('prompt')
+    if not user_prompt or not user_prompt.strip():
+        return JsonResponse({"error": "Please provide a topic or prompt for the case study."}, status=400)
+
+    fresh = is_truthy(data.get('fresh'))
+    if not fresh:
+        cached_text = await case_study_cache.aget(prompts.CASE_STUDY_MODEL, user_prompt)
+        if cached_text is not None:
+            return JsonResponse({'case_study_text': cached_text}, status=200, headers={'X-Cache': 'HIT'})
+
+    try:
+        print(f"Generating case study for prompt starting with: {user_prompt[:50]}...")
+        model = llm.get_model(prompts.CASE_STUDY_MODEL)
+
+        async def generate():
+            # Only the leader of a shared generation holds an admission slot
+            async with admission.aadmitted(request.user.pk):
+                response = await model.generate_content_async(
+                    prompts.build_case_study_prompt(user_prompt), request_options={"timeout": 180})
+            return response.text
+
+        generated_text, _ = await case_study_flight.ado(
+            case_study_cache.key(prompts.CASE_STUDY_MODEL, user_prompt), generate, bypass=fresh)
+        await case_study_cache.aset(prompts.CASE_STUDY_MODEL, user_prompt, generated_text)
+        return JsonResponse({'case_study_text': generated_text}, status=200,
+                            headers={'X-Cache': 'BYPASS' if fresh else 'MISS'})
+
+    except admission.AdmissionRejected as e:
+        return admission.rejection_response(e)
+    except Exception as e:
+        print(f"Error during case study generation: {e}")
+        print(traceback.format_exc())
+        return JsonResponse({"error": f"Failed to generate case study: {str(e)}"}, status=500)
+
+
+# --- Chatbot Interaction View ---
+
+@firebase_async_view
+async def chatbot_interaction(request):
+    """ Async version of views.chatbot_interaction. """
+    error_response = _configure_genai()
+    if error_response:
+        return error_response
+
+    data, _ = await _request_data(request)
+    user_message = data.get('message')
+    history = data.get('history', [])
+    if not user_message or not user_message.strip():
+        return JsonResponse({"error": "Please provide a message."}, status=400)
+
+    session = None
+    if data.get('session_id'):
+        session = await sync_to_async(chat_sessions.get_session)(request.user, data.get('session_id'))
+        if session is None:
+            return JsonResponse({"error": "Chat session not found."}, status=404)
+
+    try:
+        model = llm.get_model('gemini-1.5-flash')
+        record_exchange = sync_to_async(chat_sessions.record_exchange)
+        async with admission.aadmitted(request.user.pk) as lease:
+            if session:
+                await _compact_session(session, model)
+                history = await sync_to_async(chat_sessions.build_history)(session)
+            chat = model.start_chat(history=history)
+
+            if is_truthy(data.get('stream')):
+                on_complete = (lambda reply: record_exchange(session, user_message, reply)) if session else None
+                # The stream keeps the slot until the last event is sent
+                return admission.hand_over(
+                    sse_response(astream_chat_reply(chat, user_message, on_complete=on_complete)), lease)
+            response = await chat.send_message_async(user_message)
+
+        payload = {'reply': response.text.strip()}
+        if session:
+            await record_exchange(session, user_message, payload['reply'])
+            payload['session_id'] = str(session.id)
+        return JsonResponse(payload, status=200)
+
+    except admission.AdmissionRejected as e:
+        return admission.rejection_response(e)
+    except Exception as e:
+        print(f"Error during chatbot interaction: {e}")
+        print(traceback.format_exc())
+        return JsonResponse({"error": f"Failed to get chatbot response: {str(e)}"}, status=500)
+
+
+async def _compact_session(session, model):
+    """ Async chat_sessions.compact_session: only the database steps run in a thread. """
+    turns = await sync_to_async(chat_sessions.plan_compaction)(session)
+    if not turns:
+        return
+    try:
+        summary = await chat_sessions.asummarize_turns(model, session, turns)
+        await sync_to_async(chat_sessions.apply_compaction)(session, turns, summary)
+    except Exception as e:
+        print(f"Chat session {session.pk}: summary rollup failed, sending full context: {e}")
+
+
+# --- AI Assignment Checker View ---
+
+@firebase_async_view
+async def assignment_checker(request):
+    """ Async version of views.assignment_checker. """
+    error_response = _configure_genai()
+    if error_response:
+        return error_response
+
+    data, _ = await _request_data(request)
+    assignment_text = data.get('assignment_text', '')
+    if not assignment_text.strip():
+        return JsonResponse({'error': 'Assignment text cannot be empty.'}, status=400)
+    if len(assignment_text) > prompts.ASSIGNMENT_MAX_LENGTH:
+        return JsonResponse({'error': 'Assignment text is too long (max 15,000 characters).'}, status=413)
+
+    try:
+        model = llm.get_model('gemini-1.5-flash')
+
+        async def check_assignment():
+            # Only the leader of a shared check holds an admission slot
+            async with admission.aadmitted(request.user.pk):
+                response = await model.generate_content_async(
+                    prompts.build_assignment_prompt(assignment_text),
+                    safety_settings=prompts.ASSIGNMENT_SAFETY_SETTINGS)
+            if response.prompt_feedback.block_reason:
+                return response.prompt_feedback.block_reason, None
+            return None, response.text
+
+        (block_reason, feedback_text), _ = await assignment_flight.ado(
+            singleflight.request_key('assignment_checker', 'gemini-1.5-flash', assignment_text), check_assignment)
+
+        if block_reason:
+            print(f"Gemini Block Reason: {block_reason}")
+            return JsonResponse({'error': f'Content blocked by AI safety filters ({block_reason}). Please revise the text.'},
+                                status=400)
+
+        return JsonResponse({'feedback': feedback_text + prompts.ASSIGNMENT_DISCLAIMER}, status=200)
+
+    except admission.AdmissionRejected as e:
+        return admission.rejection_response(e)
+    except Exception as e:
+        print(f"Error calling Gemini for assignment check: {e}")
+        return JsonResponse({'error': 'Failed to get feedback from AI. An internal error occurred.'}, status=500)
@@ -0,0 +1,125 @@
+"""
+Automatic badge awards.
+
+A Badge with a rule is earned once one of the user's counters reaches its
+threshold:
+
+- lessons / quizzes_passed: UserTopicStats (the progress rollups), for the
+  badge's topic or summed over every topic;
+- quiz_streak: QuizStreak.best, the longest run of passed quizzes;
+- xp: UserProfile.xp.
+
+Counters are kept up to date as events happen, and each event type can only
+raise some of them (RULES_BY_EVENT). After an event, evaluate() reads just
+the rules that event can satisfy (narrowed to its topics), the affected
+users' earned badges and the counters those rules need. That is a few
+indexed queries, however long the users' histories are. Awards are
+bulk-created with ignore_conflicts on UserBadge's unique constraint, so
+concurrent evaluations cannot award a badge twice.
+
+`manage.py award_badges` evaluates every rule for every user in batches,
+e.g. after adding a badge. Its --rebuild-streaks option first recomputes
+QuizStreak from quiz history, which the first run needs.
+"""
+from django.db import transaction
+from django.db.models import F, Q
+from django.db.models.functions import Greatest
+
+from .models import Badge, QuizAttempt, QuizStreak, UserBadge, UserProfile, UserTopicStats
+
+EVENT_LESSON_COMPLETED = 'lesson_completed'
+EVENT_QUIZ_PASSED = 'quiz_passed'
+EVENT_XP_CHANGED = 'xp_changed'
+
+RULES_BY_EVENT = {
+    EVENT_LESSON_COMPLETED: (Badge.RULE_LESSONS,),
+    EVENT_QUIZ_PASSED: (Badge.RULE_QUIZZES_PASSED, Badge.RULE_QUIZ_STREAK),
+    EVENT_XP_CHANGED: (Badge.RULE_XP,),
+}
+
+
+# --- Counters ---
+
+def record_quiz_result(user_profile_id, passed):
+    """ Extends or resets the profile's quiz streak. Call in the transaction that records the attempt. """
+    QuizStreak.objects.bulk_create([QuizStreak(user_profile_id=user_profile_id)], ignore_conflicts=True)
+    streak = QuizStreak.objects.filter(pk=user_profile_id)
+    if passed:
+        # best first: some databases apply SET clauses left to right
+        streak.update(best=Greatest('best', F('current') + 1), current=F('current') + 1)
+    else:
+        streak.update(current=0)
+
+
+def rebuild_streaks(user_profile_ids):
+    """ Recomputes QuizStreak for the given profiles from their completed attempts. """
+    streaks = {}
+    attempts = (QuizAttempt.objects.filter(user_profile_id__in=user_profile_ids, is_complete=True)
+                .order_by('user_profile_id', 'start_time', 'id')  # quizattempt_user_recent_idx; graded on submit
+                .values_list('user_profile_id', 'passed'))
+    for user_profile_id, passed in attempts:
+        streak = streaks.setdefault(user_profile_id, QuizStreak(user_profile_id=user_profile_id))
+        streak.current = streak.current + 1 if passed else 0
+        streak.best = max(streak.best, streak.current)
+    with transaction.atomic():
+        QuizStreak.objects.filter(user_profile_id__in=user_profile_ids).delete()
+        QuizStreak.objects.bulk_create(streaks.values(), batch_size=1000)
+
+
+def _counters(rules, user_profile_ids):
+    """ {(profile id, rule, topic id or None): value} for the rules' counters. """
+    values = {}
+    if rules & set(Badge.TOPIC_RULES):
+        topic_stats = (UserTopicStats.objects.filter(user_profile_id__in=user_profile_ids)
+                       .values_list('user_profile_id', 'topic_id', 'lessons_completed', 'quizzes_passed'))
+        for user_profile_id, topic_id, lessons, quizzes in topic_stats:
+            for rule, value in ((Badge.RULE_LESSONS, lessons), (Badge.RULE_QUIZZES_PASSED, quizzes)):
+                values[(user_profile_id, rule, topic_id)] = value
+                total = (user_profile_id, rule, None)
+                values[total] = values.get(total, 0) + value
+    if Badge.RULE_QUIZ_STREAK in rules:
+        for user_profile_id, best in QuizStreak.objects.filter(pk__in=user_profile_ids).values_list('pk', 'best'):
+            values[(user_profile_id, Badge.RULE_QUIZ_STREAK, None)] = best
+    if Badge.RULE_XP in rules:
+        for user_profile_id, xp in UserProfile.objects.filter(pk__in=user_profile_ids).values_list('id', 'xp'):
+            values[(user_profile_id, Badge.RULE_XP, None)] = xp
+    return values
+
+
+# --- Awarding ---
+
+def _award(badges, user_profile_ids):
+    user_profile_ids = set(user_profile_ids)
+    rules = list(badges.filter(threshold__isnull=False).values_list('id', 'rule', 'threshold', 'topic_id'))
+    if not rules or not user_profile_ids:
+        return 0
+    earned = set(UserBadge.objects.filter(user_profile_id__in=user_profile_ids, badge_id__in=[r[0] for r in rules])
+                 .values_list('user_profile_id', 'badge_id'))
+    counters = _counters({rule for _, rule, _, _ in rules}, user_profile_ids)
+    new = [
+        UserBadge(user_profile_id=user_profile_id, badge_id=badge_id)
+        for user_profile_id in sorted(user_profile_ids)
+        for badge_id, rule, threshold, topic_id in rules
+        if (user_profile_id, badge_id) not in earned
+        and counters.get((user_profile_id, rule, topic_id), 0) >= threshold
+    ]
+    UserBadge.objects.bulk_create(new, ignore_conflicts=True)
+    return len(new)
+
+
+def evaluate(event, user_profile_ids, topic_ids=None):
+    """
+    Awards the badges `event` may have earned the given profiles, checking
+    only the rules that event can satisfy (and, with topic_ids, only
+    topic-wide rules and those for the event's topics). Returns the number
+    of badges awarded.
+    """
+    badges = Badge.objects.filter(rule__in=RULES_BY_EVENT[event])
+    if topic_ids is not None:
+        badges = badges.filter(Q(topic__isnull=True) | Q(topic_id__in=topic_ids))
+    return _award(badges, user_profile_ids)
+
+
+def evaluate_all(user_profile_ids):
+    """ Checks every rule for the given profiles (backfills). Returns the number of badges awarded. """
+    return _award(Badge.objects.exclude(rule=''), user_profile_ids)
@@ -0,0 +1,107 @@
+"""
+Versioned cache of rendered course catalog responses.
+
+Course content changes a few times a week, so the catalog views (courses/,
+courses/<id>/, lessons/<id>/) are rendered once per content version instead
+of once per request. The
+version is a token in the shared 'coordination' cache. The signals below
+replace it once a transaction saving or deleting a LearningTopic, Course,
+Module or Lesson commits.
+
+Rendered JSON is stored in the 'catalog' cache under a digest of the
+version and the request variant (host, path, query string). The same
+digest is the response's strong ETag, so:
+
+- a request whose If-None-Match matches gets a 304 after one cache read
+  (the version);
+- other repeat requests cost one more cache read and no serializer work.
+
+A body is stored under the version read before it was rendered. If the
+content changes meanwhile, that version is no longer current, so the body
+is never served as current.
+
+Bulk queryset.update()/delete() send no signals; call bump_version() after
+using them on catalog content.
+"""
+import hashlib
+import uuid
+
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags, urlencode
+
+from .models import Course, LearningTopic, Lesson, Module
+
+CACHE_ALIAS = 'catalog'
+VERSION_ALIAS = 'coordination'
+VERSION_KEY = 'catalog:version'
+BODY_TTL = 24 * 3600  # seconds; bodies of old versions simply expire
+
+
+def current_version():
+    backend = caches[VERSION_ALIAS]
+    version = backend.get(VERSION_KEY)
+    if version is None:
+        backend.add(VERSION_KEY, uuid.uuid4().hex, None)
+        version = backend.get(VERSION_KEY)
+    return version
+
+
+def bump_version():
+    """ Starts a new content version once the current transaction commits. """
+    transaction.on_commit(lambda: caches[VERSION_ALIAS].set(VERSION_KEY, uuid.uuid4().hex, None))
+
+
+def _variant(request):
+    query = urlencode(sorted(request.GET.lists()), doseq=True)
+    return f"{request.scheme}://{request.get_host()}{request.path}?{query}"
+
+
+def _matches(if_none_match, etag):
+    if if_none_match.strip() == '*':
+        return True
+    # If-None-Match uses the weak comparison
+    return any(tag.removeprefix('W/') == etag for tag in parse_etags(if_none_match))
+
+
+class CachedCatalogMixin:
+    """ Serves a read-only catalog view's JSON from the versioned cache (see module docstring). """
+
+    def get(self, request, *args, **kwargs):
+        renderer = request.accepted_renderer
+        if renderer.format != 'json':  # e.g. the browsable API
+            return super().get(request, *args, **kwargs)
+
+        digest = hashlib.sha256(f"{current_version()}|{_variant(request)}".encode('utf-8')).hexdigest()[:32]
+        headers = {'ETag': f'"{digest}"', 'Cache-Control': 'no-cache', 'Vary': 'Accept'}
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match and _matches(if_none_match, headers['ETag']):
+            return HttpResponseNotModified(headers=headers)
+
+        backend = caches[CACHE_ALIAS]
+        key = f"catalog:body:{digest}"
+        body = backend.get(key)
+        if body is None:
+            response = super().get(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            body = renderer.render(response.data, renderer.media_type, self.get_renderer_context())
+            backend.set(key, body, BODY_TTL)
+        return HttpResponse(body, content_type=renderer.media_type, headers=headers)
+
+
+# --- Invalidation on catalog content changes ---
+
+@receiver(post_save, sender=LearningTopic)
+@receiver(post_delete, sender=LearningTopic)
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+@receiver(post_save, sender=Module)
+@receiver(post_delete, sender=Module)
+@receiver(post_save, sender=Lesson)
+@receiver(post_delete, sender=Lesson)
+def invalidate_catalog(sender, **kwargs):
+    bump_version()
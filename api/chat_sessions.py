@@ -0,0 +1,136 @@
+"""
+Server-side chatbot sessions with a bounded context window.
+
+Clients send a session id and the new message; the history is rebuilt from
+ChatMessage rows instead of being resent on every call. Prompt size is kept
+within CHAT_CONTEXT_TOKEN_BUDGET (estimated at ~4 characters per token): once
+the turns not yet summarized exceed the budget, the oldest of them are folded
+into ChatSession.summary by the model, and from then on only that summary plus
+the recent turns are sent. The summary is stored on the session, so every turn
+is summarized at most once however long the conversation runs.
+
+Compaction is split into plan -> summarize -> apply so the async views can
+await the model call while only the database steps run in a thread.
+"""
+import logging
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+
+from . import prompts
+from .models import ChatMessage, ChatSession
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_TIMEOUT = 60  # seconds
+
+
+def estimate_tokens(text):
+    """ Cheap token estimate (~4 characters per token), good enough for budgeting. """
+    return len(text or '') // 4 + 1
+
+
+def _budget():
+    return getattr(settings, 'CHAT_CONTEXT_TOKEN_BUDGET', 4000)
+
+
+def get_session(user, session_id):
+    """ The user's session with this id, or None (unknown id, someone else's session, malformed id). """
+    try:
+        return ChatSession.objects.get(pk=session_id, user_profile__user=user)
+    except (ChatSession.DoesNotExist, ValidationError, ValueError):
+        return None
+
+
+def _unsummarized_messages(session):
+    return list(session.messages.filter(id__gt=session.summarized_until)
+                .values_list('id', 'role', 'text', 'token_estimate'))
+
+
+# --- Compaction ---
+
+def plan_compaction(session):
+    """
+    Returns the oldest unsummarized messages to fold into the summary, or []
+    when the context is within budget. Folds until the remaining turns use at
+    most half the budget, always keeps CHAT_MIN_RECENT_MESSAGES verbatim, and
+    only cuts after a model reply so the history still alternates user/model.
+    """
+    messages = _unsummarized_messages(session)
+    pending_tokens = sum(m[3] for m in messages)
+    if estimate_tokens(session.summary) + pending_tokens <= _budget():
+        return []
+
+    target = _budget() // 2
+    foldable = max(len(messages) - getattr(settings, 'CHAT_MIN_RECENT_MESSAGES', 4), 0)
+    folded_tokens = 0
+    cut = 0
+    for i, (_, role, _, tokens) in enumerate(messages[:foldable]):
+        folded_tokens += tokens
+        if role == 'model':
+            cut = i + 1
+            if pending_tokens - folded_tokens <= target:
+                break
+    return messages[:cut]
+
+
+def summarize_turns(model, session, turns):
+    prompt = prompts.build_chat_rollup_prompt(session.summary, [(role, text) for _, role, text, _ in turns])
+    response = model.generate_content(prompt, request_options={"timeout": ROLLUP_TIMEOUT})
+    return response.text.strip()
+
+
+async def asummarize_turns(model, session, turns):
+    prompt = prompts.build_chat_rollup_prompt(session.summary, [(role, text) for _, role, text, _ in turns])
+    response = await model.generate_content_async(prompt, request_options={"timeout": ROLLUP_TIMEOUT})
+    return response.text.strip()
+
+
+def apply_compaction(session, turns, summary):
+    """ Stores the new summary unless a concurrent request already compacted this session. """
+    last_id = turns[-1][0]
+    updated = ChatSession.objects.filter(
+        pk=session.pk, summarized_until=session.summarized_until
+    ).update(summary=summary, summarized_until=last_id)
+    if updated:
+        session.summary, session.summarized_until = summary, last_id
+    else:
+        session.refresh_from_db(fields=['summary', 'summarized_until'])
+
+
+def compact_session(session, model):
+    """ Sync plan -> summarize -> apply. A failed rollup only means this turn sends the full context. """
+    turns = plan_compaction(session)
+    if not turns:
+        return
+    try:
+        apply_compaction(session, turns, summarize_turns(model, session, turns))
+        logger.info(f"Chat session {session.pk}: folded {len(turns)} messages into the summary")
+    except Exception as e:
+        logger.warning(f"Chat session {session.pk}: summary rollup failed, sending full context: {e}")
+
+
+# --- History ---
+
+def build_history(session):
+    """ Gemini chat history: the rolled-up summary (if any) followed by the unsummarized turns. """
+    history = []
+    if session.summary:
+        history.append({'role': 'user', 'parts': [f"{prompts.CHAT_SUMMARY_PREFIX}\n{session.summary}"]})
+        history.append({'role': 'model', 'parts': [prompts.CHAT_SUMMARY_ACK]})
+    for _, role, text, _ in _unsummarized_messages(session):
+        history.append({'role': role, 'parts': [text]})
+    return history
+
+
+def record_exchange(session, user_message, reply):
+    """ Persists one user message and the model's reply (only after a successful reply). """
+    ChatMessage.objects.bulk_create([
+        ChatMessage(session=session, role='user', text=user_message, token_estimate=estimate_tokens(user_message)),
+        ChatMessage(session=session, role='model', text=reply, token_estimate=estimate_tokens(reply)),
+    ])
+    update_fields = ['updated_at']
+    if not session.title:
+        session.title = user_message.strip()[:80]
+        update_fields.append('title')
+    session.save(update_fields=update_fields)
@@ -0,0 +1,115 @@
+"""
+Server-Sent Events streaming of chatbot replies.
+
+Model chunks are forwarded as `data: {"text": ...}` events as soon as Gemini
+produces them, followed by a final `event: done` carrying time-to-first-byte
+and total latency (both also logged). If the client goes away mid-stream the
+upstream generation is cancelled:
+
+- WSGI: the server closes the response iterator, raising GeneratorExit at
+  the pending `yield`.
+- ASGI: Django cancels the streaming task, raising CancelledError at the
+  pending `await`.
+
+Either way the `finally` block cancels the underlying gRPC stream so we stop
+paying for tokens nobody will read.
+
+An optional `on_complete(reply_text)` callback (a coroutine function for the
+async stream) runs once the full reply has been received, before `done`;
+session chats use it to persist the exchange.
+"""
+import json
+import logging
+import time
+
+from django.http import StreamingHttpResponse
+
+logger = logging.getLogger(__name__)
+
+
+def sse_event(data, event=None):
+    message = f"event: {event}\n" if event else ""
+    return message + f"data: {json.dumps(data)}\n\n"
+
+
+def sse_response(events):
+    """ Wraps a (sync or async) iterator of SSE strings in an unbuffered streaming response. """
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # disable proxy buffering (nginx/Render)
+    return response
+
+
+def _cancel_upstream(response):
+    # The SDK keeps the gRPC call as the response's iterator; it exposes cancel()
+    call = getattr(response, '_iterator', None)
+    cancel = getattr(call, 'cancel', None)
+    if cancel:
+        try:
+            cancel()
+        except Exception as e:
+            logger.warning(f"Chat stream: could not cancel upstream generation: {e}")
+
+
+def _timings(start, first_chunk_at):
+    now = time.perf_counter()
+    ttfb_ms = round((first_chunk_at - start) * 1000, 1) if first_chunk_at else None
+    return {'ttfb_ms': ttfb_ms, 'total_ms': round((now - start) * 1000, 1)}
+
+
+def stream_chat_reply(chat, user_message, on_complete=None):
+    """ Sync generator of SSE events for chat.send_message(..., stream=True). """
+    start = time.perf_counter()
+    first_chunk_at = None
+    response = None
+    completed = False
+    parts = []
+    try:
+        response = chat.send_message(user_message, stream=True)
+        for chunk in response:
+            if first_chunk_at is None:
+                first_chunk_at = time.perf_counter()
+            parts.append(chunk.text)
+            yield sse_event({'text': chunk.text})
+        completed = True
+        if on_complete:
+            on_complete(''.join(parts).strip())
+        yield sse_event(_timings(start, first_chunk_at), event='done')
+    except Exception as e:
+        completed = True  # upstream already finished (with an error)
+        logger.error(f"Chat stream failed: {e}")
+        yield sse_event({'error': f"Failed to get chatbot response: {str(e)}"}, event='error')
+    finally:
+        if not completed and response is not None:
+            logger.info("Chat stream: client disconnected, cancelling generation")
+            _cancel_upstream(response)
+        logger.info(f"Chat stream timings: {_timings(start, first_chunk_at)} (completed={completed})")
+
+
+async def astream_chat_reply(chat, user_message, on_complete=None):
+    """ Async generator of SSE events for chat.send_message_async(..., stream=True). """
+    start = time.perf_counter()
+    first_chunk_at = None
+    response = None
+    completed = False
+    parts = []
+    try:
+        response = await chat.send_message_async(user_message, stream=True)
+        async for chunk in response:
+            if first_chunk_at is None:
+                first_chunk_at = time.perf_counter()
+            parts.append(chunk.text)
+            yield sse_event({'text': chunk.text})
+        completed = True
+        if on_complete:
+            await on_complete(''.join(parts).strip())
+        yield sse_event(_timings(start, first_chunk_at), event='done')
+    except Exception as e:
+        completed = True
+        logger.error(f"Chat stream failed: {e}")
+        yield sse_event({'error': f"Failed to get chatbot response: {str(e)}"}, event='error')
+    finally:
+        if not completed and response is not None:
+            logger.info("Chat stream: client disconnected, cancelling generation")
+            _cancel_upstream(response)
+        logger.info(f"Chat stream timings: {_timings(start, first_chunk_at)} (completed={completed})")
@@ -0,0 +1,140 @@
+"""
+Fast serialization of the nested course and quiz trees.
+
+CourseSerializer/QuizSerializer nest ModelSerializers, and DRF's
+field-by-field to_representation dominates CPU time for large catalogs.
+The functions here build the same structure from values() rows: one query
+per level, then one pass per level that groups children under their parent
+with dict lookups.
+
+The output matches the DRF serializers exactly, with the same keys in the
+same order and children in the same order, so the rendered JSON is
+byte-identical. Field lists are read from the serializers' Meta.fields so the
+two paths cannot drift apart. Only plain model fields (no SerializerMethodField
+or source=) are supported at each level, and nested lists must come last in
+Meta.fields; extend these functions if a serializer changes that.
+
+A `fields` tree from serializers.requested_fields() (?fields=) narrows the
+output the same way SparseFieldsMixin does, and unrequested levels are not
+queried at all.
+"""
+from .models import Choice, Course, Lesson, Module, Question, Quiz
+from .request_metrics import timed
+from .serializers import (
+    ChoiceSerializer, CourseOutlineSerializer, CourseSerializer, LearningTopicSerializer,
+    LessonOutlineSerializer, LessonSerializer, ModuleOutlineSerializer, ModuleSerializer,
+    QuestionSerializer, QuizSerializer,
+)
+
+
+def _plan(serializer_class, nested, tree):
+    """
+    (own field names, {nested field: subtree}) requested from serializer_class,
+    in Meta.fields order; tree None selects everything.
+    """
+    own, children = [], {}
+    for field in serializer_class.Meta.fields:
+        if tree is not None and field not in tree:
+            continue
+        if field in nested:
+            children[field] = None if tree is None else tree[field]
+        else:
+            own.append(field)
+    return own, children
+
+
+def _children(model, parent_field, parent_ids, fields, keep_id=True):
+    """
+    {parent id: [row, ...]} for parent_ids, rows holding `fields` in that order
+    and in the model's default ordering (as prefetch_related() returns them).
+    Rows also carry 'id' (last) when it is needed to attach the next level.
+    """
+    grouped = {parent_id: [] for parent_id in parent_ids}
+    if not parent_ids:
+        return grouped
+    columns = list(fields) if 'id' in fields or not keep_id else [*fields, 'id']
+    for row in model.objects.filter(**{f'{parent_field}__in': parent_ids}).values(parent_field, *columns):
+        grouped[row.pop(parent_field)].append(row)
+    return grouped
+
+
+def _attach(rows, name, children, drop_id):
+    for row in rows:
+        row[name] = children[row.pop('id') if drop_id else row['id']]
+
+
+# --- Courses ---
+
+def _course_serializers(outline):
+    if outline:
+        return CourseOutlineSerializer, ModuleOutlineSerializer, LessonOutlineSerializer
+    return CourseSerializer, ModuleSerializer, LessonSerializer
+
+
+def course_values(outline=False, fields=None):
+    """ The Course values() queryset that serialize_courses() expects; always includes 'id' (pagination orders by it). """
+    own, children = _plan(_course_serializers(outline)[0], {'modules', 'topic'}, fields)
+    columns = list(own) if 'id' in own else [*own, 'id']
+    if 'topic' in children:
+        topic_fields, _ = _plan(LearningTopicSerializer, (), children['topic'])
+        columns += [f'topic__{name}' for name in topic_fields]
+    return Course.objects.values(*columns)
+
+
+@timed
+def serialize_courses(course_rows, outline=False, fields=None):
+    """ Same output as CourseSerializer (or CourseOutlineSerializer) with many=True, in up to 2 more queries. """
+    course_serializer, module_serializer, lesson_serializer = _course_serializers(outline)
+    own, children = _plan(course_serializer, {'modules', 'topic'}, fields)
+    course_rows = list(course_rows)
+
+    modules = None
+    if 'modules' in children:
+        module_fields, module_children = _plan(module_serializer, {'lessons'}, children['modules'])
+        modules = _children(Module, 'course_id', [row['id'] for row in course_rows], module_fields,
+                            keep_id='lessons' in module_children)
+        if 'lessons' in module_children:
+            module_rows = [module for rows in modules.values() for module in rows]
+            lesson_fields, _ = _plan(lesson_serializer, (), module_children['lessons'])
+            lessons = _children(Lesson, 'module_id', [module['id'] for module in module_rows], lesson_fields,
+                                keep_id=False)
+            _attach(module_rows, 'lessons', lessons, drop_id='id' not in module_fields)
+    topic_fields = _plan(LearningTopicSerializer, (), children['topic'])[0] if 'topic' in children else ()
+
+    courses = []
+    for row in course_rows:
+        course = {}
+        for field in course_serializer.Meta.fields:
+            if field in own:
+                course[field] = row[field]
+            elif field == 'topic' and 'topic' in children:
+                course[field] = {name: row[f'topic__{name}'] for name in topic_fields}
+            elif field == 'modules' and modules is not None:
+                course[field] = modules[row['id']]
+        courses.append(course)
+    return courses
+
+
+# --- Quizzes ---
+
+@timed
+def serialize_quiz(quiz_id, fields=None):
+    """ Same output as QuizSerializer for one quiz, in up to 3 queries; None if it does not exist. """
+    own, children = _plan(QuizSerializer, {'questions'}, fields)
+    columns = ['module_id' if field == 'module' else field for field in own]
+    row = Quiz.objects.filter(pk=quiz_id).values('id', *columns).first()
+    if row is None:
+        return None
+
+    quiz = {field: row['module_id' if field == 'module' else field] for field in own}
+    if 'questions' in children:
+        question_fields, question_children = _plan(QuestionSerializer, {'choices'}, children['questions'])
+        questions = _children(Question, 'quiz_id', [row['id']], question_fields,
+                              keep_id='choices' in question_children)[row['id']]
+        if 'choices' in question_children:
+            choice_fields, _ = _plan(ChoiceSerializer, (), question_children['choices'])
+            choices = _children(Choice, 'question_id', [question['id'] for question in questions], choice_fields,
+                                keep_id=False)
+            _attach(questions, 'choices', choices, drop_id='id' not in question_fields)
+        quiz['questions'] = questions
+    return quiz
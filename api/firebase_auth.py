@@ -2,17 +2,66 @@ import firebase_admin
 from firebase_admin import auth, credentials
 from rest_framework import authentication, exceptions
 from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
 import os
 from django.conf import settings
 import logging
+from .token_cache import token_cache
+from .firebase_keys import keyring
+from .models import FirebaseIdentity, UserProfile
 
 logger = logging.getLogger(__name__)
 
+
+class FirebaseUserConflict(Exception):
+    """ Raised when a new Firebase UID cannot be provisioned a Django user. """
+
+
+def resolve_firebase_user(uid, email):
+    """
+    Returns the Django User (with `profile` already loaded) for a Firebase UID.
+
+    Steady state is a single indexed lookup on FirebaseIdentity.uid joined to
+    the user and profile. On first sign-in the identity, User and UserProfile
+    are provisioned together in one transaction; an existing account with the
+    same email is linked instead, so one person may sign in with several UIDs.
+    """
+    identity = FirebaseIdentity.objects.select_related('user__profile').filter(uid=uid).first()
+    if identity is not None:
+        return identity.user
+
+    try:
+        with transaction.atomic():
+            user = None
+            if email:
+                user = User.objects.select_related('profile').filter(email=email).first()
+            if user is None:
+                # The post_save signal creates the profile inside this transaction
+                user = User.objects.create_user(username=email or uid, email=email or '')
+                logger.info(f"Firebase Auth: Created new user for UID: {uid}")
+            else:
+                try:
+                    user.profile
+                except UserProfile.DoesNotExist:
+                    UserProfile.objects.create(user=user)
+                logger.info(f"Firebase Auth: Linked existing user {user.pk} to UID: {uid}")
+            FirebaseIdentity.objects.create(uid=uid, user=user)
+    except IntegrityError:
+        # A concurrent first request for the same UID provisioned it first
+        identity = FirebaseIdentity.objects.select_related('user__profile').filter(uid=uid).first()
+        if identity is None:
+            # Not a race: e.g. the username is taken by an account with a different email
+            raise FirebaseUserConflict(f"Cannot provision a user for UID {uid} ({email}): "
+                                       f"username {email or uid!r} is already taken")
+        return identity.user
+    return user
+
 class FirebaseAuthentication(authentication.BaseAuthentication):
     """
     Custom Django Rest Framework authentication backend for Firebase ID tokens.
-    Verifies the Bearer token provided in the Authorization header using the
-    Firebase Admin SDK and links it to a Django User.
+    Verifies the Bearer token provided in the Authorization header against the
+    locally cached Firebase signing keys (see firebase_keys.py) and links it to
+    a Django User.
     """
     def authenticate(self, request):
         print("Attempting Firebase Authentication...")
@@ -32,46 +81,28 @@ class FirebaseAuthentication(authentication.BaseAuthentication):
             return None 
 
         id_token = parts[1]
+
+        # Fast path: token already verified and resolved by this process
+        user = token_cache.get(id_token)
+        if user is not None:
+            return (user, None)
+
         print(f"Firebase Auth: Received Bearer token, attempting verification...")
 
         try:
-            if not firebase_admin._apps:
-                print("Firebase Auth: ERROR - SDK not initialized. Trying fallback init (NOT RECOMMENDED)...")
-                key_path = os.path.join(settings.BASE_DIR, 'firebase-service-account-key.json')
-                if os.path.exists(key_path):
-                     try:
-                         cred = credentials.Certificate(key_path)
-                         firebase_admin.initialize_app(cred)
-                         print("Firebase Auth: Fallback SDK initialization successful.")
-                     except Exception as init_e:
-                         print(f"Firebase Auth: FATAL - Fallback SDK initialization FAILED: {init_e}")
-                         raise exceptions.AuthenticationFailed('Firebase Admin SDK could not be initialized.')
-                else:
-                     print(f"Firebase Auth: FATAL - Service key not found at {key_path} for fallback init.")
-                     raise exceptions.AuthenticationFailed('Firebase Admin SDK service key not found.')
-            
-            print("Firebase Auth: Calling auth.verify_id_token()...")
-            # Get decoded token info
-            decoded_token = auth.verify_id_token(id_token)
+            if getattr(settings, 'FIREBASE_LOCAL_TOKEN_VERIFICATION', True):
+                # Verify against the keys the server loaded at startup (see firebase_keys.start_keyring)
+                decoded_token = keyring.verify_id_token(id_token)
+            else:
+                decoded_token = self._verify_with_sdk(id_token)
             uid = decoded_token.get('uid')
             email = decoded_token.get('email')
 
             logger.info(f"Firebase Auth: Token decoded - UID: {uid}, Email: {email}")
 
-            # Modified user lookup logic
             try:
-                # Try to get existing user
-                user = User.objects.filter(email=email).first()
-                if not user:
-                    # Create new user if none exists
-                    user = User.objects.create_user(
-                        username=email,
-                        email=email
-                    )
-                    logger.info(f"Firebase Auth: Created new user for email: {email}")
-                else:
-                    logger.info(f"Firebase Auth: Found existing user for email: {email}")
-                
+                user = resolve_firebase_user(uid, email)
+                token_cache.set(id_token, user, decoded_token.get('exp'))
                 return (user, None)
 
             except Exception as e:
@@ -82,5 +113,40 @@ class FirebaseAuthentication(authentication.BaseAuthentication):
             logger.error(f"Firebase Auth: Authentication failed: {str(e)}")
             raise exceptions.AuthenticationFailed('Invalid token')
 
+    def _verify_with_sdk(self, id_token):
+        """ Legacy path: verify through the Firebase Admin SDK (may fetch certificates). """
+        if not firebase_admin._apps:
+            print("Firebase Auth: ERROR - SDK not initialized. Trying fallback init (NOT RECOMMENDED)...")
+            key_path = os.path.join(settings.BASE_DIR, 'firebase-service-account-key.json')
+            if os.path.exists(key_path):
+                 try:
+                     cred = credentials.Certificate(key_path)
+                     firebase_admin.initialize_app(cred)
+                     print("Firebase Auth: Fallback SDK initialization successful.")
+                 except Exception as init_e:
+                     print(f"Firebase Auth: FATAL - Fallback SDK initialization FAILED: {init_e}")
+                     raise exceptions.AuthenticationFailed('Firebase Admin SDK could not be initialized.')
+            else:
+                 print(f"Firebase Auth: FATAL - Service key not found at {key_path} for fallback init.")
+                 raise exceptions.AuthenticationFailed('Firebase Admin SDK service key not found.')
+        
+        print("Firebase Auth: Calling auth.verify_id_token()...")
+        # Get decoded token info
+        decoded_token = auth.verify_id_token(id_token)
+        return decoded_token
+
     def authenticate_header(self, request):
-        return 'Bearer realm="Firebase"'
\ No newline at end of file
+        return 'Bearer realm="Firebase"'
+
+
+class OptionalFirebaseAuthentication(FirebaseAuthentication):
+    """
+    FirebaseAuthentication for public (AllowAny) endpoints: a request whose
+    token is invalid or expired is served as anonymous instead of a 401.
+    """
+    def authenticate(self, request):
+        try:
+            return super().authenticate(request)
+        except exceptions.AuthenticationFailed:
+            print("Firebase Auth: Token rejected, continuing anonymously.")
+            return None
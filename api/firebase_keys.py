@@ -0,0 +1,211 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+import urllib.request
+
+import firebase_admin
+import jwt
+from cryptography.x509 import load_pem_x509_certificate
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Google's published signing certificates for Firebase ID tokens
+ID_TOKEN_CERT_URI = ('https://www.googleapis.com/robot/v1/metadata/x509/'
+                     'securetoken@system.gserviceaccount.com')
+ID_TOKEN_ISSUER_PREFIX = 'https://securetoken.google.com/'
+
+_MAX_AGE_RE = re.compile(r'max-age=(\d+)')
+
+
+class TokenVerificationError(ValueError):
+    """ Raised when an ID token fails local verification. """
+
+
+def firebase_project_id():
+    """ FIREBASE_PROJECT_ID, else the project of the initialized Admin SDK app. """
+    project_id = getattr(settings, 'FIREBASE_PROJECT_ID', None)
+    if not project_id and firebase_admin._apps:
+        project_id = firebase_admin.get_app().project_id
+    return project_id
+
+
+class FirebaseKeyring:
+    """
+    Process-level copy of the Firebase ID token signing keys.
+
+    The web server entry points (asgi.py, wsgi.py) load the keys and start a
+    daemon thread through start_keyring(), so management commands never
+    start the thread or touch the network. The thread refreshes the keys
+    shortly before the source's Cache-Control max-age runs out.
+    Verification only ever uses the keys already loaded: if a token names an
+    unknown key id (or the initial load failed) the request fails and a
+    refresh is scheduled in the background. No request waits on a download.
+
+    `source` may be an http(s) URL (Google's endpoint or a stand-in server),
+    a `file://` URL, or a plain path to a JSON file of {kid: PEM certificate}.
+    """
+
+    def __init__(self, source=ID_TOKEN_CERT_URI, refresh_margin=300,
+                 default_max_age=3600, min_refresh_interval=30, fetch_timeout=5, project_id=None):
+        self.source = source
+        self.refresh_margin = refresh_margin
+        self.default_max_age = default_max_age
+        self.min_refresh_interval = min_refresh_interval
+        self.fetch_timeout = fetch_timeout
+        self.project_id = project_id  # None: firebase_project_id() at verification time
+        self._keys = {}  # kid -> public key
+        self._expires_at = 0.0
+        self._last_fetch_attempt = 0.0
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._owner_pid = None
+
+    # --- Loading ---
+
+    def _fetch(self):
+        """ Returns ({kid: pem}, max_age_seconds) from the configured source. """
+        source = self.source
+        if source.startswith('http://') or source.startswith('https://'):
+            with urllib.request.urlopen(source, timeout=self.fetch_timeout) as resp:
+                certs = json.loads(resp.read().decode('utf-8'))
+                max_age = self.default_max_age
+                match = _MAX_AGE_RE.search(resp.headers.get('Cache-Control', ''))
+                if match:
+                    max_age = int(match.group(1)) - int(resp.headers.get('Age', 0) or 0)
+            return certs, max_age
+        if source.startswith('file://'):
+            source = source[len('file://'):]
+        with open(source, 'r', encoding='utf-8') as fh:
+            return json.load(fh), self.default_max_age
+
+    def load(self):
+        """ Fetches the certificates and swaps them in. Blocking; called at process start and by the refresh thread. """
+        self._last_fetch_attempt = time.time()
+        certs, max_age = self._fetch()
+        keys = {
+            kid: load_pem_x509_certificate(pem.encode('utf-8')).public_key()
+            for kid, pem in certs.items()
+        }
+        if not keys:
+            raise ValueError(f"No signing keys found at {self.source}")
+        self._keys = keys  # single reference swap; readers never see a partial set
+        self._expires_at = time.time() + max(max_age, 0)
+        logger.info(f"Firebase keyring: loaded {len(keys)} keys, valid for {max_age}s")
+        return len(keys)
+
+    # --- Background refresh ---
+
+    def start(self):
+        """ Preloads the keys (tolerating failure) and starts the refresh thread. """
+        try:
+            self.load()
+        except Exception as e:
+            logger.error(f"Firebase keyring: initial key load from {self.source} failed: {e}")
+        self._start_thread()
+
+    def _start_thread(self):
+        self._owner_pid = os.getpid()
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name='firebase-keyring', daemon=True)
+        self._thread.start()
+
+    def _ensure_thread(self):
+        # Threads do not survive a fork (e.g. gunicorn --preload); restart in the child.
+        if self._owner_pid is not None and self._owner_pid != os.getpid():
+            self._start_thread()
+
+    def _next_refresh_delay(self):
+        if not self._keys:
+            return self.min_refresh_interval
+        refresh_at = self._expires_at - self.refresh_margin
+        return max(refresh_at - time.time(), self.min_refresh_interval)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self._next_refresh_delay())
+            self._wakeup.clear()
+            if self._stopped.is_set():
+                break
+            try:
+                self.load()
+            except Exception as e:
+                # Keep serving the previous keys; retry after min_refresh_interval.
+                logger.error(f"Firebase keyring: refresh from {self.source} failed: {e}")
+
+    def request_refresh(self):
+        """ Wakes the refresh thread early (rate limited). Never blocks. """
+        if time.time() - self._last_fetch_attempt >= self.min_refresh_interval:
+            self._wakeup.set()
+
+    def stop(self):
+        self._stopped.set()
+        self._wakeup.set()
+
+    # --- Verification ---
+
+    def verify_id_token(self, id_token, clock_skew_seconds=0):
+        """
+        Verifies a Firebase ID token against the local keys, applying the same
+        claim checks as firebase_admin.auth.verify_id_token. Returns the decoded
+        claims with 'uid' set from 'sub'.
+        """
+        self._ensure_thread()
+        project_id = self.project_id or firebase_project_id()
+        if not project_id:
+            raise TokenVerificationError('Firebase project id is not configured.')
+
+        try:
+            header = jwt.get_unverified_header(id_token)
+        except jwt.PyJWTError as e:
+            raise TokenVerificationError(f'Malformed ID token: {e}')
+        if header.get('alg') != 'RS256':
+            raise TokenVerificationError(f'Unexpected token algorithm: {header.get("alg")}')
+
+        key = self._keys.get(header.get('kid'))
+        if key is None:
+            self.request_refresh()
+            raise TokenVerificationError(f'Unknown signing key id: {header.get("kid")}')
+
+        try:
+            claims = jwt.decode(
+                id_token,
+                key=key,
+                algorithms=['RS256'],
+                audience=project_id,
+                issuer=ID_TOKEN_ISSUER_PREFIX + project_id,
+                leeway=clock_skew_seconds,
+                options={'require': ['exp', 'iat', 'aud', 'iss', 'sub']},
+            )
+        except jwt.PyJWTError as e:
+            raise TokenVerificationError(f'Invalid ID token: {e}')
+
+        subject = claims.get('sub')
+        if not isinstance(subject, str) or not subject or len(subject) > 128:
+            raise TokenVerificationError('ID token has an invalid "sub" claim.')
+        auth_time = claims.get('auth_time')
+        if auth_time is not None and auth_time > time.time() + clock_skew_seconds:
+            raise TokenVerificationError('ID token "auth_time" is in the future.')
+
+        claims['uid'] = subject
+        return claims
+
+    @property
+    def ready(self):
+        return bool(self._keys)
+
+
+keyring = FirebaseKeyring(
+    source=getattr(settings, 'FIREBASE_CERTS_SOURCE', ID_TOKEN_CERT_URI),
+    refresh_margin=getattr(settings, 'FIREBASE_KEY_REFRESH_MARGIN', 300),
+)
+
+
+def start_keyring():
+    """ Loads the keys and starts the refresh thread (web server entry points only). No-op if already started. """
+    if getattr(settings, 'FIREBASE_LOCAL_TOKEN_VERIFICATION', True) and keyring._thread is None:
+        keyring.start()
@@ -0,0 +1,157 @@
+"""
+Leaderboard ranks.
+
+Profiles are listed by (-xp, id), which the userprofile_xp_rank_idx index
+serves directly, so a page costs an index range scan of its own length.
+Ranks are competition ranks ("1224"): users with equal XP share a rank, and
+a user's rank is 1 + the number of profiles with more XP.
+
+That count comes from LeaderboardBucket, which has one row per distinct XP
+value with the number of profiles at that value. A rank lookup sums the
+buckets above one XP value, so its cost grows with the number of distinct
+XP values above the user rather than with the number of users. Buckets
+are changed in the same transaction as the profile:
+
+- fold_xp() moves a profile from its old bucket to its new one, and
+  fold_profiles() shifts the buckets of a whole batch at once;
+- creating or deleting a UserProfile adds or removes it (signals below).
+
+Code that writes UserProfile.xp in any other way (queryset.update(), bulk
+loads) must call rebuild() afterwards (`manage.py rebuild_leaderboard`).
+"""
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, Sum, Value, When, Window
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import LeaderboardBucket, UserProfile
+
+ENTRY_FIELDS = ('id', 'user_id', 'user__username', 'level', 'xp')
+
+
+def _ordered():
+    return UserProfile.objects.order_by('-xp', 'id')
+
+
+# --- Keeping buckets current ---
+
+def _adjust(xp, delta):
+    if delta > 0:
+        LeaderboardBucket.objects.bulk_create([LeaderboardBucket(xp=xp, count=0)], ignore_conflicts=True)
+    LeaderboardBucket.objects.filter(xp=xp).update(count=F('count') + delta)
+
+
+def move(old_xp, new_xp):
+    """ Moves one profile between buckets. Call inside the transaction that changes its xp. """
+    if old_xp == new_xp:
+        return
+    # Lock bucket rows in xp order so opposite moves cannot deadlock
+    for xp, delta in sorted(((old_xp, -1), (new_xp, 1))):
+        _adjust(xp, delta)
+
+
+def shift(deltas):
+    """
+    Applies many moves at once: {xp: change in profile count}, e.g. from a
+    Counter of -1 at each old xp and +1 at each new one. One UPDATE.
+    """
+    deltas = {xp: delta for xp, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    LeaderboardBucket.objects.bulk_create(
+        [LeaderboardBucket(xp=xp, count=0) for xp, delta in deltas.items() if delta > 0], ignore_conflicts=True)
+    LeaderboardBucket.objects.filter(xp__in=list(deltas)).update(
+        count=F('count') + Case(*[When(xp=xp, then=Value(delta)) for xp, delta in sorted(deltas.items())],
+                                default=Value(0), output_field=IntegerField()))
+
+
+def rebuild():
+    """
+    Recounts every bucket from UserProfile and returns the number of distinct
+    XP values. Profiles whose XP changes during the recount may be counted
+    in their old bucket; run it again if so.
+    """
+    counts = dict(UserProfile.objects.order_by().values_list('xp').annotate(n=Count('id')))
+    with transaction.atomic():
+        LeaderboardBucket.objects.exclude(xp__in=list(counts)).delete()
+        LeaderboardBucket.objects.bulk_create(
+            [LeaderboardBucket(xp=xp, count=n) for xp, n in counts.items()],
+            batch_size=1000, update_conflicts=True, unique_fields=['xp'], update_fields=['count'],
+        )
+    return len(counts)
+
+
+@receiver(post_save, sender=UserProfile)
+def add_profile(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        _adjust(instance.xp, 1)
+
+
+@receiver(post_delete, sender=UserProfile)
+def remove_profile(sender, instance, **kwargs):
+    _adjust(instance.xp, -1)
+
+
+# --- Reading ---
+
+def rank_for_xp(xp):
+    above = LeaderboardBucket.objects.filter(xp__gt=xp).aggregate(total=Sum('count'))['total']
+    return 1 + (above or 0)
+
+
+def _entries(rows):
+    """
+    Compact entries for profile rows in leaderboard order, with ranks from two
+    bucket queries (the total above the first row and the buckets it spans).
+    """
+    rows = list(rows)
+    if not rows:
+        return []
+    top_xp, bottom_xp = rows[0][4], rows[-1][4]
+    rank = rank_for_xp(top_xp)
+    ranks = {}
+    spanned = LeaderboardBucket.objects.filter(xp__gte=bottom_xp, xp__lte=top_xp).order_by('-xp')
+    for xp, count in spanned.values_list('xp', 'count'):
+        ranks[xp] = rank
+        rank += count
+    return [
+        {'rank': ranks.get(xp), 'user_id': user_id, 'username': username, 'level': level, 'xp': xp}
+        for _, user_id, username, level, xp in rows
+    ]
+
+
+def top(n):
+    return _entries(_ordered().values_list(*ENTRY_FIELDS)[:n])
+
+
+def page(start, size):
+    """ `size` entries from leaderboard position `start` (1-based; tied users are ordered by id). """
+    if start <= 1:
+        return top(size)
+    # The highest bucket whose running total reaches `start` holds that position
+    boundary = (LeaderboardBucket.objects.filter(count__gt=0)
+                .annotate(through=Window(Sum('count'), order_by=F('xp').desc()))
+                .filter(through__gte=start).order_by('-xp').values_list('xp', 'count', 'through').first())
+    if boundary is None:
+        return []
+    xp, count, through = boundary
+    offset = start - 1 - (through - count)
+    return _entries(_ordered().filter(xp__lte=xp).values_list(*ENTRY_FIELDS)[offset:offset + size])
+
+
+def around(profile, neighbours):
+    """ The profile's entry with up to `neighbours` entries above and below it. """
+    same_xp = _ordered().filter(xp=profile.xp)
+    above = list(same_xp.filter(id__lt=profile.pk).order_by('-id').values_list(*ENTRY_FIELDS)[:neighbours])
+    if len(above) < neighbours:
+        above += _ordered().filter(xp__gt=profile.xp).order_by('xp', '-id').values_list(*ENTRY_FIELDS)[:neighbours - len(above)]
+    below = list(same_xp.filter(id__gt=profile.pk).values_list(*ENTRY_FIELDS)[:neighbours])
+    if len(below) < neighbours:
+        below += _ordered().filter(xp__lt=profile.xp).values_list(*ENTRY_FIELDS)[:neighbours - len(below)]
+    me = (profile.pk, profile.user_id, profile.user.username, profile.level, profile.xp)
+    entries = _entries(above[::-1] + [me] + below)
+    return {
+        'me': entries[len(above)],
+        'above': entries[:len(above)],
+        'below': entries[len(above) + 1:],
+    }
@@ -0,0 +1,128 @@
+"""
+Bulk lesson completion (e.g. backfills from an LMS export).
+
+complete_lessons() takes many (user_id, lesson_id) pairs and resolves them
+with set-based queries: one for profiles, one for lessons and, per batch,
+one for completions that already exist. New completions are written with
+bulk_create(ignore_conflicts=True), so the UserProgress unique constraint
+settles any pair that slips through. Their XP goes to the ledger in one
+more bulk insert and is folded for every affected profile in one grouped
+update (xp_ledger.fold_profiles). The progress rollups are incremented per
+(profile, topic) in the same transaction, and the lesson-count badges
+they may have earned are awarded (badges.py).
+
+Each batch locks its profiles' rows, and mark_lesson_complete() locks the
+profile row too. An "already completed" answer is therefore exact, and
+a pair is never counted in the rollups twice.
+"""
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from . import badges, progress_stats, xp_ledger
+from .models import Lesson, UserProfile, UserProgress, XPEvent
+
+# Per-item outcomes
+COMPLETED = 'completed'
+ALREADY_COMPLETED = 'already_completed'
+DUPLICATE = 'duplicate'  # the same pair appeared earlier in the request
+INVALID = 'invalid'
+USER_NOT_FOUND = 'user_not_found'
+PROFILE_NOT_FOUND = 'profile_not_found'
+LESSON_NOT_FOUND = 'lesson_not_found'
+
+
+def _as_id(value):
+    if isinstance(value, bool):
+        return None
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return None
+    return value if value > 0 else None
+
+
+def complete_lessons(pairs, batch_size=1000):
+    """
+    Marks lessons complete for many (user_id, lesson_id) pairs. Returns one
+    result dict per pair, in input order: user_id, lesson_id, status (see
+    the constants above) and xp_awarded.
+    """
+    results = []
+    for user_id, lesson_id in pairs:
+        results.append({'user_id': _as_id(user_id), 'lesson_id': _as_id(lesson_id), 'status': None, 'xp_awarded': 0})
+
+    seen = set()
+    for result in results:
+        key = (result['user_id'], result['lesson_id'])
+        if None in key:
+            result['status'] = INVALID
+        elif key in seen:
+            result['status'] = DUPLICATE
+        seen.add(key)
+    pending = [result for result in results if result['status'] is None]
+
+    user_ids = {result['user_id'] for result in pending}
+    profiles = dict(UserProfile.objects.filter(user_id__in=user_ids).values_list('user_id', 'id'))
+    missing = user_ids - profiles.keys()
+    users_without_profile = set(User.objects.filter(pk__in=missing).values_list('id', flat=True)) if missing else set()
+    lessons = {
+        lesson_id: (xp_value, topic_id)
+        for lesson_id, xp_value, topic_id in Lesson.objects.filter(id__in={result['lesson_id'] for result in pending})
+        .values_list('id', 'xp_value', 'module__course__topic_id')
+    }
+
+    resolved = []
+    for result in pending:
+        if result['user_id'] not in profiles:
+            result['status'] = PROFILE_NOT_FOUND if result['user_id'] in users_without_profile else USER_NOT_FOUND
+        elif result['lesson_id'] not in lessons:
+            result['status'] = LESSON_NOT_FOUND
+        else:
+            resolved.append(result)
+
+    for start in range(0, len(resolved), batch_size):
+        _complete_batch(resolved[start:start + batch_size], profiles, lessons)
+    return results
+
+
+def summarize(results):
+    """ {status: number of results}. """
+    summary = {}
+    for result in results:
+        summary[result['status']] = summary.get(result['status'], 0) + 1
+    return summary
+
+
+def _complete_batch(batch, profiles, lessons):
+    profile_ids = {profiles[result['user_id']] for result in batch}
+    lesson_ids = {result['lesson_id'] for result in batch}
+    now = timezone.now()
+    with transaction.atomic():
+        # Serializes with other completions for these users (see module docstring)
+        list(UserProfile.objects.select_for_update().filter(pk__in=profile_ids).order_by('id').values_list('id'))
+        existing = set(UserProgress.objects.filter(user_profile_id__in=profile_ids, lesson_id__in=lesson_ids)
+                       .values_list('user_profile_id', 'lesson_id').order_by())
+
+        new = []
+        for result in batch:
+            profile_id = profiles[result['user_id']]
+            if (profile_id, result['lesson_id']) in existing:
+                result['status'] = ALREADY_COMPLETED
+            else:
+                result['status'] = COMPLETED
+                result['xp_awarded'] = lessons[result['lesson_id']][0]
+                new.append((profile_id, result['lesson_id'], result['xp_awarded']))
+        if not new:
+            return
+
+        UserProgress.objects.bulk_create(
+            [UserProgress(user_profile_id=p, lesson_id=l) for p, l, _ in new], ignore_conflicts=True)
+        XPEvent.objects.bulk_create(
+            [XPEvent(user_profile_id=p, source_type=XPEvent.SOURCE_LESSON, source_id=l, amount=xp, created_at=now)
+             for p, l, xp in new],
+            ignore_conflicts=True)
+        progress_stats.record_lessons_completed([(p, lessons[l][1], xp) for p, l, xp in new], when=now)
+        badges.evaluate(badges.EVENT_LESSON_COMPLETED, {p for p, _, _ in new},
+                        topic_ids={lessons[l][1] for _, l, _ in new})
+        xp_ledger.fold_profiles({p for p, _, _ in new})
@@ -0,0 +1,60 @@
+"""
+Process-wide Gemini client registry.
+
+genai.configure() discards the SDK's cached gRPC clients, so configuring it
+in every request (as the views used to) opened new connections for every
+generation, and switching API keys per request raced between threads.
+Here the SDK is configured once per process, lazily on first use, from
+settings.GEMINI_API_KEY, and one GenerativeModel handle is kept per model
+name so its client (and connection) is reused across requests. A forked
+worker reconfigures on first use since gRPC channels must not cross a fork.
+"""
+import logging
+import os
+import threading
+
+import google.generativeai as genai
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_configured_pid = None
+_models = {}
+
+
+class LLMConfigurationError(Exception):
+    """ Raised when the Gemini client cannot be configured (e.g. missing API key). """
+
+
+def configure():
+    """ Configures the SDK for this process if not done yet. Safe to call on every request. """
+    global _configured_pid
+    if _configured_pid == os.getpid():
+        return
+    with _lock:
+        if _configured_pid == os.getpid():
+            return
+        api_key = getattr(settings, 'GEMINI_API_KEY', None)
+        if not api_key:
+            raise LLMConfigurationError("Server configuration error: Google API key not set.")
+        try:
+            genai.configure(api_key=api_key)
+        except Exception as e:
+            logger.error(f"Error configuring GenAI: {e}")
+            raise LLMConfigurationError("Server configuration error: Could not configure Google AI.") from e
+        _models.clear()
+        _configured_pid = os.getpid()
+        logger.info(f"GenAI configured (pid {_configured_pid})")
+
+
+def get_model(model_name):
+    """ The shared GenerativeModel handle for model_name. """
+    configure()
+    model = _models.get(model_name)
+    if model is None:
+        with _lock:
+            model = _models.get(model_name)
+            if model is None:
+                model = _models[model_name] = genai.GenerativeModel(model_name=model_name)
+    return model
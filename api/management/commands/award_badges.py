@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from api.badges import evaluate_all, rebuild_streaks
+from api.models import UserProfile
+
+
+class Command(BaseCommand):
+    help = "Awards every rule-based badge that users have already earned (e.g. after adding a badge)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help="Profiles evaluated per batch.")
+        parser.add_argument('--rebuild-streaks', action='store_true',
+                            help="First recompute quiz streaks from quiz history (needed once for existing users).")
+
+    def handle(self, *args, **options):
+        profile_ids = list(UserProfile.objects.order_by('id').values_list('id', flat=True))
+        batch_size = options['batch_size']
+        awarded = 0
+        for start in range(0, len(profile_ids), batch_size):
+            batch = profile_ids[start:start + batch_size]
+            if options['rebuild_streaks']:
+                rebuild_streaks(batch)
+            awarded += evaluate_all(batch)
+        self.stdout.write(f"Evaluated badges for {len(profile_ids)} profile(s): {awarded} badge(s) awarded.")
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from api.models import UserProfile
+from api.progress_stats import rebuild
+
+
+class Command(BaseCommand):
+    help = ("Rebuilds the progress-tracker rollups (DailyUserStats, UserTopicStats) "
+            "from UserProgress and QuizAttempt.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user-profile', type=int, action='append', dest='user_profiles',
+                            help="Only rebuild this profile id (repeatable).")
+        parser.add_argument('--batch-size', type=int, default=500, help="Profiles rebuilt per transaction.")
+
+    def handle(self, *args, **options):
+        profile_ids = options['user_profiles'] or list(UserProfile.objects.order_by('id').values_list('id', flat=True))
+        batch_size = options['batch_size']
+        rows = 0
+        for start in range(0, len(profile_ids), batch_size):
+            rows += rebuild(profile_ids[start:start + batch_size])
+        self.stdout.write(f"Rebuilt progress stats for {len(profile_ids)} profile(s): {rows} daily row(s).")
@@ -0,0 +1,71 @@
+import random
+import statistics
+import time
+import uuid
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from api import leaderboard
+from api.models import UserProfile
+
+BATCH_SIZE = 10000
+
+
+class Command(BaseCommand):
+    help = ("Times the leaderboard reads (top-N, page-by-rank, a user's rank and neighbours) and a rank lookup "
+            "against counting the profiles above, on synthetic profiles seeded in a transaction that is rolled "
+            "back. Seeding a million profiles takes a few minutes.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profiles', type=int, default=1_000_000, help="Synthetic profiles to seed.")
+        parser.add_argument('--repeat', type=int, default=20, help="Timed runs per read.")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            try:
+                start = time.perf_counter()
+                profiles = self._seed(options['profiles'])
+                distinct = leaderboard.rebuild()
+                self.stdout.write(f"Seeded {options['profiles']} profiles ({distinct} distinct XP values) "
+                                  f"in {time.perf_counter() - start:.0f} s")
+
+                middle = profiles[len(profiles) // 2]
+                reads = [
+                    ("top(10)", lambda: leaderboard.top(10)),
+                    ("page(middle, 50)", lambda: leaderboard.page(len(profiles) // 2, 50)),
+                    ("around(middle, 5)", lambda: leaderboard.around(middle, 5)),
+                    ("rank_for_xp(middle)", lambda: leaderboard.rank_for_xp(middle.xp)),
+                    ("count above (unbucketed)", lambda: 1 + UserProfile.objects.filter(xp__gt=middle.xp).count()),
+                ]
+                for label, read in reads:
+                    timings, queries = self._run(read, options['repeat'])
+                    self.stdout.write(f"{label:>24}: median {statistics.median(timings):.2f} ms, "
+                                      f"{queries} queries")
+            finally:
+                transaction.set_rollback(True)
+
+    def _seed(self, count):
+        """ Creates `count` users with profiles (XP skewed towards zero, like real activity). """
+        rng = random.Random(0)
+        tag = uuid.uuid4().hex[:8]
+        profiles = []
+        for offset in range(0, count, BATCH_SIZE):
+            users = User.objects.bulk_create(
+                [User(username=f"bench-{tag}-{i}") for i in range(offset, min(offset + BATCH_SIZE, count))])
+            # bulk_create skips the post_save signals that would create profiles and buckets one by one
+            profiles += UserProfile.objects.bulk_create(
+                [UserProfile(user=user, xp=int(rng.expovariate(1 / 2000))) for user in users])
+        return profiles
+
+    def _run(self, read, repeat):
+        timings = []
+        read()  # warm the page cache
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                read()
+                timings.append((time.perf_counter() - start) * 1000)
+        return timings, len(captured)
@@ -0,0 +1,64 @@
+import contextlib
+import io
+import statistics
+import time
+import uuid
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api.models import Choice, Course, LearningTopic, Module, Question, Quiz
+from api.views import submit_quiz
+
+
+class Command(BaseCommand):
+    help = ("Times submit_quiz on synthetic quizzes of increasing size, seeded in a transaction that is rolled "
+            "back, and reports the queries per submission (which should not grow with the quiz).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 500], help="Questions per quiz.")
+        parser.add_argument('--repeat', type=int, default=20, help="Timed submissions per quiz.")
+
+    def handle(self, *args, **options):
+        factory = APIRequestFactory()
+        with transaction.atomic():
+            try:
+                tag = f"bench-{uuid.uuid4().hex[:8]}"
+                user = User.objects.create_user(username=tag)
+                topic = LearningTopic.objects.create(title=tag)
+                module = Module.objects.create(course=Course.objects.create(topic=topic, title=tag, description=''),
+                                               title=tag)
+                for size in options['sizes']:
+                    quiz, answers = self._seed_quiz(module, size)
+                    timings, queries = [], []
+                    for run in range(options['repeat'] + 1):
+                        request = factory.post('/api/quizzes/submit/', {'quiz_id': quiz.pk, 'answers': answers},
+                                               format='json')
+                        force_authenticate(request, user=user)
+                        with CaptureQueriesContext(connection) as captured, \
+                                contextlib.redirect_stdout(io.StringIO()):  # the view logs every attempt
+                            start = time.perf_counter()
+                            response = submit_quiz(request)
+                            elapsed = time.perf_counter() - start
+                        if response.status_code != 200:
+                            raise CommandError(f"Submission failed ({response.status_code}): {response.data}")
+                        queries.append(len(captured))
+                        if run:  # the first run compiles the answer key
+                            timings.append(elapsed * 1000)
+                    warm = '-'.join(str(n) for n in sorted({min(queries[1:]), max(queries[1:])}))
+                    self.stdout.write(
+                        f"{size:>5} questions: median {statistics.median(timings):.1f} ms, "
+                        f"{warm} queries per submission ({queries[0]} with a cold answer key)")
+            finally:
+                transaction.set_rollback(True)
+
+    def _seed_quiz(self, module, size):
+        quiz = Quiz.objects.create(module=module, title=f"{size} questions")
+        questions = Question.objects.bulk_create([Question(quiz=quiz, text='?', order=i) for i in range(size)])
+        Choice.objects.bulk_create([Choice(question=question, text=str(c), is_correct=c == 0)
+                                    for question in questions for c in range(4)])
+        correct = Choice.objects.filter(question__quiz=quiz, is_correct=True).values_list('question_id', 'id')
+        return quiz, {str(question_id): choice_id for question_id, choice_id in correct}
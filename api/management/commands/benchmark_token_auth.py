@@ -0,0 +1,97 @@
+import contextlib
+import datetime
+import io
+import json
+import statistics
+import tempfile
+import time
+import uuid
+
+import jwt
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory
+
+from api import firebase_auth
+from api.firebase_auth import FirebaseAuthentication
+from api.firebase_keys import ID_TOKEN_ISSUER_PREFIX, FirebaseKeyring
+from api.token_cache import token_cache
+
+PROJECT_ID = 'benchmark-project'
+
+
+def _signing_key(directory):
+    """ (private key, kid, path of a {kid: PEM certificate} file) for a fresh self-signed key. """
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, 'benchmark')])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (x509.CertificateBuilder().subject_name(name).issuer_name(name).public_key(key.public_key())
+            .serial_number(x509.random_serial_number()).not_valid_before(now)
+            .not_valid_after(now + datetime.timedelta(days=1)).sign(key, hashes.SHA256()))
+    kid = uuid.uuid4().hex
+    path = f"{directory}/certs.json"
+    with open(path, 'w', encoding='utf-8') as fh:
+        json.dump({kid: cert.public_bytes(serialization.Encoding.PEM).decode('ascii')}, fh)
+    return key, kid, path
+
+
+class Command(BaseCommand):
+    help = ("Times FirebaseAuthentication.authenticate() per request with the verified-token cache cleared before "
+            "every request (signature check and user lookup each time) and with it warm, against a local "
+            "signing key. Seeds a user in a transaction that is rolled back.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help="Timed requests per mode.")
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as directory, transaction.atomic():
+            try:
+                key, kid, path = _signing_key(directory)
+                bench_keyring = FirebaseKeyring(source=path, project_id=PROJECT_ID)
+                bench_keyring.load()
+                uid = f"bench-{uuid.uuid4().hex[:8]}"
+                now = int(time.time())
+                token = jwt.encode({'iss': ID_TOKEN_ISSUER_PREFIX + PROJECT_ID, 'aud': PROJECT_ID, 'sub': uid,
+                                    'iat': now, 'exp': now + 3600, 'auth_time': now, 'email': f'{uid}@example.com'},
+                                   key, algorithm='RS256', headers={'kid': kid})
+                request = APIRequestFactory().get('/api/profile/', HTTP_AUTHORIZATION=f'Bearer {token}')
+
+                original_keyring, firebase_auth.keyring = firebase_auth.keyring, bench_keyring
+                try:
+                    self._authenticate(request)  # provisions the user
+                    for label, cold in (("without cache", True), ("with cache", False)):
+                        timings, queries = self._run(request, options['requests'], cold)
+                        self.stdout.write(f"{label:>14}: median {statistics.median(timings):.1f} us, "
+                                          f"{max(queries)} queries per request")
+                    self.stdout.write(f"token cache: {token_cache.stats()}")
+                finally:
+                    firebase_auth.keyring = original_keyring
+                    token_cache.clear()
+            finally:
+                transaction.set_rollback(True)
+
+    def _authenticate(self, request):
+        with contextlib.redirect_stdout(io.StringIO()):  # authenticate() logs every attempt
+            result = FirebaseAuthentication().authenticate(request)
+        if result is None:
+            raise CommandError("The benchmark token was not accepted.")
+        return result
+
+    def _run(self, request, repeat, cold):
+        timings, queries = [], []
+        token_cache.clear()
+        self._authenticate(request)
+        for _ in range(repeat):
+            if cold:
+                token_cache.clear()
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                self._authenticate(request)
+                timings.append((time.perf_counter() - start) * 1e6)
+            queries.append(len(captured))
+        return timings, queries
@@ -0,0 +1,16 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+
+class Command(BaseCommand):
+    help = ("Runs the query-plan tests (api.tests.QueryPlanTests) on a test database: seeds a synthetic dataset "
+            "and fails if the hot queries' plans use full table scans or sorts (SQLite and PostgreSQL).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profiles', type=int, default=20000, help="Synthetic users to seed.")
+
+    def handle(self, *args, **options):
+        with override_settings(QUERY_PLAN_PROFILES=options['profiles']):
+            call_command('test', 'api.tests.PlanProblemsTests', 'api.tests.QueryPlanTests',
+                         verbosity=options['verbosity'], interactive=False)
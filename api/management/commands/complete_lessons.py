@@ -0,0 +1,31 @@
+import csv
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.lesson_completion import COMPLETED, complete_lessons, summarize
+
+
+class Command(BaseCommand):
+    help = ("Marks lessons complete (awarding XP) for (user_id, lesson_id) pairs read from a CSV file "
+            "with user_id and lesson_id columns, e.g. an LMS export.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV file with a header row; '-' reads standard input.")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Pairs written per transaction.")
+
+    def handle(self, *args, **options):
+        stream = sys.stdin if options['path'] == '-' else open(options['path'], newline='', encoding='utf-8')
+        with stream:
+            reader = csv.DictReader(stream)
+            if not reader.fieldnames or not {'user_id', 'lesson_id'} <= set(reader.fieldnames):
+                raise CommandError("The CSV needs user_id and lesson_id columns.")
+            pairs = [(row['user_id'], row['lesson_id']) for row in reader]
+
+        results = complete_lessons(pairs, batch_size=options['batch_size'])
+        for line, result in enumerate(results, start=2):
+            if result['status'] != COMPLETED and options['verbosity'] > 1:
+                self.stdout.write(f"line {line}: {pairs[line - 2]} {result['status']}")
+        xp = sum(result['xp_awarded'] for result in results)
+        counts = ', '.join(f"{status}: {n}" for status, n in sorted(summarize(results).items()))
+        self.stdout.write(f"Processed {len(results)} pair(s), {xp} XP awarded ({counts or 'nothing to do'}).")
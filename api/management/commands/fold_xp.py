@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from api.xp_ledger import fold_all
+
+
+class Command(BaseCommand):
+    help = "Recomputes UserProfile.xp and level from the XP ledger (XPEvent) for every user."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help="Profiles updated per UPDATE statement.")
+
+    def handle(self, *args, **options):
+        updated = fold_all(batch_size=options['batch_size'])
+        self.stdout.write(f"Folded XP ledger: {updated} profile(s) brought up to date.")
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from api.leaderboard import rebuild
+
+
+class Command(BaseCommand):
+    help = "Recounts the leaderboard rank buckets (LeaderboardBucket) from UserProfile.xp."
+
+    def handle(self, *args, **options):
+        distinct = rebuild()
+        self.stdout.write(f"Leaderboard rebuilt: {distinct} distinct XP value(s).")
@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from api.summary_jobs import claim_next_job, requeue_stale_jobs, run_summary_job
+
+
+class Command(BaseCommand):
+    help = "Processes queued media summarization jobs (MediaSummaryJob) until stopped."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Drain the queue once and exit.")
+        parser.add_argument('--idle-sleep', type=float, default=2.0,
+                            help="Seconds to wait between polls when the queue is empty.")
+
+    def handle(self, *args, **options):
+        self.stdout.write("Summary job worker started.")
+        while True:
+            close_old_connections()
+            requeued = requeue_stale_jobs()
+            if requeued:
+                self.stdout.write(f"Requeued {requeued} stale job(s).")
+
+            job_id = claim_next_job()
+            if job_id is None:
+                if options['once']:
+                    break
+                time.sleep(options['idle_sleep'])
+                continue
+
+            self.stdout.write(f"Running summary job {job_id}...")
+            if not run_summary_job(job_id):
+                # The owner is at their AI limit (or the service is busy); the job is pending again
+                self.stdout.write(f"Deferred summary job {job_id}.")
+                if options['once']:
+                    break
+                time.sleep(options['idle_sleep'])
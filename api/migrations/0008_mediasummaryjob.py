@@ -0,0 +1,38 @@
+# Generated by Django 5.2.6 on 2026-10-16 22:35
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_firebaseidentity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaSummaryJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('uploading', 'Uploading to Google AI'), ('processing', 'Processing on Google AI'), ('generating', 'Generating summary'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('upload', models.FileField(blank=True, help_text='Local copy of the upload; removed once the job finishes', upload_to='summary_jobs/')),
+                ('file_name', models.CharField(max_length=255)),
+                ('prompt', models.TextField(blank=True)),
+                ('model_name', models.CharField(max_length=100)),
+                ('remote_file_name', models.CharField(blank=True, help_text='Google AI file name (files/...)', max_length=255)),
+                ('transcript', models.TextField(blank=True, null=True)),
+                ('summary', models.TextField(blank=True, null=True)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('user_profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='summary_jobs', to='api.userprofile')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='api_mediasu_status_dbba32_idx')],
+            },
+        ),
+    ]
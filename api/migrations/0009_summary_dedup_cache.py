@@ -0,0 +1,46 @@
+# Generated by Django 5.2.6 on 2026-10-16 22:36
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_mediasummaryjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RemoteMediaFile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64, unique=True)),
+                ('remote_file_name', models.CharField(max_length=255)),
+                ('expires_at', models.DateTimeField(help_text='Google deletes uploaded files after 48 hours')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='mediasummaryjob',
+            name='content_hash',
+            field=models.CharField(blank=True, help_text='SHA-256 of the uploaded bytes', max_length=64),
+        ),
+        migrations.CreateModel(
+            name='MediaSummaryCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64)),
+                ('model_name', models.CharField(max_length=100)),
+                ('prompt_hash', models.CharField(help_text='SHA-256 of the normalized user prompt', max_length=64)),
+                ('transcript', models.TextField()),
+                ('summary', models.TextField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_used_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('hit_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['last_used_at'], name='api_mediasu_last_us_cc4d1e_idx')],
+                'unique_together': {('content_hash', 'model_name', 'prompt_hash')},
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.6 on 2026-10-16 22:52
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_chat_sessions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='XPEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source_type', models.CharField(choices=[('lesson', 'Lesson completed'), ('quiz_attempt', 'Quiz passed'), ('legacy', 'XP before the ledger')], max_length=20)),
+                ('source_id', models.PositiveBigIntegerField()),
+                ('amount', models.IntegerField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('user_profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='xp_events', to='api.userprofile')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'unique_together': {('user_profile', 'source_type', 'source_id')},
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.6 on 2026-10-16 22:52
+
+from django.db import migrations
+
+
+def record_existing_xp(apps, schema_editor):
+    """ One 'legacy' event per profile so the ledger sums to the XP awarded before it existed. """
+    UserProfile = apps.get_model('api', 'UserProfile')
+    XPEvent = apps.get_model('api', 'XPEvent')
+    XPEvent.objects.bulk_create(
+        [XPEvent(user_profile_id=profile_id, source_type='legacy', source_id=profile_id, amount=xp)
+         for profile_id, xp in UserProfile.objects.filter(xp__gt=0).values_list('id', 'xp').iterator()],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+
+
+def remove_legacy_events(apps, schema_editor):
+    apps.get_model('api', 'XPEvent').objects.filter(source_type='legacy').delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_xp_ledger'),
+    ]
+
+    operations = [
+        migrations.RunPython(record_existing_xp, remove_legacy_events),
+    ]
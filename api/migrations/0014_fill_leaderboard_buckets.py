@@ -0,0 +1,30 @@
+# Generated by Django 5.2.6 on 2026-10-16 22:56
+
+from django.db import migrations
+from django.db.models import Count
+
+
+def count_profiles(apps, schema_editor):
+    """ Buckets for the profiles that exist before the leaderboard does. """
+    UserProfile = apps.get_model('api', 'UserProfile')
+    LeaderboardBucket = apps.get_model('api', 'LeaderboardBucket')
+    LeaderboardBucket.objects.bulk_create(
+        [LeaderboardBucket(xp=xp, count=n)
+         for xp, n in UserProfile.objects.order_by().values_list('xp').annotate(n=Count('id'))],
+        batch_size=1000,
+    )
+
+
+def remove_buckets(apps, schema_editor):
+    apps.get_model('api', 'LeaderboardBucket').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_leaderboard'),
+    ]
+
+    operations = [
+        migrations.RunPython(count_profiles, remove_buckets),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.6 on 2026-10-16 23:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_fill_leaderboard_buckets'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyUserStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('lessons_completed', models.PositiveIntegerField(default=0)),
+                ('quizzes_taken', models.PositiveIntegerField(default=0)),
+                ('quizzes_passed', models.PositiveIntegerField(default=0)),
+                ('quiz_score_total', models.FloatField(default=0, help_text='Sum of quiz scores (percent)')),
+                ('xp_earned', models.PositiveIntegerField(default=0)),
+                ('day', models.DateField()),
+                ('topic', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.learningtopic')),
+                ('user_profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='api.userprofile')),
+            ],
+            options={
+                'ordering': ['-day'],
+                'unique_together': {('user_profile', 'day', 'topic')},
+            },
+        ),
+        migrations.CreateModel(
+            name='UserTopicStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('lessons_completed', models.PositiveIntegerField(default=0)),
+                ('quizzes_taken', models.PositiveIntegerField(default=0)),
+                ('quizzes_passed', models.PositiveIntegerField(default=0)),
+                ('quiz_score_total', models.FloatField(default=0, help_text='Sum of quiz scores (percent)')),
+                ('xp_earned', models.PositiveIntegerField(default=0)),
+                ('topic', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.learningtopic')),
+                ('user_profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='topic_stats', to='api.userprofile')),
+            ],
+            options={
+                'unique_together': {('user_profile', 'topic')},
+            },
+        ),
+    ]
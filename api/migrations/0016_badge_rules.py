@@ -0,0 +1,37 @@
+# Generated by Django 5.2.6 on 2026-10-16 23:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_progress_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuizStreak',
+            fields=[
+                ('user_profile', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='quiz_streak', serialize=False, to='api.userprofile')),
+                ('current', models.PositiveIntegerField(default=0)),
+                ('best', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='badge',
+            name='rule',
+            field=models.CharField(blank=True, choices=[('lessons', 'Lessons completed (in the topic, if set)'), ('quizzes_passed', 'Quizzes passed (in the topic, if set)'), ('quiz_streak', 'Quizzes passed in a row'), ('xp', 'Total XP')], db_index=True, help_text='Leave empty for badges awarded by hand', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='badge',
+            name='threshold',
+            field=models.PositiveIntegerField(blank=True, help_text='Counter value that earns the badge', null=True),
+        ),
+        migrations.AddField(
+            model_name='badge',
+            name='topic',
+            field=models.ForeignKey(blank=True, help_text='Only for lesson and quiz counts; empty counts every topic', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='badges', to='api.learningtopic'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-16 23:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_badge_rules'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chatsession',
+            index=models.Index(fields=['user_profile', '-updated_at'], name='chatsession_user_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quizattempt',
+            index=models.Index(fields=['user_profile', '-start_time', '-id'], name='quizattempt_user_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quizattempt',
+            index=models.Index(fields=['user_profile', 'quiz', '-start_time'], name='quizattempt_user_quiz_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userbadge',
+            index=models.Index(fields=['user_profile', '-earned_at'], name='userbadge_user_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userprogress',
+            index=models.Index(fields=['user_profile', '-completed_at'], name='userprogress_user_recent_idx'),
+        ),
+    ]
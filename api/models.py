@@ -1,5 +1,9 @@
+import uuid
+
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 # Create your models here.
 
@@ -12,6 +16,12 @@ class UserProfile(models.Model):
     # Add other profile fields here if needed:
     # avatar = models.ImageField(upload_to='avatars/', null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # Leaderboard order (see leaderboard.py); id breaks ties
+            models.Index(fields=['-xp', 'id'], name='userprofile_xp_rank_idx'),
+        ]
+
     def __str__(self):
         return f"{self.user.username}'s Profile"
 
@@ -22,9 +32,24 @@ from django.dispatch import receiver
 
 @receiver(post_save, sender=User)
 def create_or_update_user_profile(sender, instance, created, **kwargs):
+    # Only create on insert; re-saving an unchanged profile on every User save
+    # was a redundant write (and doubled the writes on first login).
     if created:
         UserProfile.objects.create(user=instance)
-    instance.profile.save()
+
+
+class FirebaseIdentity(models.Model):
+    """
+    Maps a Firebase Auth UID to the Django User it signs in as. A user may
+    have several UIDs with the same email (an account deleted and recreated
+    in Firebase, or unmerged password and Google providers).
+    """
+    uid = models.CharField(max_length=128, unique=True, help_text="Firebase Auth UID (token 'sub' claim)")
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='firebase_identities')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.uid} -> {self.user.username}"
 
 
 class LearningTopic(models.Model):
@@ -111,6 +136,9 @@ class UserProgress(models.Model):
     class Meta:
         unique_together = ('user_profile', 'lesson') # User can complete a lesson only once
         ordering = ['-completed_at']
+        indexes = [
+            models.Index(fields=['user_profile', '-completed_at'], name='userprogress_user_recent_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user_profile.user.username} completed {self.lesson.title}"
@@ -118,12 +146,38 @@ class UserProgress(models.Model):
 # --- Badge Models ---
 
 class Badge(models.Model):
-    """ Represents an achievable badge. """
+    """
+    Represents an achievable badge. Badges with a rule are awarded
+    automatically once the user's counter reaches the threshold (see
+    badges.py); badges without one are awarded by hand.
+    """
+    RULE_LESSONS = 'lessons'
+    RULE_QUIZZES_PASSED = 'quizzes_passed'
+    RULE_QUIZ_STREAK = 'quiz_streak'
+    RULE_XP = 'xp'
+    RULE_CHOICES = (
+        (RULE_LESSONS, 'Lessons completed (in the topic, if set)'),
+        (RULE_QUIZZES_PASSED, 'Quizzes passed (in the topic, if set)'),
+        (RULE_QUIZ_STREAK, 'Quizzes passed in a row'),
+        (RULE_XP, 'Total XP'),
+    )
+    TOPIC_RULES = (RULE_LESSONS, RULE_QUIZZES_PASSED)
+
     name = models.CharField(max_length=100, unique=True)
     description = models.TextField()
     icon_emoji = models.CharField(max_length=10, blank=True, help_text="Emoji character for the badge (e.g., 🏆)")
     # icon_image = models.ImageField(upload_to='badge_icons/', null=True, blank=True) # Alternative image upload
-    # criteria = models.JSONField(null=True, blank=True) # Could store criteria for automatic awarding
+    rule = models.CharField(max_length=20, choices=RULE_CHOICES, blank=True, db_index=True,
+                            help_text="Leave empty for badges awarded by hand")
+    threshold = models.PositiveIntegerField(null=True, blank=True, help_text="Counter value that earns the badge")
+    topic = models.ForeignKey(LearningTopic, null=True, blank=True, on_delete=models.CASCADE, related_name='badges',
+                              help_text="Only for lesson and quiz counts; empty counts every topic")
+
+    def clean(self):
+        if self.rule and not self.threshold:
+            raise ValidationError({'threshold': "A badge with a rule needs a threshold."})
+        if self.topic_id and self.rule not in self.TOPIC_RULES:
+            raise ValidationError({'topic': "Only lesson and quiz-pass rules can be limited to a topic."})
 
     def __str__(self):
         return self.name
@@ -137,6 +191,9 @@ class UserBadge(models.Model):
     class Meta:
         unique_together = ('user_profile', 'badge') # User earns a badge only once
         ordering = ['-earned_at']
+        indexes = [
+            models.Index(fields=['user_profile', '-earned_at'], name='userbadge_user_recent_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user_profile.user.username} earned {self.badge.name}"
@@ -147,7 +204,6 @@ class UserBadge(models.Model):
 # class Question(models.Model): ...
 # class Answer(models.Model): ...
 # class UserSubmission(models.Model): ...
-# class ChatHistory(models.Model): ...
 # class Certificate(models.Model): ...
 # class ARModel(models.Model): ...
 # class CaseStudy(models.Model): ...
@@ -229,6 +285,13 @@ class QuizAttempt(models.Model):
     passed = models.BooleanField(default=False)
     is_complete = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            # A user's attempts, newest first: overall (streaks, history; id breaks ties) and per quiz
+            models.Index(fields=['user_profile', '-start_time', '-id'], name='quizattempt_user_recent_idx'),
+            models.Index(fields=['user_profile', 'quiz', '-start_time'], name='quizattempt_user_quiz_idx'),
+        ]
+
     def __str__(self):
         return f"Attempt by {self.user_profile.user.username} on {self.quiz.title} (Score: {self.score}%)"
 
@@ -241,4 +304,218 @@ class Answer(models.Model):
     is_correct = models.BooleanField(default=False)
 
     def __str__(self):
-        return f"Answer to Q{self.question.order} in Attempt {self.quiz_attempt.id}" 
\ No newline at end of file
+        return f"Answer to Q{self.question.order} in Attempt {self.quiz_attempt.id}"
+
+
+# --- XP Ledger ---
+
+class XPEvent(models.Model):
+    """
+    Append-only record of XP awarded to a user. UserProfile.xp and level are
+    a fold of these rows (see xp_ledger.py); each source awards at most once.
+    """
+    SOURCE_LESSON = 'lesson'
+    SOURCE_QUIZ_ATTEMPT = 'quiz_attempt'
+    SOURCE_LEGACY = 'legacy'
+    SOURCE_CHOICES = (
+        (SOURCE_LESSON, 'Lesson completed'),
+        (SOURCE_QUIZ_ATTEMPT, 'Quiz passed'),
+        (SOURCE_LEGACY, 'XP before the ledger'),
+    )
+
+    user_profile = models.ForeignKey(UserProfile, related_name='xp_events', on_delete=models.CASCADE)
+    source_type = models.CharField(max_length=20, choices=SOURCE_CHOICES)
+    source_id = models.PositiveBigIntegerField()
+    amount = models.IntegerField()
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = ('user_profile', 'source_type', 'source_id')
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.amount} XP to {self.user_profile.user.username} ({self.source_type} {self.source_id})"
+
+
+# --- Leaderboard ---
+
+class LeaderboardBucket(models.Model):
+    """
+    Number of profiles holding exactly `xp`. A user's rank is 1 + the counts of
+    all buckets above their XP (see leaderboard.py).
+    """
+    xp = models.PositiveIntegerField(primary_key=True)
+    count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.count} profile(s) at {self.xp} XP"
+
+
+# --- Progress Rollups ---
+
+class ActivityCounters(models.Model):
+    """ Counters shared by the progress rollups (maintained by progress_stats.py). """
+    lessons_completed = models.PositiveIntegerField(default=0)
+    quizzes_taken = models.PositiveIntegerField(default=0)
+    quizzes_passed = models.PositiveIntegerField(default=0)
+    quiz_score_total = models.FloatField(default=0, help_text="Sum of quiz scores (percent)")
+    xp_earned = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+
+class DailyUserStats(ActivityCounters):
+    """ One user's activity in one topic on one day. Feeds the progress-tracker graphs. """
+    user_profile = models.ForeignKey(UserProfile, related_name='daily_stats', on_delete=models.CASCADE)
+    day = models.DateField()
+    topic = models.ForeignKey(LearningTopic, related_name='+', on_delete=models.CASCADE)
+
+    class Meta:
+        unique_together = ('user_profile', 'day', 'topic')  # also serves per-user date range reads
+        ordering = ['-day']
+
+    def __str__(self):
+        return f"{self.user_profile.user.username} on {self.day} ({self.topic.title})"
+
+
+class UserTopicStats(ActivityCounters):
+    """ One user's all-time activity in one topic. Feeds topic performance. """
+    user_profile = models.ForeignKey(UserProfile, related_name='topic_stats', on_delete=models.CASCADE)
+    topic = models.ForeignKey(LearningTopic, related_name='+', on_delete=models.CASCADE)
+
+    class Meta:
+        unique_together = ('user_profile', 'topic')
+
+    def __str__(self):
+        return f"{self.user_profile.user.username} in {self.topic.title}"
+
+
+class QuizStreak(models.Model):
+    """ A user's run of consecutive passed quizzes, for streak badges (maintained by badges.py). """
+    user_profile = models.OneToOneField(UserProfile, primary_key=True, related_name='quiz_streak',
+                                        on_delete=models.CASCADE)
+    current = models.PositiveIntegerField(default=0)
+    best = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user_profile.user.username}: {self.current} in a row (best {self.best})"
+
+
+# --- AI Tool Jobs ---
+
+class MediaSummaryJob(models.Model):
+    """ A media summarization request processed in the background (see summary_jobs.py). """
+    STATUS_PENDING = 'pending'
+    STATUS_UPLOADING = 'uploading'
+    STATUS_PROCESSING = 'processing'
+    STATUS_GENERATING = 'generating'
+    STATUS_COMPLETED = 'completed'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = (
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_UPLOADING, 'Uploading to Google AI'),
+        (STATUS_PROCESSING, 'Processing on Google AI'),
+        (STATUS_GENERATING, 'Generating summary'),
+        (STATUS_COMPLETED, 'Completed'),
+        (STATUS_FAILED, 'Failed'),
+    )
+    ACTIVE_STATUSES = (STATUS_UPLOADING, STATUS_PROCESSING, STATUS_GENERATING)
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user_profile = models.ForeignKey(UserProfile, related_name='summary_jobs', on_delete=models.CASCADE)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    upload = models.FileField(upload_to='summary_jobs/', blank=True, help_text="Local copy of the upload; removed once the job finishes")
+    file_name = models.CharField(max_length=255)
+    prompt = models.TextField(blank=True)
+    model_name = models.CharField(max_length=100)
+    content_hash = models.CharField(max_length=64, blank=True, help_text="SHA-256 of the uploaded bytes")
+    remote_file_name = models.CharField(max_length=255, blank=True, help_text="Google AI file name (files/...)")
+    transcript = models.TextField(blank=True, null=True)
+    summary = models.TextField(blank=True, null=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),  # worker claim order
+        ]
+
+    def __str__(self):
+        return f"Summary job {self.id} ({self.status}) for {self.file_name}"
+
+
+class RemoteMediaFile(models.Model):
+    """ Google AI file previously uploaded for a given content hash (reused while ACTIVE). """
+    content_hash = models.CharField(max_length=64, unique=True)
+    remote_file_name = models.CharField(max_length=255)
+    expires_at = models.DateTimeField(help_text="Google deletes uploaded files after 48 hours")
+
+    def __str__(self):
+        return f"{self.content_hash[:12]}... -> {self.remote_file_name}"
+
+
+class MediaSummaryCache(models.Model):
+    """ Stored summarization result keyed by (content hash, model, normalized prompt). """
+    content_hash = models.CharField(max_length=64)
+    model_name = models.CharField(max_length=100)
+    prompt_hash = models.CharField(max_length=64, help_text="SHA-256 of the normalized user prompt")
+    transcript = models.TextField()
+    summary = models.TextField()
+    created_at = models.DateTimeField(default=timezone.now)
+    last_used_at = models.DateTimeField(default=timezone.now)
+    hit_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('content_hash', 'model_name', 'prompt_hash')
+        indexes = [
+            models.Index(fields=['last_used_at']),  # LRU eviction
+        ]
+
+    def __str__(self):
+        return f"Summary cache {self.content_hash[:12]}... ({self.model_name})"
+
+
+# --- Chat Models ---
+
+class ChatSession(models.Model):
+    """
+    A server-side chatbot conversation. Older turns are rolled up into `summary`
+    (see chat_sessions.py) so the context sent to the model stays within budget.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user_profile = models.ForeignKey(UserProfile, related_name='chat_sessions', on_delete=models.CASCADE)
+    title = models.CharField(max_length=255, blank=True)
+    summary = models.TextField(blank=True, help_text="Rolled-up summary of messages up to summarized_until")
+    summarized_until = models.PositiveBigIntegerField(default=0, help_text="Id of the last message folded into the summary")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-updated_at']
+        indexes = [
+            models.Index(fields=['user_profile', '-updated_at'], name='chatsession_user_recent_idx'),
+        ]
+
+    def __str__(self):
+        return f"Chat {self.id} ({self.user_profile.user.username})"
+
+class ChatMessage(models.Model):
+    ROLE_CHOICES = (
+        ('user', 'User'),
+        ('model', 'Model'),
+    )
+    session = models.ForeignKey(ChatSession, related_name='messages', on_delete=models.CASCADE)
+    role = models.CharField(max_length=10, choices=ROLE_CHOICES)
+    text = models.TextField()
+    token_estimate = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+
+    def __str__(self):
+        return f"{self.role}: {self.text[:50]}..."
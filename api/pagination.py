@@ -0,0 +1,12 @@
+from rest_framework.pagination import CursorPagination
+
+
+class CatalogCursorPagination(CursorPagination):
+    """
+    Opaque ?cursor= pages in id order. Unlike offset pages they cost the same
+    at any depth and stay consistent while courses are added.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = 'id'
@@ -0,0 +1,181 @@
+"""
+Progress-tracker rollups.
+
+DailyUserStats counts one user's activity per day and topic, and
+UserTopicStats keeps the all-time totals per topic. Both are incremented in
+the transaction that records a lesson completion or a quiz attempt, so the
+progress tracker reads at most ~6 months of daily rows and one row per
+topic, however long the user's history is.
+
+`manage.py backfill_progress_stats` rebuilds the rollups from UserProgress
+and QuizAttempt. XP is counted as lesson xp_value and quiz xp_reward, which
+is what those events award.
+"""
+import datetime
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from .models import DailyUserStats, QuizAttempt, UserProgress, UserTopicStats
+
+COUNTERS = ('lessons_completed', 'quizzes_taken', 'quizzes_passed', 'quiz_score_total', 'xp_earned')
+WEEK_DAYS = 7
+MONTHS = 6
+
+
+# --- Incremental updates ---
+
+def _increment(model, lookup, deltas):
+    model.objects.bulk_create([model(**lookup)], ignore_conflicts=True)
+    model.objects.filter(**lookup).update(**{field: F(field) + value for field, value in deltas.items()})
+
+
+def _record(user_profile_id, topic_id, when, **deltas):
+    day = timezone.localdate(when)
+    _increment(DailyUserStats, {'user_profile_id': user_profile_id, 'day': day, 'topic_id': topic_id}, deltas)
+    _increment(UserTopicStats, {'user_profile_id': user_profile_id, 'topic_id': topic_id}, deltas)
+
+
+def record_lesson_completed(user_profile_id, topic_id, xp, when=None):
+    _record(user_profile_id, topic_id, when, lessons_completed=1, xp_earned=xp)
+
+
+def _increment_many(model, key_fields, deltas_by_key, batch_size=500):
+    """
+    _increment() for many rows: {key tuple (values of key_fields): {counter: delta}}.
+    Rows that differ only in their first key field and get the same deltas
+    share one UPDATE (e.g. every user who completed one 10 XP lesson in a topic).
+    """
+    keys = list(deltas_by_key)
+    for start in range(0, len(keys), batch_size):
+        model.objects.bulk_create([model(**dict(zip(key_fields, key))) for key in keys[start:start + batch_size]],
+                                  ignore_conflicts=True)
+    groups = {}
+    for key, deltas in deltas_by_key.items():
+        groups.setdefault((key[1:], tuple(sorted(deltas.items()))), []).append(key[0])
+    for (rest, deltas), firsts in groups.items():
+        for start in range(0, len(firsts), batch_size):
+            model.objects.filter(**{f'{key_fields[0]}__in': firsts[start:start + batch_size]},
+                                 **dict(zip(key_fields[1:], rest))).update(
+                **{field: F(field) + value for field, value in deltas})
+
+
+def record_lessons_completed(completions, when=None):
+    """ record_lesson_completed() for many (user_profile_id, topic_id, xp) completions at once. """
+    day = timezone.localdate(when)
+    totals = {}
+    for user_profile_id, topic_id, xp in completions:
+        counters = totals.setdefault((user_profile_id, topic_id), {'lessons_completed': 0, 'xp_earned': 0})
+        counters['lessons_completed'] += 1
+        counters['xp_earned'] += xp
+    _increment_many(DailyUserStats, ('user_profile_id', 'day', 'topic_id'),
+                    {(p, day, t): counters for (p, t), counters in totals.items()})
+    _increment_many(UserTopicStats, ('user_profile_id', 'topic_id'), totals)
+
+
+def record_quiz_attempt(user_profile_id, topic_id, score, passed, xp, when=None):
+    _record(user_profile_id, topic_id, when, quizzes_taken=1, quizzes_passed=int(passed),
+            quiz_score_total=score or 0, xp_earned=xp if passed else 0)
+
+
+# --- Backfill ---
+
+def rebuild(user_profile_ids):
+    """ Recomputes both rollups for the given profiles. Returns the number of daily rows written. """
+    days = {}
+
+    def add(key, **deltas):
+        counters = days.setdefault(key, dict.fromkeys(COUNTERS, 0))
+        for field, value in deltas.items():
+            counters[field] += value or 0
+
+    lessons = (UserProgress.objects.filter(user_profile_id__in=user_profile_ids)
+               .annotate(day=TruncDate('completed_at'))
+               .values('user_profile_id', 'day', topic_id=F('lesson__module__course__topic_id'))
+               .annotate(n=Count('id'), xp=Sum('lesson__xp_value')).order_by())
+    for row in lessons:
+        add((row['user_profile_id'], row['day'], row['topic_id']), lessons_completed=row['n'], xp_earned=row['xp'])
+
+    quizzes = (QuizAttempt.objects.filter(user_profile_id__in=user_profile_ids, is_complete=True)
+               .annotate(day=TruncDate(Coalesce('end_time', 'start_time')))
+               .values('user_profile_id', 'day', topic_id=F('quiz__module__course__topic_id'))
+               .annotate(n_taken=Count('id'), n_passed=Count('id', filter=Q(passed=True)),
+                         score_total=Sum('score'), xp=Sum('quiz__xp_reward', filter=Q(passed=True)))
+               .order_by())
+    for row in quizzes:
+        add((row['user_profile_id'], row['day'], row['topic_id']), quizzes_taken=row['n_taken'],
+            quizzes_passed=row['n_passed'], quiz_score_total=row['score_total'], xp_earned=row['xp'])
+
+    totals = {}
+    for (user_profile_id, _, topic_id), counters in days.items():
+        topic_totals = totals.setdefault((user_profile_id, topic_id), dict.fromkeys(COUNTERS, 0))
+        for field, value in counters.items():
+            topic_totals[field] += value
+
+    with transaction.atomic():
+        DailyUserStats.objects.filter(user_profile_id__in=user_profile_ids).delete()
+        UserTopicStats.objects.filter(user_profile_id__in=user_profile_ids).delete()
+        DailyUserStats.objects.bulk_create(
+            [DailyUserStats(user_profile_id=p, day=d, topic_id=t, **c) for (p, d, t), c in days.items()],
+            batch_size=1000)
+        UserTopicStats.objects.bulk_create(
+            [UserTopicStats(user_profile_id=p, topic_id=t, **c) for (p, t), c in totals.items()],
+            batch_size=1000)
+    return len(days)
+
+
+# --- Progress tracker ---
+
+def _month_starts(today, count):
+    year, month = today.year, today.month
+    starts = []
+    for _ in range(count):
+        starts.append(datetime.date(year, month, 1))
+        year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+    return starts[::-1]
+
+
+def progress_charts(user_profile_id=None):
+    """
+    The progress tracker's topic_performance, weekly_graph (XP per day, last 7
+    days) and monthly_graph (XP per month, last 6 months) blocks, from two
+    indexed reads. Without a user the graphs are all zero.
+    """
+    today = timezone.localdate()
+    week = [today - datetime.timedelta(days=n) for n in range(WEEK_DAYS - 1, -1, -1)]
+    months = _month_starts(today, MONTHS)
+
+    xp_by_day = {}
+    topic_performance = []
+    if user_profile_id is not None:
+        xp_by_day = dict(DailyUserStats.objects
+                         .filter(user_profile_id=user_profile_id, day__gte=min(months[0], week[0]))
+                         .values_list('day').annotate(xp=Sum('xp_earned')).order_by())
+        topics = (UserTopicStats.objects.filter(user_profile_id=user_profile_id)
+                  .values_list('topic__title', 'quiz_score_total', 'quizzes_taken', 'lessons_completed')
+                  .order_by('topic__title'))
+        topic_performance = [
+            {'topic': title, 'performance': round(score_total / taken) if taken else None,
+             'quizzes_taken': taken, 'lessons_completed': lessons}
+            for title, score_total, taken, lessons in topics
+        ]
+
+    xp_by_month = dict.fromkeys(months, 0)
+    for day, xp in xp_by_day.items():
+        month = day.replace(day=1)
+        if month in xp_by_month:
+            xp_by_month[month] += xp
+
+    return {
+        'topic_performance': topic_performance,
+        'weekly_graph': {
+            'labels': [day.strftime('%a') for day in week],
+            'data': [xp_by_day.get(day, 0) for day in week],
+        },
+        'monthly_graph': {
+            'labels': [month.strftime('%b') for month in months],
+            'data': list(xp_by_month.values()),
+        },
+    }
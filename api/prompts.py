@@ -0,0 +1,144 @@
+"""
+Prompt templates and response parsing shared by the Gemini-backed views.
+
+Both the sync DRF views (views.py) and their async counterparts
+(async_views.py) build prompts and parse responses through these helpers so
+the two execution paths cannot drift apart.
+"""
+from datetime import datetime
+
+# --- Media Summarization ---
+
+# Models available for summarization (consider moving this to settings)
+AVAILABLE_SUMMARY_MODELS = [
+    "gemini-1.5-flash",
+    "gemini-1.5-pro",
+    # Add other models as needed and available
+]
+DEFAULT_SUMMARY_MODEL = 'gemini-1.5-flash'
+
+
+def build_summary_prompt(user_prompt, file_name):
+    """ Returns the user's prompt, or the detailed default transcript/summary prompt. """
+    if user_prompt and not user_prompt.isspace():
+        return user_prompt
+    current_date = datetime.now().strftime("%B %d, %Y")
+    return f"""Please analyze the provided media and provide a detailed response in the following format:
+
+## Transcript:
+Provide a detailed transcript with timestamps in [HH:MM:SS] format where applicable.
+
+## Summary:
+Media Title: {file_name}
+Date: {current_date}
+
+Key Points (with timestamps if possible):
+- Point 1 [HH:MM:SS]
+- Point 2 [HH:MM:SS]
+
+Discussion Topics:
+- Topic 1 ([HH:MM:SS - HH:MM:SS])
+  - Detail
+
+Action Items:
+- Item 1 (Assigned: ?, Timestamp: [HH:MM:SS])
+
+Conclusions:
+[Summary of final decisions and next steps with timestamps]
+
+Note: Please ensure summaries are supported by timestamps where possible."""
+
+
+def parse_summary_response(text):
+    """ Splits a model response into (transcript, summary) on the '## Summary:' header. """
+    try:
+        # Basic split - assumes response strictly follows the ## headers
+        parts = text.split('## Summary:', 1)
+        transcript_part = parts[0].replace('## Transcript:', '').strip()
+        summary_part = parts[1].strip() if len(parts) > 1 else "Summary could not be parsed."
+    except Exception as parse_error:
+        print(f"Error parsing response text: {parse_error}")
+        # Return the raw text if parsing fails
+        transcript_part = text
+        summary_part = "Could not parse summary from response."
+    return transcript_part, summary_part
+
+
+# --- Case Study Generation ---
+
+CASE_STUDY_MODEL = 'gemini-1.5-flash'
+# Bump whenever build_case_study_prompt changes so cached responses are not reused
+CASE_STUDY_PROMPT_VERSION = 1
+
+
+def build_case_study_prompt(user_prompt):
+    # Enhance the user prompt to guide the AI
+    return f"""Generate a detailed and insightful case study based on the following topic or request:
+
+**Topic/Request:** {user_prompt}
+
+**Instructions for Case Study:**
+- Clearly define the problem or situation.
+- Provide relevant background information.
+- Describe the challenges faced.
+- Detail the actions taken or solutions implemented.
+- Analyze the results and outcomes.
+- Conclude with key takeaways or lessons learned.
+- Ensure the case study is well-structured, informative, and engaging.
+
+**Generated Case Study:**
+"""
+
+
+# --- Assignment Checker ---
+
+# Use safety settings appropriate for student work analysis
+ASSIGNMENT_SAFETY_SETTINGS = {
+    'HATE': 'BLOCK_MEDIUM_AND_ABOVE',
+    'HARASSMENT': 'BLOCK_MEDIUM_AND_ABOVE',
+    'SEXUAL' : 'BLOCK_MEDIUM_AND_ABOVE',
+    'DANGEROUS' : 'BLOCK_MEDIUM_AND_ABOVE'
+}
+ASSIGNMENT_MAX_LENGTH = 15000
+ASSIGNMENT_DISCLAIMER = "\n\n---\n**Note:** This feedback focuses on correctness and clarity. For plagiarism detection against external sources, please use a dedicated plagiarism checking tool."
+
+
+def build_assignment_prompt(assignment_text):
+    # Modified prompt: Removed the request for Originality Assessment
+    return f"""
+    Analyze the following assignment text submitted by a student. Provide feedback on the following aspects:
+
+    1.  **Correctness:** Briefly evaluate the potential factual accuracy and correctness of the content based on general knowledge. Point out any obvious errors or questionable statements. Be concise.
+    2.  **Clarity & Structure:** Assess the clarity of the writing, the logical flow of ideas, and the overall structure. Suggest specific improvements if needed. Be concise.
+
+    Present the feedback clearly, using markdown formatting with sections for **Correctness** and **Clarity & Structure**.
+
+    Assignment Text:
+    ---BEGIN ASSIGNMENT---
+    {assignment_text}
+    ---END ASSIGNMENT---
+    """
+
+
+# --- Chatbot Context Rollup ---
+
+CHAT_SUMMARY_PREFIX = "Summary of our conversation so far:"
+CHAT_SUMMARY_ACK = "Understood, I'll keep that context in mind."
+
+
+def build_chat_rollup_prompt(previous_summary, turns):
+    """ Asks the model to fold older chat turns into the running conversation summary. """
+    transcript = "\n".join(f"{'Student' if role == 'user' else 'Assistant'}: {text}" for role, text in turns)
+    previous = previous_summary or "(none yet)"
+    return f"""You maintain a running summary of a tutoring conversation between a student and an AI assistant.
+Update the summary so it also covers the new turns below. Keep facts the student shared, their goals,
+open questions, and any decisions or explanations the assistant gave that later turns may refer to.
+Be concise (at most 250 words) and write plain prose without headings.
+
+Current summary:
+{previous}
+
+New turns:
+{transcript}
+
+Updated summary:"""
@@ -0,0 +1,147 @@
+"""
+Query-plan checks for the hot read paths.
+
+Each check builds the main query of an endpoint (or of a write path that
+runs on every event) for one sample user and EXPLAINs it. A check fails if
+the plan reads a hot table with a full scan, or sorts rows that an index
+should already return in order. api.tests.QueryPlanTests runs them against
+a synthetic dataset from seed(); `manage.py check_query_plans --profiles N`
+runs those tests with a larger one.
+
+Plans are read from SQLite's EXPLAIN QUERY PLAN and PostgreSQL's EXPLAIN.
+Other databases are not supported.
+"""
+import random
+import re
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Sum
+from django.utils import timezone
+
+from . import leaderboard
+from .models import (
+    Badge, ChatSession, Course, DailyUserStats, LeaderboardBucket, LearningTopic, Lesson, Module, Quiz,
+    QuizAttempt, UserBadge, UserProfile, UserProgress, XPEvent,
+)
+
+
+# --- Checked queries ---
+
+def _checks(sample):
+    return [
+        ('leaderboard top', UserProfile.objects.order_by('-xp', 'id')
+         .values_list(*leaderboard.ENTRY_FIELDS)[:10]),
+        ('leaderboard page', UserProfile.objects.filter(xp__lte=sample['xp']).order_by('-xp', 'id')
+         .values_list(*leaderboard.ENTRY_FIELDS)[40:60]),
+        ('leaderboard rank', LeaderboardBucket.objects.filter(xp__gt=sample['xp']).values_list('count')),
+        ('leaderboard around (same xp)', UserProfile.objects.filter(xp=sample['xp'], id__lt=sample['user_profile_id'])
+         .order_by('-id').values_list(*leaderboard.ENTRY_FIELDS)[:5]),
+        ('my badges', UserBadge.objects.filter(user_profile_id=sample['user_profile_id']).select_related('badge')),
+        ('recent lesson progress', UserProgress.objects.filter(user_profile_id=sample['user_profile_id'])[:20]),
+        ('completed lessons check', UserProgress.objects.filter(user_profile_id=sample['user_profile_id'],
+                                                                lesson_id__in=sample['lesson_ids'])
+         .values_list('user_profile_id', 'lesson_id').order_by()),
+        ('latest quiz attempt', QuizAttempt.objects.filter(user_profile_id=sample['user_profile_id'],
+                                                           quiz_id=sample['quiz_id']).order_by('-start_time')[:1]),
+        ('quiz attempt history', QuizAttempt.objects.filter(user_profile_id=sample['user_profile_id'],
+                                                            is_complete=True).order_by('start_time', 'id')
+         .values_list('passed')),
+        ('xp fold', XPEvent.objects.filter(user_profile_id=sample['user_profile_id'])
+         .values('user_profile_id').annotate(total=Sum('amount')).order_by()),
+        ('progress graphs', DailyUserStats.objects.filter(user_profile_id=sample['user_profile_id'],
+                                                         day__gte=timezone.localdate() - timedelta(days=190))
+         .values_list('day').annotate(xp=Sum('xp_earned')).order_by()),
+        ('chat sessions', ChatSession.objects.filter(user_profile__user_id=sample['user_id'])),
+    ]
+
+
+# --- Reading plans ---
+
+_SQLITE_FULL_SCAN = re.compile(r'\bSCAN (\w+)\b(?! USING (?:COVERING )?INDEX| USING INTEGER PRIMARY KEY)')
+
+# Content tables that stay small whatever the number of users; the planner may scan them
+LOOKUP_TABLES = {'api_badge', 'api_learningtopic'}
+
+
+def plan_problems(plan, vendor):
+    """ Problems found in an EXPLAIN output: full scans of per-user tables and sorts. """
+    if vendor == 'sqlite':
+        scanned = _SQLITE_FULL_SCAN.findall(plan)
+        sorts = 'USE TEMP B-TREE' in plan
+    else:
+        scanned = re.findall(r'Seq Scan on (\w+)', plan)
+        sorts = re.search(r'(?m)^\s*(->\s+)?(Incremental )?Sort\b(?! Key)', plan) is not None
+    problems = [f"full scan of {table}" for table in scanned if table not in LOOKUP_TABLES]
+    if sorts:
+        problems.append("sort")
+    return problems
+
+
+def run_checks(sample):
+    """ [(name, plan, problems)] for every checked query. """
+    if connection.vendor not in ('sqlite', 'postgresql'):
+        raise NotImplementedError(f"Query plans are not checked on {connection.vendor}.")
+    results = []
+    for name, queryset in _checks(sample):
+        plan = queryset.explain()
+        results.append((name, plan, plan_problems(plan, connection.vendor)))
+    return results
+
+
+# --- Synthetic dataset ---
+
+def seed(profiles, seed_value=1):
+    """
+    Creates `profiles` users with progress, quiz attempts, badges, XP events,
+    daily stats and chat sessions (tens of rows each), refreshes planner
+    statistics, and returns the parameters for the checked queries (a user
+    from the middle of the leaderboard).
+    Call inside a transaction that is rolled back.
+    """
+    rng = random.Random(seed_value)
+    now = timezone.now()
+    tag = f"plancheck-{now.timestamp()}"
+
+    topics = LearningTopic.objects.bulk_create([LearningTopic(title=f"{tag} topic {i}") for i in range(5)])
+    courses = Course.objects.bulk_create([Course(topic=topics[i % 5], title=f"{tag} course {i}") for i in range(20)])
+    modules = Module.objects.bulk_create([Module(course=course, title='m', order=j)
+                                          for course in courses for j in range(5)])
+    lessons = Lesson.objects.bulk_create([Lesson(module=module, title='l', order=k)
+                                          for module in modules for k in range(10)])
+    quizzes = Quiz.objects.bulk_create([Quiz(module=module, title='q') for module in modules])
+    badges = Badge.objects.bulk_create([Badge(name=f"{tag} badge {i}", description='d') for i in range(20)])
+
+    users = User.objects.bulk_create([User(username=f"{tag}-{i}") for i in range(profiles)], batch_size=1000)
+    members = UserProfile.objects.bulk_create(
+        [UserProfile(user=user, xp=rng.randrange(0, 20000)) for user in users], batch_size=1000)
+
+    progress, attempts, earned, events, daily, sessions = [], [], [], [], [], []
+    for profile in members:
+        for lesson in rng.sample(lessons, 20):
+            progress.append(UserProgress(user_profile=profile, lesson=lesson))
+            events.append(XPEvent(user_profile=profile, source_type=XPEvent.SOURCE_LESSON, source_id=lesson.pk,
+                                  amount=lesson.xp_value))
+        for _ in range(5):
+            attempts.append(QuizAttempt(user_profile=profile, quiz=rng.choice(quizzes), passed=rng.random() < 0.6,
+                                        is_complete=True, score=rng.randrange(101)))
+        earned += [UserBadge(user_profile=profile, badge=badge) for badge in rng.sample(badges, 3)]
+        daily += [DailyUserStats(user_profile=profile, topic=rng.choice(topics),
+                                 day=timezone.localdate(now) - timedelta(days=d), xp_earned=10)
+                  for d in rng.sample(range(400), 30)]
+        sessions += [ChatSession(user_profile=profile, title='s') for _ in range(2)]
+    for model, rows in ((UserProgress, progress), (QuizAttempt, attempts), (UserBadge, earned),
+                        (XPEvent, events), (DailyUserStats, daily), (ChatSession, sessions)):
+        model.objects.bulk_create(rows, batch_size=2000)
+    leaderboard.rebuild()
+
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+    middle = UserProfile.objects.order_by('-xp', 'id').values_list('id', 'user_id', 'xp')[profiles // 2]
+    return {
+        'user_profile_id': middle[0], 'user_id': middle[1], 'xp': middle[2],
+        'quiz_id': QuizAttempt.objects.filter(user_profile_id=middle[0]).values_list('quiz_id', flat=True).first(),
+        'lesson_ids': [lesson.pk for lesson in rng.sample(lessons, 20)],
+    }
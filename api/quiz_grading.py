@@ -0,0 +1,171 @@
+"""
+Set-based grading for submit_quiz.
+
+A submission is validated and graded in memory against the quiz's compiled
+answer key. The attempt, all Answer rows (one bulk insert) and the XP award
+(one ledger insert, see xp_ledger.py) are then written in a fixed number of queries, however many
+questions the quiz has.
+
+Compiled answer keys are cached per quiz version. Each quiz has a version
+token in the shared 'coordination' cache, and the key compiled for that
+version is stored next to it and in a small per-process LRU. Saving or
+deleting a Quiz, Question or Choice, or saving the quiz's Module or Course
+(which can move it to another topic), replaces the token once the
+transaction commits, so every worker recompiles on its next submission. A key compiled
+from older data can only ever be stored under the old token. In the steady
+state grading costs one cache lookup and no content queries.
+
+Bulk queryset.update()/delete() send no signals; call invalidate_answer_key()
+after using them on quiz content.
+"""
+import threading
+import uuid
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Choice, Course, Module, Question, Quiz
+
+CACHE_ALIAS = 'coordination'
+ANSWER_KEY_TTL = 24 * 3600  # seconds; unused versions simply expire
+LOCAL_CACHE_SIZE = 256
+KEY_FORMAT = 2  # bump when compile_answer_key()'s output changes
+
+_local_lock = threading.Lock()
+_local_keys = OrderedDict()  # (quiz_id, version) -> compiled answer key
+
+
+def _backend():
+    return caches[CACHE_ALIAS]
+
+
+def _version_key(quiz_id):
+    return f"quiz:{quiz_id}:answer_key_version"
+
+
+def compile_answer_key(quiz_id):
+    """
+    {'pass_threshold', 'xp_reward', 'topic_id', 'questions': {question_id:
+    (correct choice ids, valid choice ids)}} read with two queries, or None if
+    the quiz does not exist.
+    """
+    quiz = (Quiz.objects.filter(pk=quiz_id)
+            .values('pass_threshold', 'xp_reward', topic_id=F('module__course__topic_id')).first())
+    if quiz is None:
+        return None
+    questions = {}
+    rows = Question.objects.filter(quiz_id=quiz_id).values_list('id', 'choices__id', 'choices__is_correct')
+    for question_id, choice_id, is_correct in rows:
+        correct_ids, valid_ids = questions.setdefault(question_id, (set(), set()))
+        if choice_id is not None:
+            valid_ids.add(choice_id)
+            if is_correct:
+                correct_ids.add(choice_id)
+    quiz['questions'] = {
+        question_id: (frozenset(correct_ids), frozenset(valid_ids))
+        for question_id, (correct_ids, valid_ids) in questions.items()
+    }
+    return quiz
+
+
+def get_answer_key(quiz_id):
+    """ The compiled answer key for the quiz's current version (see module docstring), or None. """
+    backend = _backend()
+    version = backend.get(_version_key(quiz_id))
+    if version is None:
+        backend.add(_version_key(quiz_id), uuid.uuid4().hex, None)
+        version = backend.get(_version_key(quiz_id))
+
+    with _local_lock:
+        compiled = _local_keys.get((quiz_id, version))
+        if compiled is not None:
+            _local_keys.move_to_end((quiz_id, version))
+            return compiled
+
+    data_key = f"quiz:{quiz_id}:answer_key:v{KEY_FORMAT}:{version}"
+    compiled = backend.get(data_key)
+    if compiled is None:
+        compiled = compile_answer_key(quiz_id)
+        if compiled is None:
+            return None
+        backend.set(data_key, compiled, ANSWER_KEY_TTL)
+
+    with _local_lock:
+        _local_keys[(quiz_id, version)] = compiled
+        while len(_local_keys) > LOCAL_CACHE_SIZE:
+            _local_keys.popitem(last=False)
+    return compiled
+
+
+def invalidate_answer_key(quiz_id):
+    """ Gives the quiz a new version once the current transaction commits. """
+    transaction.on_commit(lambda: _backend().set(_version_key(quiz_id), uuid.uuid4().hex, None))
+
+
+def grade_submission(answer_key, user_answers):
+    """
+    Grades {question_id: choice_id} against the answer key. Returns a list of
+    (question_id, choice_id, is_correct) in submission order, one per question;
+    unknown questions, choices of another question and malformed ids are skipped.
+    """
+    graded = {}
+    for question_id_str, selected_choice_id in user_answers.items():
+        try:
+            question_id = int(question_id_str)
+        except (TypeError, ValueError):
+            print(f"Warning: Invalid Question ID format: {question_id_str}. Skipping answer.")
+            continue
+        if question_id not in answer_key:
+            print(f"Warning: Question ID {question_id_str} not found in quiz. Skipping answer.")
+            continue
+        correct_ids, valid_ids = answer_key[question_id]
+        try:
+            choice_id = int(selected_choice_id)
+        except (TypeError, ValueError):
+            choice_id = None
+        if choice_id not in valid_ids:
+            print(f"Warning: Choice ID {selected_choice_id} not found or doesn't belong to Question {question_id_str}. Skipping answer.")
+            continue
+        graded[question_id] = (question_id, choice_id, choice_id in correct_ids)
+    return list(graded.values())
+
+
+# --- Invalidation on quiz content changes ---
+
+@receiver(post_save, sender=Quiz)
+@receiver(post_delete, sender=Quiz)
+def invalidate_quiz(sender, instance, **kwargs):
+    invalidate_answer_key(instance.pk)
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def invalidate_question(sender, instance, **kwargs):
+    invalidate_answer_key(instance.quiz_id)
+
+
+@receiver(post_save, sender=Choice)
+@receiver(post_delete, sender=Choice)
+def invalidate_choice(sender, instance, **kwargs):
+    quiz_id = Question.objects.filter(pk=instance.question_id).values_list('quiz_id', flat=True).first()
+    if quiz_id is not None:  # otherwise the question (and its quiz's version) went with it
+        invalidate_answer_key(quiz_id)
+
+
+# The compiled key caches the quiz's topic, which follows its module and course
+@receiver(post_save, sender=Module)
+def invalidate_module_quizzes(sender, instance, created, **kwargs):
+    if not created:
+        for quiz_id in Quiz.objects.filter(module_id=instance.pk).values_list('pk', flat=True):
+            invalidate_answer_key(quiz_id)
+
+
+@receiver(post_save, sender=Course)
+def invalidate_course_quizzes(sender, instance, created, **kwargs):
+    if not created:
+        for quiz_id in Quiz.objects.filter(module__course_id=instance.pk).values_list('pk', flat=True):
+            invalidate_answer_key(quiz_id)
@@ -0,0 +1,260 @@
+"""
+Per-request SQL and timing metrics.
+
+RequestMetricsMiddleware measures every request:
+
+- SQL query count and total DB time, through connection.execute_wrapper()
+  on every database alias;
+- view time (from the view call until its response is rendered);
+- serializer time: DRF serializer .data and the fast serializers (see
+  timed() and instrument_serializers());
+- total time.
+
+The figures are sent back in a Server-Timing header, which the browser's
+devtools show per request. They are also added to rolling per-view
+aggregates (this process only; two windows of REQUEST_METRICS_WINDOW
+seconds), which admins read at metrics/views/.
+
+Requests slower than REQUEST_METRICS_SLOW_MS are logged. On a sampled
+fraction of requests (REQUEST_METRICS_SQL_SAMPLE_RATE), the middleware also
+keeps the slowest statements and the most repeated one (the N+1 suspect)
+for that log. The per-query cost outside the sample is two clock reads and
+an addition. Statements run by a streaming response after its headers are
+sent are not counted.
+
+Database connections belong to a thread, so only the queries of the thread
+serving the request are counted: the request thread under WSGI, and under
+ASGI the request's thread-sensitive thread, where sync_to_async() runs ORM
+calls by default. Queries from sync_to_async(thread_sensitive=False) and
+from background threads (summary jobs and their sweeper) use other
+connections and are not counted. A single-flight leader's queries count
+towards its own request only, not towards the duplicates waiting on it.
+"""
+import contextvars
+import functools
+import heapq
+import logging
+import random
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    """ The figures for one request. Times are in seconds. """
+
+    def __init__(self, sample_sql):
+        self.queries = 0
+        self.db_time = 0.0
+        self.view_time = 0.0
+        self.serialize_time = 0.0
+        self.serialize_depth = 0
+        self.sample_sql = sample_sql
+        self.slowest = []  # min-heap of (duration, sql)
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper() hook
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.queries += 1
+            self.db_time += duration
+            if self.sample_sql:
+                self.statements[sql] += 1
+                entry = (duration, sql)
+                if len(self.slowest) < getattr(settings, 'REQUEST_METRICS_TOP_STATEMENTS', 5):
+                    heapq.heappush(self.slowest, entry)
+                elif entry > self.slowest[0]:
+                    heapq.heapreplace(self.slowest, entry)
+
+    def server_timing(self, total):
+        return ', '.join([
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries"',
+            f'view;dur={self.view_time * 1000:.1f}',
+            f'serialize;dur={self.serialize_time * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ])
+
+
+# --- Serializer time ---
+
+def timed(func):
+    """ Counts the decorated function's run time as serializer time of the current request. """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        metrics = _current.get()
+        if metrics is None or metrics.serialize_depth:
+            return func(*args, **kwargs)
+        metrics.serialize_depth += 1
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            metrics.serialize_time += time.perf_counter() - start
+            metrics.serialize_depth -= 1
+    return wrapper
+
+
+def instrument_serializers():
+    """ Times DRF serializers' .data (nested serializers run inside their root's). Called once from apps.ready(). """
+    from rest_framework.serializers import BaseSerializer
+
+    data = BaseSerializer.data
+    if not getattr(data.fget, 'request_metrics', False):
+        fget = timed(data.fget)
+        fget.request_metrics = True
+        BaseSerializer.data = property(fget)
+
+
+# --- Per-view aggregates ---
+
+class ViewStats:
+    """ Rolling per-view totals: the current window and the one before it. """
+
+    FIELDS = ('requests', 'queries', 'db_ms', 'view_ms', 'serialize_ms', 'total_ms')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._window_start = time.monotonic()
+        self._current = {}
+        self._previous = {}
+
+    def _rotate(self, now):
+        window = getattr(settings, 'REQUEST_METRICS_WINDOW', 300)
+        if now - self._window_start >= window:
+            # A gap of more than a whole window leaves nothing worth keeping
+            self._previous = self._current if now - self._window_start < 2 * window else {}
+            self._current = {}
+            self._window_start = now
+
+    def add(self, view, metrics, total):
+        figures = (1, metrics.queries, metrics.db_time * 1000, metrics.view_time * 1000,
+                   metrics.serialize_time * 1000, total * 1000)
+        with self._lock:
+            self._rotate(time.monotonic())
+            entry = self._current.setdefault(view, {'sums': [0] * len(figures), 'max_queries': 0, 'max_total_ms': 0})
+            entry['sums'] = [a + b for a, b in zip(entry['sums'], figures)]
+            entry['max_queries'] = max(entry['max_queries'], metrics.queries)
+            entry['max_total_ms'] = max(entry['max_total_ms'], total * 1000)
+
+    def snapshot(self):
+        """ {view: averages and maxima} over both windows, busiest views first. """
+        with self._lock:
+            self._rotate(time.monotonic())
+            merged = {}
+            for window in (self._previous, self._current):
+                for view, entry in window.items():
+                    into = merged.setdefault(view, {'sums': [0] * len(self.FIELDS), 'max_queries': 0, 'max_total_ms': 0})
+                    into['sums'] = [a + b for a, b in zip(into['sums'], entry['sums'])]
+                    into['max_queries'] = max(into['max_queries'], entry['max_queries'])
+                    into['max_total_ms'] = max(into['max_total_ms'], entry['max_total_ms'])
+        views = {}
+        for view, entry in sorted(merged.items(), key=lambda item: -item[1]['sums'][0]):
+            requests = entry['sums'][0]
+            stats = {'requests': requests}
+            for field, total in zip(self.FIELDS[1:], entry['sums'][1:]):
+                stats[f'avg_{field}'] = round(total / requests, 2)
+            stats['max_queries'] = entry['max_queries']
+            stats['max_total_ms'] = round(entry['max_total_ms'], 2)
+            views[view] = stats
+        return views
+
+
+view_stats = ViewStats()
+
+
+# --- Middleware ---
+
+class RequestMetricsMiddleware:
+    """ Measures each request (see module docstring). Place it first in MIDDLEWARE. """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not getattr(settings, 'REQUEST_METRICS_ENABLED', True):
+            return self.get_response(request)
+
+        metrics, token, start = self.begin(request)
+        try:
+            with ExitStack() as stack:
+                self.install(stack, metrics)
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics, start)
+
+    async def __acall__(self, request):
+        if not getattr(settings, 'REQUEST_METRICS_ENABLED', True):
+            return await self.get_response(request)
+
+        metrics, token, start = self.begin(request)
+        stack = ExitStack()
+        try:
+            # The ORM runs on the request's thread-sensitive thread, whose connections are not the event loop's
+            await sync_to_async(self.install)(stack, metrics)
+            try:
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(stack.close)()
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics, start)
+
+    def begin(self, request):
+        metrics = RequestMetrics(sample_sql=random.random() < getattr(settings, 'REQUEST_METRICS_SQL_SAMPLE_RATE', 0.1))
+        request._metrics_view_start = None
+        return metrics, _current.set(metrics), time.perf_counter()
+
+    def install(self, stack, metrics):
+        """ Counts the queries of this thread's connections until the stack closes. """
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(metrics))
+
+    def finish(self, request, response, metrics, start):
+        end = time.perf_counter()
+        total = end - start
+        if request._metrics_view_start is not None:
+            metrics.view_time = end - request._metrics_view_start
+
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'unresolved'
+        view_stats.add(view, metrics, total)
+        if getattr(settings, 'REQUEST_METRICS_SERVER_TIMING', True):
+            response['Server-Timing'] = metrics.server_timing(total)
+        if total * 1000 >= getattr(settings, 'REQUEST_METRICS_SLOW_MS', 500):
+            self.log_slow(request, view, response, metrics, total)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._metrics_view_start = time.perf_counter()
+
+    def log_slow(self, request, view, response, metrics, total):
+        message = (f"Slow request {request.method} {request.path} ({view}) -> {response.status_code}: "
+                   f"{total * 1000:.0f} ms total, {metrics.queries} queries in {metrics.db_time * 1000:.0f} ms, "
+                   f"view {metrics.view_time * 1000:.0f} ms, serialize {metrics.serialize_time * 1000:.0f} ms")
+        if metrics.sample_sql and metrics.queries:
+            sql, repeats = metrics.statements.most_common(1)[0]
+            message += f"\n  most repeated ({repeats}x): {sql[:500]}"
+            for duration, sql in sorted(metrics.slowest, reverse=True):
+                message += f"\n  {duration * 1000:.1f} ms: {sql[:500]}"
+        logger.warning(message)
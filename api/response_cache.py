@@ -0,0 +1,82 @@
+"""
+Cache of generated AI responses for prompt-only endpoints.
+
+A cohort tends to ask for the same handful of case study topics, so a
+response is stored under its model, prompt-template version and normalized
+prompt (whitespace- and case-insensitive). Entries live in the Django cache
+alias 'ai_responses' (see CACHES in settings): per-process LRU by default, or
+any shared backend. Clients can send fresh=true to skip the lookup; the new
+response then replaces the cached one.
+
+Hits and misses are counted per process and logged with the running hit rate.
+"""
+import hashlib
+import logging
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+
+from . import prompts
+from .summary_cache import normalize_prompt
+
+logger = logging.getLogger(__name__)
+
+CACHE_ALIAS = 'ai_responses'
+
+
+class ResponseCache:
+    def __init__(self, namespace, version, ttl_setting, default_ttl):
+        self.namespace = namespace
+        self.version = version
+        self.ttl_setting = ttl_setting
+        self.default_ttl = default_ttl
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    @property
+    def backend(self):
+        return caches[CACHE_ALIAS]
+
+    @property
+    def ttl(self):
+        return getattr(settings, self.ttl_setting, self.default_ttl)
+
+    def key(self, model_name, prompt):
+        digest = hashlib.sha256(normalize_prompt(prompt).casefold().encode('utf-8')).hexdigest()
+        return f"{self.namespace}:v{self.version}:{model_name}:{digest}"
+
+    def _record(self, hit):
+        with self._lock:
+            if hit:
+                self._hits += 1
+            else:
+                self._misses += 1
+        logger.info(f"{self.namespace} cache {'HIT' if hit else 'MISS'} ({self.stats()['hit_rate']:.0%} hit rate)")
+
+    def get(self, model_name, prompt):
+        value = self.backend.get(self.key(model_name, prompt))
+        self._record(value is not None)
+        return value
+
+    def set(self, model_name, prompt, value):
+        self.backend.set(self.key(model_name, prompt), value, self.ttl)
+
+    async def aget(self, model_name, prompt):
+        value = await self.backend.aget(self.key(model_name, prompt))
+        self._record(value is not None)
+        return value
+
+    async def aset(self, model_name, prompt, value):
+        await self.backend.aset(self.key(model_name, prompt), value, self.ttl)
+
+    def stats(self):
+        with self._lock:
+            total = self._hits + self._misses
+            return {'hits': self._hits, 'misses': self._misses,
+                    'hit_rate': self._hits / total if total else 0.0}
+
+
+case_study_cache = ResponseCache(
+    'case_study', prompts.CASE_STUDY_PROMPT_VERSION, 'CASE_STUDY_CACHE_TTL', 7 * 24 * 3600)
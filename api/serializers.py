@@ -1,19 +1,107 @@
 from rest_framework import serializers
-from .models import UserProfile, LearningTopic, Course, Module, Lesson, UserProgress, Badge, UserBadge, Choice, Question, Quiz, Answer, QuizAttempt # Import specific models
+from .models import UserProfile, LearningTopic, Course, Module, Lesson, UserProgress, Badge, UserBadge, Choice, Question, Quiz, Answer, QuizAttempt, MediaSummaryJob, ChatSession, ChatMessage # Import specific models
 from django.contrib.auth.models import User
 
 # Create your serializers here.
 
+# --- Sparse Fieldsets (?fields=) and Expansion (?expand=) ---
+
+def parse_field_paths(value):
+    """
+    'id,title,modules.title,modules.lessons' -> {'id': None, 'title': None,
+    'modules': {'title': None, 'lessons': None}}, where None selects a field
+    with everything below it.
+    """
+    tree = {}
+    for path in value.split(','):
+        parts = [part.strip() for part in path.split('.') if part.strip()]
+        node = tree
+        for part in parts[:-1]:
+            if part in node and node[part] is None:
+                break  # already selected whole
+            node = node.setdefault(part, {})
+        else:
+            if parts:
+                node[parts[-1]] = None
+    return tree
+
+def requested_fields(request):
+    """ The parsed ?fields= of the request, or None when every field is wanted. """
+    value = request.query_params.get('fields') if request is not None else None
+    return parse_field_paths(value) if value else None
+
+def requested_expansions(request):
+    """ Dotted paths named by ?expand=, e.g. {'quiz', 'answers.selected_choice'}. """
+    value = request.query_params.get('expand', '') if request is not None else ''
+    return {path.strip() for path in value.split(',') if path.strip()}
+
+class SparseFieldsMixin:
+    """
+    Lets the request shape a ModelSerializer's output:
+
+    - ?fields=id,title,modules.title keeps only the named fields, at any depth
+      (a nested field named without sub-fields is kept whole). Fields that
+      are not requested are never built, so an unrequested nested serializer
+      is never instantiated and its relation never read. Unknown names are
+      ignored.
+    - ?expand=quiz renders a field listed in Meta.expandable ({name:
+      serializer class}) as that nested serializer instead of its id.
+
+    Nested serializers find their place in the request by their field path.
+    Serializers bound to input data (writes) always use every field.
+    """
+
+    def _field_path(self):
+        path, node = [], self
+        while node.parent is not None:
+            if node.field_name:  # '' for the child of a many=True list
+                path.append(node.field_name)
+            node = node.parent
+        return path[::-1]
+
+    def _sparse_request(self):
+        if hasattr(self.root, 'initial_data'):
+            return None
+        return self.context.get('request')
+
+    def _wanted_fields(self):
+        tree = requested_fields(self._sparse_request())
+        for part in self._field_path():
+            if tree is None:
+                break
+            tree = tree.get(part)
+        return None if tree is None else set(tree)
+
+    def get_field_names(self, declared_fields, info):
+        names = super().get_field_names(declared_fields, info)
+        wanted = self._wanted_fields()
+        return names if wanted is None else [name for name in names if name in wanted]
+
+    def get_fields(self):
+        wanted = self._wanted_fields()
+        if wanted is not None:
+            # Only copy (instantiate) the declared fields that were asked for
+            self._declared_fields = {name: field for name, field in type(self)._declared_fields.items() if name in wanted}
+        fields = super().get_fields()
+        expandable = getattr(self.Meta, 'expandable', {})
+        if expandable:
+            expansions = requested_expansions(self._sparse_request())
+            prefix = '.'.join(self._field_path())
+            for name, serializer_class in expandable.items():
+                if name in fields and (f'{prefix}.{name}' if prefix else name) in expansions:
+                    fields[name] = serializer_class(read_only=True)
+        return fields
+
 # --- User Serializers ---
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """ Basic User Serializer - Used for nesting AND updating """
     class Meta:
         model = User
         fields = ['id', 'username', 'email', 'first_name', 'last_name']
         read_only_fields = ['id', 'username', 'email'] # Prevent username/email changes via profile update
 
-class UserProfileSerializer(serializers.ModelSerializer):
+class UserProfileSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """ User Profile Serializer for retrieving and updating """
     # Nest UserSerializer, but make it writable for specific fields
     user = UserSerializer() # Removed read_only=True
@@ -43,13 +131,13 @@ class UserProfileSerializer(serializers.ModelSerializer):
 
 # --- Content Serializers ---
 
-class LearningTopicSerializer(serializers.ModelSerializer):
+class LearningTopicSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """ Serializer for Learning Topics """
     class Meta:
         model = LearningTopic
         fields = ['id', 'title', 'description']
 
-class LessonSerializer(serializers.ModelSerializer):
+class LessonSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """ Serializer for Lessons, including specific content fields """
     class Meta:
         model = Lesson
@@ -61,7 +149,7 @@ class LessonSerializer(serializers.ModelSerializer):
             ]
         # Depending on use case, you might make some fields read_only
 
-class ModuleSerializer(serializers.ModelSerializer):
+class ModuleSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """ Serializer for Modules, including nested Lessons """
     lessons = LessonSerializer(many=True, read_only=True)
     # Add progress calculation fields if needed
@@ -69,7 +157,7 @@ class ModuleSerializer(serializers.ModelSerializer):
         model = Module
         fields = ['id', 'title', 'description', 'order', 'lessons']
 
-class CourseSerializer(serializers.ModelSerializer):
+class CourseSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """ Serializer for Courses, including nested Modules """
     modules = ModuleSerializer(many=True, read_only=True)
     topic = LearningTopicSerializer(read_only=True) # Show topic details
@@ -78,9 +166,28 @@ class CourseSerializer(serializers.ModelSerializer):
         model = Course
         fields = ['id', 'title', 'description', 'topic', 'modules']
 
+# Outline representation (?outline=true): structure only, lesson bodies come from lessons/<id>/
+
+class LessonOutlineSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Lesson
+        fields = ['id', 'title', 'order', 'content_type']
+
+class ModuleOutlineSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    lessons = LessonOutlineSerializer(many=True, read_only=True)
+    class Meta:
+        model = Module
+        fields = ['id', 'title', 'order', 'lessons']
+
+class CourseOutlineSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    modules = ModuleOutlineSerializer(many=True, read_only=True)
+    class Meta:
+        model = Course
+        fields = ['id', 'title', 'topic_id', 'modules']
+
 # --- Progress Serializer ---
 
-class UserProgressSerializer(serializers.ModelSerializer):
+class UserProgressSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """ Serializer for User Progress (primarily for tracking completion) """
     # Optionally nest lesson/user details if needed, but keep simple for now
     # lesson = LessonSerializer(read_only=True)
@@ -94,13 +201,13 @@ class UserProgressSerializer(serializers.ModelSerializer):
 
 # --- Badge Serializers ---
 
-class BadgeSerializer(serializers.ModelSerializer):
+class BadgeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """ Serializer for Badges """
     class Meta:
         model = Badge
         fields = ['id', 'name', 'description', 'icon_emoji'] # Add icon_image if used
 
-class UserBadgeSerializer(serializers.ModelSerializer):
+class UserBadgeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """ Serializer for UserBadges, showing Badge details """
     badge = BadgeSerializer(read_only=True)
     class Meta:
@@ -109,46 +216,79 @@ class UserBadgeSerializer(serializers.ModelSerializer):
 
 # --- Quiz Serializers ---
 
-class ChoiceSerializer(serializers.ModelSerializer):
+class ChoiceSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Choice
         # Exclude 'is_correct' when sending data for taking a quiz
         fields = ['id', 'text'] 
 
-class QuestionSerializer(serializers.ModelSerializer):
+class QuestionSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     choices = ChoiceSerializer(many=True, read_only=True)
 
     class Meta:
         model = Question
         fields = ['id', 'text', 'order', 'choices']
 
-class QuizSerializer(serializers.ModelSerializer):
+class QuizSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     questions = QuestionSerializer(many=True, read_only=True)
 
     class Meta:
         model = Quiz
         fields = ['id', 'title', 'description', 'module', 'questions']
+        expandable = {'module': ModuleOutlineSerializer}
 
 # Serializers for results (can include is_correct)
-class CorrectChoiceSerializer(serializers.ModelSerializer):
+class CorrectChoiceSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Choice
         fields = ['id', 'text', 'is_correct']
 
-class AnswerSerializer(serializers.ModelSerializer):
-    # Optionally nest selected_choice details if needed
-    # selected_choice = CorrectChoiceSerializer(read_only=True)
+class AnswerSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    # ?expand=answers.selected_choice nests the choice details
     class Meta:
         model = Answer
         fields = ['id', 'question', 'selected_choice', 'is_correct']
+        expandable = {'selected_choice': CorrectChoiceSerializer}
 
-class QuizAttemptSerializer(serializers.ModelSerializer):
+class QuizAttemptSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     answers = AnswerSerializer(many=True, read_only=True)
-    # Optionally nest quiz details
-    # quiz = QuizSerializer(read_only=True) 
+    # ?expand=quiz nests the quiz details
     class Meta:
         model = QuizAttempt
         fields = ['id', 'quiz', 'user_profile', 'start_time', 'end_time', 'score', 'passed', 'is_complete', 'answers']
+        expandable = {'quiz': QuizSerializer}
+
+# --- AI Tool Serializers ---
+
+class MediaSummaryJobSerializer(serializers.ModelSerializer):
+    """ Status of a background summarization job; result fields are filled once completed. """
+    job_id = serializers.UUIDField(source='id', read_only=True)
+    model_used = serializers.CharField(source='model_name', read_only=True)
+
+    class Meta:
+        model = MediaSummaryJob
+        fields = ['job_id', 'status', 'file_name', 'model_used', 'transcript', 'summary', 'error',
+                  'created_at', 'updated_at', 'finished_at']
+        read_only_fields = fields
+
+class ChatMessageSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ChatMessage
+        fields = ['id', 'role', 'text', 'created_at']
+        read_only_fields = fields
+
+class ChatSessionSerializer(serializers.ModelSerializer):
+    """ Chat session listing; the title defaults to the first message. """
+    class Meta:
+        model = ChatSession
+        fields = ['id', 'title', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'created_at', 'updated_at']
+
+class ChatSessionDetailSerializer(ChatSessionSerializer):
+    messages = ChatMessageSerializer(many=True, read_only=True)
+
+    class Meta(ChatSessionSerializer.Meta):
+        fields = ChatSessionSerializer.Meta.fields + ['messages']
 
 # Example User Serializer
 # class UserSerializer(serializers.ModelSerializer):
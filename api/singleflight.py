@@ -0,0 +1,165 @@
+"""
+Single-flight coalescing of identical concurrent LLM requests.
+
+When a class sends the same prompt within seconds, only the first request
+calls Gemini and the duplicates wait for its result:
+
+- within a worker, duplicates wait on the leader's in-process call (threads
+  under WSGI, tasks on the event loop under ASGI);
+- across workers, the leader holds a lock key in the shared 'coordination'
+  cache and publishes its result there for SINGLEFLIGHT_RESULT_TTL seconds.
+  Duplicates in other workers poll for it, and one of them takes over if the
+  leader fails or disappears without publishing.
+
+Results must be picklable. Errors are not shared across workers; the next
+caller simply retries.
+"""
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+CACHE_ALIAS = 'coordination'
+POLL_INTERVAL = 0.2  # seconds between checks for another worker's result
+
+
+def request_key(endpoint, model_name, normalized_prompt):
+    digest = hashlib.sha256(normalized_prompt.encode('utf-8')).hexdigest()
+    return f"{endpoint}:{model_name}:{digest}"
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self, namespace):
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self._calls = {}          # key -> _Call (sync callers)
+        self._async_calls = {}    # key -> asyncio.Future (async callers, one event loop per worker)
+
+    @property
+    def backend(self):
+        return caches[CACHE_ALIAS]
+
+    def _keys(self, key):
+        return f"singleflight:{self.namespace}:lock:{key}", f"singleflight:{self.namespace}:result:{key}"
+
+    @staticmethod
+    def _timeouts():
+        wait = getattr(settings, 'SINGLEFLIGHT_WAIT_TIMEOUT', 200)
+        return wait, getattr(settings, 'SINGLEFLIGHT_RESULT_TTL', 30), wait + 10
+
+    # --- Sync ---
+
+    def do(self, key, fn, bypass=False):
+        """
+        Returns (result, shared): fn() is run by one caller per key, others get
+        its result. bypass=True (e.g. a fresh=true request) always calls fn().
+        """
+        if bypass:
+            return fn(), False
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            logger.info(f"{self.namespace}: coalesced with an in-flight request in this worker")
+            return call.result, True
+        try:
+            call.result, shared = self._do_across_workers(key, fn)
+            return call.result, shared
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def _do_across_workers(self, key, fn):
+        lock_key, result_key = self._keys(key)
+        wait_timeout, result_ttl, lock_ttl = self._timeouts()
+        backend = self.backend
+        deadline = time.monotonic() + wait_timeout
+        token = uuid.uuid4().hex
+        while True:
+            published = backend.get(result_key)
+            if published is not None:
+                logger.info(f"{self.namespace}: reused the result of another worker")
+                return published, True
+            if backend.add(lock_key, token, lock_ttl) or time.monotonic() >= deadline:
+                break
+            time.sleep(POLL_INTERVAL)
+        try:
+            result = fn()
+            backend.set(result_key, result, result_ttl)
+            return result, False
+        finally:
+            if backend.get(lock_key) == token:
+                backend.delete(lock_key)
+
+    # --- Async ---
+
+    async def ado(self, key, afn, bypass=False):
+        """ Async do(): afn is a coroutine function. """
+        if bypass:
+            return await afn(), False
+        future = self._async_calls.get(key)
+        if future is not None:
+            # shield: a cancelled duplicate must not cancel the leader's call
+            result = await asyncio.shield(future)
+            logger.info(f"{self.namespace}: coalesced with an in-flight request in this worker")
+            return result, True
+        future = self._async_calls[key] = asyncio.get_running_loop().create_future()
+        try:
+            result, shared = await self._ado_across_workers(key, afn)
+            future.set_result(result)
+            return result, shared
+        except BaseException as e:
+            future.set_exception(e if isinstance(e, Exception) else RuntimeError("Leader request was cancelled"))
+            future.exception()  # mark retrieved when nobody was waiting
+            raise
+        finally:
+            del self._async_calls[key]
+
+    async def _ado_across_workers(self, key, afn):
+        lock_key, result_key = self._keys(key)
+        wait_timeout, result_ttl, lock_ttl = self._timeouts()
+        backend = self.backend
+        deadline = time.monotonic() + wait_timeout
+        token = uuid.uuid4().hex
+        while True:
+            published = await backend.aget(result_key)
+            if published is not None:
+                logger.info(f"{self.namespace}: reused the result of another worker")
+                return published, True
+            if await backend.aadd(lock_key, token, lock_ttl) or time.monotonic() >= deadline:
+                break
+            await asyncio.sleep(POLL_INTERVAL)
+        try:
+            result = await afn()
+            await backend.aset(result_key, result, result_ttl)
+            return result, False
+        finally:
+            if await backend.aget(lock_key) == token:
+                await backend.adelete(lock_key)
+
+
+case_study_flight = SingleFlight('case_study')
+assignment_flight = SingleFlight('assignment_checker')
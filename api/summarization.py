@@ -0,0 +1,121 @@
+"""
+Upload -> wait -> generate pipeline for media summarization.
+
+Shared by the summarize_media views (sync, and async through
+await_until_active) and the background job runner (summary_jobs.py). Waiting for Google to finish processing an upload uses an
+adaptive backoff instead of a fixed sleep: short uploads become ACTIVE within
+a couple of seconds, long lecture videos can take minutes.
+"""
+import asyncio
+import time
+
+import google.generativeai as genai
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from . import llm, prompts, summary_cache
+
+
+class SummarizationError(Exception):
+    """ Raised when the remote file never becomes usable for generation. """
+
+
+def backoff_delays(initial=None, factor=None, maximum=None):
+    """ Yields poll delays: initial, initial*factor, ... capped at maximum. """
+    delay = initial or getattr(settings, 'SUMMARY_POLL_INITIAL_DELAY', 2.0)
+    factor = factor or getattr(settings, 'SUMMARY_POLL_BACKOFF_FACTOR', 1.5)
+    maximum = maximum or getattr(settings, 'SUMMARY_POLL_MAX_DELAY', 30.0)
+    while True:
+        yield delay
+        delay = min(delay * factor, maximum)
+
+
+def file_content(file_obj):
+    """ Temporary file path for large uploads, raw bytes for in-memory ones. """
+    try:
+        # Try getting temp path first (better for large files)
+        return file_obj.temporary_file_path()
+    except AttributeError:
+        # If no temporary path (likely InMemoryUploadedFile), read the bytes
+        file_obj.seek(0)
+        return file_obj.read()
+
+
+def upload_media(path_or_bytes, display_name):
+    uploaded_file = genai.upload_file(path=path_or_bytes, display_name=display_name)
+    print(f"File Uploaded: Name='{uploaded_file.name}', DisplayName='{uploaded_file.display_name}', State='{uploaded_file.state.name}'")
+    return uploaded_file
+
+
+def _processing_delays(uploaded_file, timeout=None):
+    """ backoff_delays() until `timeout` seconds (SUMMARY_PROCESSING_TIMEOUT) would pass, then SummarizationError. """
+    timeout = timeout or getattr(settings, 'SUMMARY_PROCESSING_TIMEOUT', 1800)
+    deadline = time.monotonic() + timeout
+    for delay in backoff_delays():
+        if time.monotonic() + delay > deadline:
+            raise SummarizationError(f"File '{uploaded_file.name}' still processing after {timeout}s.")
+        yield delay
+
+
+def _active_or_error(uploaded_file):
+    if uploaded_file.state.name == "FAILED":
+        raise SummarizationError("File processing failed on the Google AI server.")
+    if uploaded_file.state.name != "ACTIVE":
+        raise SummarizationError(f"File processing ended in unexpected state: {uploaded_file.state.name}")
+    return uploaded_file
+
+
+def wait_until_active(uploaded_file, timeout=None, on_poll=None):
+    """
+    Polls the remote file with adaptive backoff until it leaves PROCESSING.
+    Returns the ACTIVE file; raises SummarizationError on FAILED, any other
+    terminal state, or when `timeout` seconds pass.
+    """
+    delays = _processing_delays(uploaded_file, timeout)
+    while uploaded_file.state.name == "PROCESSING":
+        time.sleep(next(delays))
+        uploaded_file = genai.get_file(uploaded_file.name)
+        print(f"File State: {uploaded_file.state.name}")
+        if on_poll:
+            on_poll(uploaded_file)
+    return _active_or_error(uploaded_file)
+
+
+async def await_until_active(uploaded_file, timeout=None):
+    """ Async wait_until_active (same deadline and errors); the SDK's get_file runs in a worker thread. """
+    delays = _processing_delays(uploaded_file, timeout)
+    while uploaded_file.state.name == "PROCESSING":
+        await asyncio.sleep(next(delays))
+        uploaded_file = await sync_to_async(genai.get_file, thread_sensitive=False)(uploaded_file.name)
+        print(f"File State: {uploaded_file.state.name}")
+    return _active_or_error(uploaded_file)
+
+
+def obtain_active_file(content_hash, path_or_bytes, display_name, on_uploaded=None, on_poll=None):
+    """
+    Returns an ACTIVE Google AI file for the media: the earlier upload of the
+    same bytes when Google still has it, otherwise a fresh upload that is then
+    remembered for later requests.
+    """
+    if content_hash:
+        remote_file = summary_cache.get_active_remote_file(content_hash)
+        if remote_file is not None:
+            print(f"Reusing remote file '{remote_file.name}' for content {content_hash[:12]}...")
+            return remote_file
+
+    uploaded_file = upload_media(path_or_bytes, display_name)
+    if on_uploaded:
+        on_uploaded(uploaded_file)
+    uploaded_file = wait_until_active(uploaded_file, on_poll=on_poll)
+    if content_hash:
+        summary_cache.remember_remote_file(content_hash, uploaded_file.name)
+    return uploaded_file
+
+
+def generate_summary(uploaded_file, user_prompt, model_name, display_name):
+    """ Runs generation against an ACTIVE file and returns (transcript, summary). """
+    model = llm.get_model(model_name)
+    prompt = prompts.build_summary_prompt(user_prompt, display_name)
+    # Increase timeout for potentially long generation
+    response = model.generate_content([uploaded_file, prompt], request_options={"timeout": 600})
+    return prompts.parse_summary_response(response.text)
@@ -0,0 +1,124 @@
+"""
+Content-addressed deduplication for media summarization.
+
+Uploads are identified by the SHA-256 of their bytes, hashed in chunks
+straight from the temporary file or in-memory buffer. Two things are
+remembered per hash:
+
+- MediaSummaryCache: finished (transcript, summary) per (hash, model, prompt),
+  so a repeat upload of the same recording returns without calling Gemini.
+- RemoteMediaFile: the Google AI file the bytes were uploaded as, so the same
+  recording with a different prompt skips the upload while Google keeps the
+  file ACTIVE (uploaded files are deleted by Google after 48 hours).
+
+Entries expire after SUMMARY_CACHE_TTL and the table is trimmed to
+SUMMARY_CACHE_MAX_ENTRIES, least recently used first.
+"""
+import hashlib
+import logging
+import re
+from datetime import timedelta
+
+import google.generativeai as genai
+from django.conf import settings
+from django.db import IntegrityError
+from django.db.models import F
+from django.utils import timezone
+
+from .models import MediaSummaryCache, RemoteMediaFile
+
+logger = logging.getLogger(__name__)
+
+# Google deletes uploaded files after 48h; stop trusting our record a bit earlier
+REMOTE_FILE_LIFETIME = timedelta(hours=47)
+
+
+def hash_upload(file_obj):
+    """ SHA-256 hex digest of an UploadedFile, read in chunks. """
+    digest = hashlib.sha256()
+    for chunk in file_obj.chunks():
+        digest.update(chunk)
+    file_obj.seek(0)
+    return digest.hexdigest()
+
+
+def normalize_prompt(user_prompt):
+    """ Whitespace-insensitive form of the user's prompt ('' means the default prompt). """
+    return re.sub(r'\s+', ' ', user_prompt or '').strip()
+
+
+def _prompt_hash(user_prompt):
+    return hashlib.sha256(normalize_prompt(user_prompt).encode('utf-8')).hexdigest()
+
+
+def _ttl():
+    return timedelta(seconds=getattr(settings, 'SUMMARY_CACHE_TTL', 30 * 24 * 3600))
+
+
+# --- Summary results ---
+
+def get_cached_summary(content_hash, model_name, user_prompt):
+    """ Returns (transcript, summary) for a previous identical request, or None. """
+    entry = MediaSummaryCache.objects.filter(
+        content_hash=content_hash,
+        model_name=model_name,
+        prompt_hash=_prompt_hash(user_prompt),
+        created_at__gte=timezone.now() - _ttl(),
+    ).only('id', 'transcript', 'summary').first()
+    if entry is None:
+        return None
+    MediaSummaryCache.objects.filter(pk=entry.pk).update(
+        last_used_at=timezone.now(), hit_count=F('hit_count') + 1)
+    return entry.transcript, entry.summary
+
+
+def store_summary(content_hash, model_name, user_prompt, transcript, summary):
+    try:
+        MediaSummaryCache.objects.update_or_create(
+            content_hash=content_hash,
+            model_name=model_name,
+            prompt_hash=_prompt_hash(user_prompt),
+            defaults={'transcript': transcript, 'summary': summary,
+                      'created_at': timezone.now(), 'last_used_at': timezone.now()},
+        )
+    except IntegrityError:
+        # A concurrent identical request stored the same result first
+        pass
+    evict_summaries()
+
+
+def evict_summaries():
+    """ Drops expired entries, then the least recently used beyond the size cap. """
+    MediaSummaryCache.objects.filter(created_at__lt=timezone.now() - _ttl()).delete()
+    max_entries = getattr(settings, 'SUMMARY_CACHE_MAX_ENTRIES', 5000)
+    overflow = MediaSummaryCache.objects.count() - max_entries
+    if overflow > 0:
+        stale_ids = list(MediaSummaryCache.objects.order_by('last_used_at').values_list('pk', flat=True)[:overflow])
+        MediaSummaryCache.objects.filter(pk__in=stale_ids).delete()
+
+
+# --- Remote (Google AI) files ---
+
+def get_active_remote_file(content_hash):
+    """ The still-ACTIVE Google AI file previously uploaded for these bytes, or None. """
+    record = RemoteMediaFile.objects.filter(
+        content_hash=content_hash, expires_at__gt=timezone.now()).first()
+    if record is None:
+        return None
+    try:
+        remote_file = genai.get_file(record.remote_file_name)
+    except Exception as e:
+        logger.info(f"Remote file {record.remote_file_name} no longer available: {e}")
+        record.delete()
+        return None
+    if remote_file.state.name != "ACTIVE":
+        return None
+    return remote_file
+
+
+def remember_remote_file(content_hash, remote_file_name):
+    RemoteMediaFile.objects.update_or_create(
+        content_hash=content_hash,
+        defaults={'remote_file_name': remote_file_name,
+                  'expires_at': timezone.now() + REMOTE_FILE_LIFETIME},
+    )
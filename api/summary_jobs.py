@@ -0,0 +1,190 @@
+"""
+Background execution of MediaSummaryJob.
+
+A job is claimed by flipping its status from pending with a conditional
+UPDATE, so any number of web-process threads and `manage.py
+run_summary_jobs` workers can share one queue without double-processing.
+By default jobs are also picked up by a small in-process thread pool
+(SUMMARY_JOB_THREADS) as soon as the creating transaction commits; set it to
+0 to leave all processing to dedicated workers.
+
+With the in-process pool, a restart or deploy drops whatever the pool was
+running or holding. The web server entry points (asgi.py, wsgi.py) therefore
+start a sweeper thread. Every SUMMARY_JOB_SWEEP_INTERVAL seconds, and once
+at startup, it requeues stale jobs and hands pending ones to the pool, like
+`manage.py run_summary_jobs` does for a dedicated worker.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from . import admission, llm, summarization, summary_cache
+from .models import MediaSummaryJob
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_submitted = set()  # job ids handed to the pool and not finished yet
+_submitted_lock = threading.Lock()
+_sweeper = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'SUMMARY_JOB_THREADS', 2),
+            thread_name_prefix='summary-job',
+        )
+    return _executor
+
+
+def enqueue_summary_job(job):
+    """ Schedules the job on the in-process pool once the current transaction commits. """
+    if getattr(settings, 'SUMMARY_JOB_THREADS', 2) <= 0:
+        return
+    transaction.on_commit(lambda: _submit(job.id))
+
+
+def _submit(job_id):
+    with _submitted_lock:
+        if job_id in _submitted:
+            return
+        _submitted.add(job_id)
+    _get_executor().submit(_run_in_thread, job_id)
+
+
+def _run_in_thread(job_id):
+    close_old_connections()
+    try:
+        if claim_job(job_id):
+            run_summary_job(job_id)
+    finally:
+        with _submitted_lock:
+            _submitted.discard(job_id)
+        close_old_connections()
+
+
+# --- Recovery after restarts ---
+
+def sweep():
+    """ Requeues stale jobs and hands every pending job to the in-process pool. Returns the number requeued. """
+    requeued = requeue_stale_jobs()
+    if requeued:
+        logger.warning(f"Requeued {requeued} stale summary job(s)")
+    pending = MediaSummaryJob.objects.filter(
+        status=MediaSummaryJob.STATUS_PENDING
+    ).order_by('created_at').values_list('pk', flat=True)
+    for job_id in pending:
+        # Several web processes may submit the same job; claim_job() lets one of them run it
+        _submit(job_id)
+    return requeued
+
+
+def _sweep_forever(interval):
+    while True:
+        close_old_connections()
+        try:
+            sweep()
+        except Exception as e:
+            logger.error(f"Summary job sweep failed: {e}")
+        finally:
+            close_old_connections()
+        time.sleep(interval)
+
+
+def start_sweeper():
+    """ Starts this process's sweeper thread (web server entry points only). No-op without the in-process pool. """
+    global _sweeper
+    if getattr(settings, 'SUMMARY_JOB_THREADS', 2) <= 0 or _sweeper is not None:
+        return
+    _sweeper = threading.Thread(target=_sweep_forever, args=(getattr(settings, 'SUMMARY_JOB_SWEEP_INTERVAL', 60),),
+                                name='summary-job-sweeper', daemon=True)
+    _sweeper.start()
+
+
+def claim_job(job_id):
+    """ Atomically moves a pending job to uploading. Returns True if this caller won it. """
+    return MediaSummaryJob.objects.filter(
+        pk=job_id, status=MediaSummaryJob.STATUS_PENDING
+    ).update(status=MediaSummaryJob.STATUS_UPLOADING, updated_at=timezone.now()) == 1
+
+
+def claim_next_job():
+    """ Claims the oldest pending job, or returns None when the queue is empty. """
+    candidates = MediaSummaryJob.objects.filter(
+        status=MediaSummaryJob.STATUS_PENDING
+    ).order_by('created_at').values_list('pk', flat=True)[:10]
+    for job_id in candidates:
+        if claim_job(job_id):
+            return job_id
+    return None
+
+
+def requeue_stale_jobs():
+    """ Returns jobs whose worker died mid-run (no progress for SUMMARY_JOB_STALE_AFTER) to pending. """
+    cutoff = timezone.now() - timedelta(seconds=getattr(settings, 'SUMMARY_JOB_STALE_AFTER', 3600))
+    return MediaSummaryJob.objects.filter(
+        status__in=MediaSummaryJob.ACTIVE_STATUSES, updated_at__lt=cutoff
+    ).update(status=MediaSummaryJob.STATUS_PENDING, updated_at=timezone.now())
+
+
+def _set_status(job_id, status, **fields):
+    MediaSummaryJob.objects.filter(pk=job_id).update(status=status, updated_at=timezone.now(), **fields)
+
+
+def run_summary_job(job_id):
+    """
+    Runs upload -> wait -> generate for an already-claimed job and stores the
+    outcome. The job holds its owner's admission slots while it runs, like an
+    interactive request. When they are not available, the job goes back to
+    pending for a later sweep and False is returned.
+    """
+    job = MediaSummaryJob.objects.select_related('user_profile').get(pk=job_id)
+    try:
+        lease = admission.admit(job.user_profile.user_id)
+    except admission.AdmissionRejected as e:
+        logger.info(f"Summary job {job_id} deferred: {e}")
+        _set_status(job_id, MediaSummaryJob.STATUS_PENDING)
+        return False
+    try:
+        llm.configure()
+
+        # An identical job may have finished while this one was queued
+        cached = summary_cache.get_cached_summary(job.content_hash, job.model_name, job.prompt) if job.content_hash else None
+        if cached:
+            transcript, summary = cached
+        else:
+            # Reuses the earlier upload of the same bytes while Google keeps it ACTIVE.
+            # updated_at is touched on each poll so long processing is not mistaken for a dead worker.
+            uploaded_file = summarization.obtain_active_file(
+                job.content_hash, job.upload.path, job.file_name,
+                on_uploaded=lambda f: _set_status(job_id, MediaSummaryJob.STATUS_PROCESSING, remote_file_name=f.name),
+                on_poll=lambda f: _set_status(job_id, MediaSummaryJob.STATUS_PROCESSING),
+            )
+
+            _set_status(job_id, MediaSummaryJob.STATUS_GENERATING, remote_file_name=uploaded_file.name)
+            transcript, summary = summarization.generate_summary(
+                uploaded_file, job.prompt, job.model_name, job.file_name)
+            if job.content_hash:
+                summary_cache.store_summary(job.content_hash, job.model_name, job.prompt, transcript, summary)
+
+        _set_status(job_id, MediaSummaryJob.STATUS_COMPLETED,
+                    transcript=transcript, summary=summary, finished_at=timezone.now())
+        logger.info(f"Summary job {job_id} completed")
+    except Exception as e:
+        logger.error(f"Summary job {job_id} failed: {e}")
+        _set_status(job_id, MediaSummaryJob.STATUS_FAILED, error=str(e), finished_at=timezone.now())
+    finally:
+        lease.release()
+        # The result is stored on the row; the local copy of the media is no longer needed
+        if job.upload:
+            job.upload.delete(save=False)
+            MediaSummaryJob.objects.filter(pk=job_id).update(upload='')
+    return True
@@ -0,0 +1,1473 @@
+import asyncio
+import contextlib
+import io
+import json
+import math
+import re
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from types import SimpleNamespace
+from unittest import mock, skipUnless
+
+import jwt
+from asgiref.sync import ThreadSensitiveContext, async_to_sync, iscoroutinefunction, sync_to_async
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.management import CommandError, call_command
+from django.http import HttpResponse
+from django.db import OperationalError, connection, connections, transaction
+from django.db.models import Sum
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from . import (
+    admission, async_views, badges, catalog_cache, chat_sessions, fast_serializers, leaderboard, lesson_completion,
+    prompts, query_plans, quiz_grading, summarization, summary_cache, summary_jobs, views, xp_ledger,
+)
+from .chat_streaming import astream_chat_reply, stream_chat_reply
+from .firebase_auth import FirebaseAuthentication, FirebaseUserConflict, resolve_firebase_user
+from .firebase_keys import ID_TOKEN_ISSUER_PREFIX, FirebaseKeyring, TokenVerificationError
+from .models import (
+    Answer, Badge, ChatMessage, ChatSession, Choice, Course, DailyUserStats, FirebaseIdentity, LeaderboardBucket,
+    LearningTopic, Lesson, MediaSummaryCache, MediaSummaryJob, Module, Question, Quiz, QuizAttempt, QuizStreak,
+    RemoteMediaFile, UserBadge, UserProfile, UserProgress, UserTopicStats, XPEvent,
+)
+from .request_metrics import RequestMetricsMiddleware
+from .response_cache import case_study_cache
+from .serializers import (
+    CourseOutlineSerializer, CourseSerializer, LearningTopicSerializer, LessonSerializer, ModuleOutlineSerializer,
+    ModuleSerializer, QuestionSerializer, QuizAttemptSerializer, QuizSerializer, UserProgressSerializer,
+    parse_field_paths, requested_fields,
+)
+from .singleflight import SingleFlight
+from .token_cache import VerifiedTokenCache, token_cache
+
+# Process-local caches, so tests need no cache tables and never share state
+LOCAL_CACHES = {
+    alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': f'tests-{alias}'}
+    for alias in ('default', 'ai_responses', 'catalog', 'coordination')
+}
+
+
+def clear_caches():
+    """ LocMem stores outlive override_settings, and row ids repeat between tests. """
+    for alias in LOCAL_CACHES:
+        caches[alias].clear()
+
+
+def signed_in(user):
+    """ Authenticates every Firebase-protected request as `user`. """
+    return mock.patch.object(FirebaseAuthentication, 'authenticate', return_value=(user, None))
+
+
+def fake_model(text='generated'):
+    async def generate_content_async(*args, **kwargs):
+        return SimpleNamespace(text=text)
+    return mock.Mock(generate_content=mock.Mock(return_value=SimpleNamespace(text=text)),
+                     generate_content_async=generate_content_async)
+
+
+# --- Firebase identities ---
+
+class VerifiedTokenCacheTests(TestCase):
+    def setUp(self):
+        token_cache.clear()
+        self.addCleanup(token_cache.clear)
+        self.user = User.objects.create_user(username='cached')
+        self.request = RequestFactory().get('/', HTTP_AUTHORIZATION='Bearer cached-token')
+
+    def authenticate(self):
+        return FirebaseAuthentication().authenticate(self.request)
+
+    def test_hit_returns_a_copy_of_the_user_without_queries(self):
+        token_cache.set('cached-token', self.user, time.time() + 60)
+        with self.assertNumQueries(0):
+            first, _ = self.authenticate()
+            second, _ = self.authenticate()
+        self.assertEqual((first.pk, first.username), (self.user.pk, 'cached'))
+        self.assertIsNot(first, second)
+        self.assertIsNot(first._state, second._state)
+        with self.assertNumQueries(1):  # the profile is not cached; XP changes without a User save
+            self.assertEqual(first.profile.user_id, self.user.pk)
+        self.assertEqual(token_cache.stats()['hits'], 2)
+
+    def test_saving_or_deleting_the_user_revokes_its_tokens(self):
+        token_cache.set('cached-token', self.user, time.time() + 60)
+        token_cache.set('other-token', User.objects.create_user(username='other'), time.time() + 60)
+        self.user.is_active = False
+        self.user.save()
+        self.assertIsNone(token_cache.get('cached-token'))
+        self.assertIsNotNone(token_cache.get('other-token'))
+
+    def test_entries_never_outlive_the_token(self):
+        token_cache.set('expired-token', self.user, time.time() - 1)
+        token_cache.set('cached-token', self.user, time.time() + 0.05)
+        self.assertIsNone(token_cache.get('expired-token'))
+        time.sleep(0.1)
+        self.assertIsNone(token_cache.get('cached-token'))
+        self.assertEqual(token_cache.stats()['size'], 0)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = VerifiedTokenCache(max_size=2)
+        for token in ('a', 'b'):
+            cache.set(token, self.user)
+        cache.get('a')
+        cache.set('c', self.user)
+        self.assertEqual([token for token in 'abc' if cache.get(token) is not None], ['a', 'c'])
+
+    def test_stats_are_exposed_to_admins(self):
+        request = APIRequestFactory().get('/api/metrics/views/')
+        force_authenticate(request, user=User.objects.create_superuser(username='admin', email='a@example.com'))
+        response = views.request_metrics_views(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.data['token_cache']), {'size', 'max_size', 'hits', 'misses', 'hit_rate'})
+
+
+TEST_PROJECT_ID = 'test-project'
+
+
+def signing_key():
+    """ (private key, PEM certificate) of a fresh self-signed RSA key. """
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, 'test')])
+    now = datetime.now(dt_timezone.utc)
+    cert = (x509.CertificateBuilder().subject_name(name).issuer_name(name).public_key(key.public_key())
+            .serial_number(x509.random_serial_number()).not_valid_before(now)
+            .not_valid_after(now + timedelta(days=1)).sign(key, hashes.SHA256()))
+    return key, cert.public_bytes(serialization.Encoding.PEM).decode('ascii')
+
+
+def id_token(key, kid, **claims):
+    now = int(time.time())
+    claims = {'iss': ID_TOKEN_ISSUER_PREFIX + TEST_PROJECT_ID, 'aud': TEST_PROJECT_ID, 'sub': 'uid-1',
+              'iat': now, 'exp': now + 3600, **claims}
+    return jwt.encode(claims, key, algorithm='RS256', headers={'kid': kid})
+
+
+class CertificateServer:
+    """ Stand-in for Google's certificate endpoint: serves `certs` with a Cache-Control max-age. """
+
+    def __init__(self, certs, max_age=3600):
+        self.certs = certs
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = json.dumps(server.certs).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Cache-Control', f'public, max-age={max_age}')
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = HTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.httpd.server_port}/certs'
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class LocalTokenVerificationTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.key, cls.pem = signing_key()
+        cls.other_key, cls.other_pem = signing_key()
+
+    def file_keyring(self, **kwargs):
+        directory = tempfile.mkdtemp()
+        path = f'{directory}/certs.json'
+        with open(path, 'w', encoding='utf-8') as fh:
+            json.dump({'kid-1': self.pem}, fh)
+        keyring = FirebaseKeyring(source=path, **kwargs)
+        keyring.load()
+        return keyring
+
+    def test_valid_token(self):
+        claims = self.file_keyring(project_id=TEST_PROJECT_ID).verify_id_token(id_token(self.key, 'kid-1'))
+        self.assertEqual(claims['uid'], 'uid-1')
+
+    def test_project_id_is_read_from_settings_at_verification(self):
+        keyring = self.file_keyring()
+        with override_settings(FIREBASE_PROJECT_ID=TEST_PROJECT_ID):
+            self.assertEqual(keyring.verify_id_token(id_token(self.key, 'kid-1'))['uid'], 'uid-1')
+        with override_settings(FIREBASE_PROJECT_ID='another-project'):
+            with self.assertRaises(TokenVerificationError):
+                keyring.verify_id_token(id_token(self.key, 'kid-1'))
+
+    def test_wrong_audience_issuer_or_signature_is_rejected(self):
+        keyring = self.file_keyring(project_id=TEST_PROJECT_ID)
+        for token in (id_token(self.key, 'kid-1', aud='another-project'),
+                      id_token(self.key, 'kid-1', iss=ID_TOKEN_ISSUER_PREFIX + 'another-project'),
+                      id_token(self.other_key, 'kid-1')):
+            with self.subTest(token=jwt.decode(token, options={'verify_signature': False})):
+                with self.assertRaises(TokenVerificationError):
+                    keyring.verify_id_token(token)
+
+    def test_expired_token_is_rejected(self):
+        now = int(time.time())
+        with self.assertRaisesMessage(TokenVerificationError, 'expired'):
+            self.file_keyring(project_id=TEST_PROJECT_ID).verify_id_token(
+                id_token(self.key, 'kid-1', iat=now - 7200, exp=now - 3600))
+
+    def test_unknown_key_id_triggers_a_background_refresh(self):
+        server = CertificateServer({'kid-1': self.pem})
+        self.addCleanup(server.close)
+        keyring = FirebaseKeyring(source=server.url, min_refresh_interval=0, project_id=TEST_PROJECT_ID)
+        keyring.start()
+        self.addCleanup(keyring.stop)
+        self.assertAlmostEqual(keyring._expires_at - time.time(), 3600, delta=5)  # from Cache-Control
+
+        server.certs = {'kid-1': self.pem, 'kid-2': self.other_pem}  # the signing key rotates
+        rotated = id_token(self.other_key, 'kid-2')
+        with self.assertRaisesMessage(TokenVerificationError, 'Unknown signing key id'):
+            keyring.verify_id_token(rotated)
+        deadline = time.monotonic() + 5
+        while 'kid-2' not in keyring._keys and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(keyring.verify_id_token(rotated)['uid'], 'uid-1')
+
+    def test_authentication_never_downloads_certificates(self):
+        keyring = FirebaseKeyring(source='http://certificates.invalid/', project_id=TEST_PROJECT_ID)
+        request = RequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {id_token(self.key, "kid-1")}')
+        with mock.patch('api.firebase_auth.keyring', keyring), mock.patch.object(keyring, '_fetch') as fetch:
+            with self.assertRaises(AuthenticationFailed):
+                FirebaseAuthentication().authenticate(request)
+        fetch.assert_not_called()
+
+
+class ResolveFirebaseUserTests(TestCase):
+    def test_second_uid_for_an_email_signs_in_as_the_same_user(self):
+        first = resolve_firebase_user('uid-a', 'dup@example.com')
+        second = resolve_firebase_user('uid-b', 'dup@example.com')
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(set(first.firebase_identities.values_list('uid', flat=True)), {'uid-a', 'uid-b'})
+        self.assertEqual(resolve_firebase_user('uid-b', 'dup@example.com').pk, first.pk)
+
+    def test_existing_account_is_linked_by_email(self):
+        user = User.objects.create_user(username='legacy', email='legacy@example.com')
+        self.assertEqual(resolve_firebase_user('uid-legacy', 'legacy@example.com').pk, user.pk)
+        self.assertTrue(FirebaseIdentity.objects.filter(uid='uid-legacy', user=user).exists())
+
+    def test_taken_username_raises_a_clear_error(self):
+        User.objects.create_user(username='taken@example.com', email='other@example.com')
+        with self.assertRaises(FirebaseUserConflict):
+            resolve_firebase_user('uid-taken', 'taken@example.com')
+        self.assertFalse(FirebaseIdentity.objects.filter(uid='uid-taken').exists())
+
+
+# --- Media summarization ---
+
+def _remote_file(state):
+    return SimpleNamespace(name='files/abc', display_name='talk.mp3', state=SimpleNamespace(name=state))
+
+
+@override_settings(SUMMARY_PROCESSING_TIMEOUT=1, SUMMARY_POLL_INITIAL_DELAY=0.01, SUMMARY_POLL_MAX_DELAY=0.01)
+class WaitUntilActiveTests(SimpleTestCase):
+    def test_stuck_file_times_out(self):
+        with mock.patch('google.generativeai.get_file', return_value=_remote_file('PROCESSING')):
+            with self.assertRaisesMessage(summarization.SummarizationError, 'still processing after 1s'):
+                summarization.wait_until_active(_remote_file('PROCESSING'))
+            with self.assertRaisesMessage(summarization.SummarizationError, 'still processing after 1s'):
+                async_to_sync(summarization.await_until_active)(_remote_file('PROCESSING'))
+
+    def test_returns_the_active_file_or_raises_on_failure(self):
+        states = iter(['PROCESSING', 'ACTIVE'])
+        with mock.patch('google.generativeai.get_file', side_effect=lambda name: _remote_file(next(states))):
+            self.assertEqual(async_to_sync(summarization.await_until_active)(_remote_file('PROCESSING')).state.name,
+                             'ACTIVE')
+        with mock.patch('google.generativeai.get_file', return_value=_remote_file('FAILED')):
+            with self.assertRaisesMessage(summarization.SummarizationError, 'failed on the Google AI server'):
+                async_to_sync(summarization.await_until_active)(_remote_file('PROCESSING'))
+
+
+class SummaryJobSweepTests(TestCase):
+    def setUp(self):
+        profile = User.objects.create_user(username='jobs').profile
+        self.job = lambda **fields: MediaSummaryJob.objects.create(
+            user_profile=profile, file_name='a.mp3', model_name='m', **fields)
+
+    @override_settings(SUMMARY_JOB_STALE_AFTER=60)
+    def test_restart_leftovers_are_requeued_and_run(self):
+        pending = self.job()
+        stale = self.job(status=MediaSummaryJob.STATUS_PROCESSING)
+        MediaSummaryJob.objects.filter(pk=stale.pk).update(updated_at=timezone.now() - timedelta(hours=1))
+        live = self.job(status=MediaSummaryJob.STATUS_GENERATING)
+
+        executor = mock.Mock(submit=lambda fn, job_id: fn(job_id))
+        with mock.patch.object(summary_jobs, '_get_executor', return_value=executor), \
+                mock.patch.object(summary_jobs, 'run_summary_job') as run:
+            self.assertEqual(summary_jobs.sweep(), 1)
+        self.assertCountEqual([c.args[0] for c in run.call_args_list], [pending.pk, stale.pk])
+        self.assertEqual(MediaSummaryJob.objects.get(pk=live.pk).status, MediaSummaryJob.STATUS_GENERATING)
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class SummaryCacheTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.user = User.objects.create_user(username='listener')
+        self.model = fake_model('## Transcript: words ## Summary: gist')
+        self.upload_file = mock.Mock(return_value=_remote_file('ACTIVE'))
+        self.get_file = mock.Mock(return_value=_remote_file('ACTIVE'))
+        patches = [mock.patch('api.llm.configure'), mock.patch('api.llm.get_model', return_value=self.model),
+                   mock.patch('google.generativeai.upload_file', self.upload_file),
+                   mock.patch('google.generativeai.get_file', self.get_file)]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def summarize(self, prompt='', content=b'recording'):
+        with signed_in(self.user):
+            response = self.client.post('/api/tools/summarize/', {
+                'file': ContentFile(content, name='talk.mp3'), 'prompt': prompt}, secure=True)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_repeat_upload_is_served_without_upload_or_generation(self):
+        self.assertEqual(self.summarize('key points')['X-Cache'], 'MISS')
+        response = self.summarize('  key   points ')
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(response.json()['summary'], 'gist')
+        self.assertEqual(self.upload_file.call_count, 1)
+        self.assertEqual(self.model.generate_content.call_count, 1)
+        self.get_file.assert_not_called()
+        self.assertEqual(MediaSummaryCache.objects.get().hit_count, 1)
+
+    def test_different_prompt_reuses_the_remote_file(self):
+        self.summarize('key points')
+        self.assertEqual(self.summarize('action items')['X-Cache'], 'MISS')
+        self.assertEqual(self.upload_file.call_count, 1)
+        self.get_file.assert_called_once_with('files/abc')
+        self.assertEqual(self.model.generate_content.call_count, 2)
+
+    def test_expired_gone_or_inactive_remote_file_is_uploaded_again(self):
+        self.summarize('first')
+        RemoteMediaFile.objects.update(expires_at=timezone.now() - timedelta(minutes=1))
+        self.summarize('expired')
+        self.get_file.assert_not_called()
+
+        self.get_file.side_effect = Exception('404 File not found')
+        self.summarize('deleted by Google')
+        self.get_file.side_effect = None
+        self.get_file.return_value = _remote_file('FAILED')
+        self.summarize('not active')
+
+        self.assertEqual(self.upload_file.call_count, 4)
+        self.assertEqual(RemoteMediaFile.objects.count(), 1)
+        self.assertGreater(RemoteMediaFile.objects.get().expires_at, timezone.now())
+
+    @override_settings(SUMMARY_CACHE_TTL=3600, SUMMARY_CACHE_MAX_ENTRIES=2)
+    def test_eviction_drops_expired_then_least_recently_used(self):
+        for content_hash in ('a', 'b'):
+            summary_cache.store_summary(content_hash, 'm', '', 't', 's')
+        summary_cache.get_cached_summary('a', 'm', '')  # 'b' is now the least recently used
+        summary_cache.store_summary('c', 'm', '', 't', 's')
+        self.assertEqual(sorted(MediaSummaryCache.objects.values_list('content_hash', flat=True)), ['a', 'c'])
+
+        MediaSummaryCache.objects.filter(content_hash='c').update(created_at=timezone.now() - timedelta(hours=2))
+        self.assertIsNone(summary_cache.get_cached_summary('c', 'm', ''))
+        summary_cache.evict_summaries()
+        self.assertEqual(list(MediaSummaryCache.objects.values_list('content_hash', flat=True)), ['a'])
+
+
+# --- Async AI views ---
+
+def slow_model(delay, text='generated'):
+    """ A fake Gemini model whose every call takes `delay` seconds (blocking or awaited). """
+    def generate_content(*args, **kwargs):
+        time.sleep(delay)
+        return SimpleNamespace(text=text)
+
+    async def generate_content_async(*args, **kwargs):
+        await asyncio.sleep(delay)
+        return SimpleNamespace(text=text)
+    return mock.Mock(generate_content=generate_content, generate_content_async=generate_content_async)
+
+
+@override_settings(CACHES=LOCAL_CACHES, MEDIA_ROOT=tempfile.mkdtemp())
+class AsyncSummarizeMediaTests(TestCase):
+    def test_body_and_upload_are_read_off_the_event_loop(self):
+        user = User.objects.create_user(username='uploader')
+        threads = {'loop': set(), 'parse': set(), 'read': set()}
+        parse_body = async_views._parse_body
+
+        def parse(request):
+            threads['parse'].add(threading.get_ident())
+            return parse_body(request)
+
+        def file_content(file_obj):
+            threads['read'].add(threading.get_ident())
+            return file_obj.read()
+
+        async def until_active(uploaded_file, timeout=None):
+            threads['loop'].add(threading.get_ident())
+            return uploaded_file
+
+        request = RequestFactory().post('/api/tools/summarize-media/', {
+            'file': ContentFile(b'media bytes', name='talk.mp3'), 'prompt': 'key points'}, secure=True)
+        with signed_in(user), mock.patch('api.llm.configure'), \
+                mock.patch('api.llm.get_model', return_value=fake_model('## Transcript: words ## Summary: gist')), \
+                mock.patch.object(async_views, '_parse_body', parse), \
+                mock.patch.object(summarization, 'file_content', file_content), \
+                mock.patch.object(summarization, 'upload_media', return_value=SimpleNamespace(name='files/talk')), \
+                mock.patch.object(summarization, 'await_until_active', until_active):
+            response = async_to_sync(async_views.summarize_media)(request)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)['summary'], 'gist')
+        self.assertEqual(len(threads['loop']), 1)
+        self.assertTrue(threads['parse'] and threads['read'])
+        self.assertFalse((threads['parse'] | threads['read']) & threads['loop'])
+
+
+@override_settings(CACHES=LOCAL_CACHES, AI_MAX_CONCURRENT_CALLS=100, AI_MAX_CONCURRENT_PER_USER=100)
+class AsyncViewLoadTests(SimpleTestCase):
+    """ A fake slow LLM: one sync worker serves generations in turn, one event loop overlaps them. """
+    REQUESTS = 10
+    DELAY = 0.2
+
+    def setUp(self):
+        clear_caches()
+        patches = [mock.patch('api.llm.configure'), mock.patch('api.llm.get_model', return_value=slow_model(self.DELAY)),
+                   signed_in(User(pk=1, username='load'))]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def post(self, prompt):
+        return RequestFactory().post('/api/tools/generate-case-study/', {'prompt': prompt}, secure=True)
+
+    def test_slow_generations_overlap_on_one_event_loop(self):
+        start = time.perf_counter()
+        for i in range(self.REQUESTS):
+            self.assertEqual(views.generate_case_study(self.post(f'sync topic {i}')).status_code, 200)
+        sync_elapsed = time.perf_counter() - start
+
+        async def burst():
+            return await asyncio.gather(*(async_views.generate_case_study(self.post(f'async topic {i}'))
+                                          for i in range(self.REQUESTS)))
+
+        start = time.perf_counter()
+        responses = async_to_sync(burst)()
+        async_elapsed = time.perf_counter() - start
+
+        self.assertEqual([response.status_code for response in responses], [200] * self.REQUESTS)
+        self.assertGreaterEqual(sync_elapsed, self.REQUESTS * self.DELAY)
+        self.assertLess(async_elapsed, 3 * self.DELAY)
+
+
+# --- Chat ---
+
+class FakeStream:
+    """
+    A chunked upstream reply like the SDK's streaming response: yields `texts`,
+    then raises `error` if given, or blocks forever when `hang` is set.
+    """
+
+    def __init__(self, texts, error=None, hang=False):
+        self.texts, self.error, self.hang = texts, error, hang
+        self._iterator = mock.Mock()  # the gRPC call; _cancel_upstream() calls its cancel()
+
+    def __iter__(self):
+        for text in self.texts:
+            yield SimpleNamespace(text=text)
+        if self.error:
+            raise self.error
+
+    async def __aiter__(self):
+        for text in self.texts:
+            yield SimpleNamespace(text=text)
+        if self.error:
+            raise self.error
+        if self.hang:
+            await asyncio.Event().wait()
+
+
+def fake_chat(upstream):
+    """ A chat whose send_message(..., stream=True) (sync or async) returns `upstream`. """
+    async def send_message_async(message, stream=False):
+        return upstream
+    return mock.Mock(send_message=mock.Mock(return_value=upstream), send_message_async=send_message_async)
+
+
+def parse_sse(event):
+    lines = event.rstrip('\n').split('\n')
+    name = lines[0][len('event: '):] if lines[0].startswith('event: ') else None
+    return name, json.loads(lines[-1][len('data: '):])
+
+
+class ChatStreamingTests(SimpleTestCase):
+    def test_chunks_then_done_with_timings(self):
+        on_complete = mock.Mock()
+        events = list(stream_chat_reply(fake_chat(FakeStream(['Hel', 'lo '])), 'hi', on_complete=on_complete))
+        self.assertEqual(events[:2], ['data: {"text": "Hel"}\n\n', 'data: {"text": "lo "}\n\n'])
+        name, timings = parse_sse(events[2])
+        self.assertEqual((name, set(timings)), ('done', {'ttfb_ms', 'total_ms'}))
+        self.assertGreaterEqual(timings['total_ms'], timings['ttfb_ms'])
+        on_complete.assert_called_once_with('Hello')
+
+    def test_upstream_error_ends_with_an_error_event(self):
+        on_complete = mock.Mock()
+        stream = FakeStream(['partial'], error=RuntimeError('quota exceeded'))
+        events = list(stream_chat_reply(fake_chat(stream), 'hi', on_complete=on_complete))
+        self.assertEqual(parse_sse(events[-1]), ('error', {'error': 'Failed to get chatbot response: quota exceeded'}))
+        on_complete.assert_not_called()
+        stream._iterator.cancel.assert_not_called()
+
+    def test_closing_the_generator_cancels_upstream(self):
+        on_complete = mock.Mock()
+        stream = FakeStream(['one', 'two', 'three'])
+        events = stream_chat_reply(fake_chat(stream), 'hi', on_complete=on_complete)
+        next(events)
+        events.close()  # what a WSGI server does when the client disconnects
+        stream._iterator.cancel.assert_called_once_with()
+        on_complete.assert_not_called()
+
+    def test_async_stream_and_on_complete(self):
+        replies = []
+
+        async def on_complete(reply):
+            replies.append(reply)
+
+        async def collect():
+            return [event async for event in astream_chat_reply(fake_chat(FakeStream(['a', 'b'])), 'hi', on_complete)]
+
+        events = async_to_sync(collect)()
+        self.assertEqual([parse_sse(event)[0] for event in events], [None, None, 'done'])
+        self.assertEqual(replies, ['ab'])
+
+    def test_cancelling_the_async_stream_cancels_upstream(self):
+        stream = FakeStream(['first'], hang=True)
+        on_complete = mock.AsyncMock()
+
+        async def disconnect():
+            received = []
+
+            async def consume():
+                async for event in astream_chat_reply(fake_chat(stream), 'hi', on_complete):
+                    received.append(event)
+
+            task = asyncio.ensure_future(consume())
+            while not received:
+                await asyncio.sleep(0)
+            task.cancel()  # what Django does when an ASGI client disconnects
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        async_to_sync(disconnect)()
+        stream._iterator.cancel.assert_called_once_with()
+        on_complete.assert_not_called()
+
+
+@override_settings(CHAT_CONTEXT_TOKEN_BUDGET=100, CHAT_MIN_RECENT_MESSAGES=4)
+class ChatCompactionTests(TestCase):
+    def setUp(self):
+        self.session = ChatSession.objects.create(user_profile=User.objects.create_user(username='chatty').profile)
+
+    def add_turns(self, *tokens):
+        """ Alternating user/model messages with the given token estimates; returns their ids. """
+        return [ChatMessage.objects.create(session=self.session, role='model' if i % 2 else 'user',
+                                           text=f'message {i}', token_estimate=n).pk
+                for i, n in enumerate(tokens)]
+
+    def planned(self):
+        return [message_id for message_id, *_ in chat_sessions.plan_compaction(self.session)]
+
+    def test_nothing_is_folded_within_budget(self):
+        self.add_turns(20, 20, 20, 20)
+        self.assertEqual(chat_sessions.plan_compaction(self.session), [])
+
+    def test_fold_ends_on_a_model_turn(self):
+        ids = self.add_turns(70, 5, 5, 5, 5, 5, 5, 5)
+        # Half the budget is reached after the first (user) message, so the model reply is folded with it
+        self.assertEqual(self.planned(), ids[:2])
+
+    def test_recent_messages_are_always_kept(self):
+        ids = self.add_turns(50, 50, 50, 50, 50, 50)
+        self.assertEqual(self.planned(), ids[:2])
+
+    def test_losing_the_compare_and_set_refreshes_the_session(self):
+        ids = self.add_turns(50, 50, 50, 50, 50, 50)
+        stale = ChatSession.objects.get(pk=self.session.pk)
+        turns = chat_sessions.plan_compaction(self.session)
+        chat_sessions.apply_compaction(self.session, turns, 'first rollup')
+        chat_sessions.apply_compaction(stale, chat_sessions.plan_compaction(stale), 'second rollup')
+        self.assertEqual((stale.summary, stale.summarized_until), ('first rollup', ids[1]))
+        self.session.refresh_from_db()
+        self.assertEqual((self.session.summary, self.session.summarized_until), ('first rollup', ids[1]))
+
+    def test_history_starts_with_the_summary(self):
+        self.add_turns(50, 50, 50, 50, 50, 50)
+        chat_sessions.compact_session(self.session, fake_model(' rolled up '))
+        history = chat_sessions.build_history(self.session)
+        self.assertEqual(history[:2], [
+            {'role': 'user', 'parts': [f'{prompts.CHAT_SUMMARY_PREFIX}\nrolled up']},
+            {'role': 'model', 'parts': [prompts.CHAT_SUMMARY_ACK]},
+        ])
+        self.assertEqual([turn['parts'][0] for turn in history[2:]], [f'message {i}' for i in range(2, 6)])
+
+
+# --- Admission control ---
+
+@override_settings(CACHES=LOCAL_CACHES, AI_ADMISSION_ENABLED=True, AI_MAX_CONCURRENT_CALLS=1,
+                   AI_MAX_CONCURRENT_PER_USER=1, AI_ADMISSION_QUEUE_SIZE=0, AI_ADMISSION_QUEUE_TIMEOUT=0.1)
+class AdmissionTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.user = User.objects.create_user(username='busy')
+        self.other = User.objects.create_user(username='other')
+        self.patches = [mock.patch('api.llm.configure'), mock.patch('api.llm.get_model', return_value=fake_model())]
+        for patch in self.patches:
+            patch.start()
+        self.addCleanup(lambda: [patch.stop() for patch in self.patches])
+        case_study_cache.set('gemini-1.5-flash', 'cached topic', 'from cache')
+
+    def case_study(self, prompt):
+        with signed_in(self.user):
+            return self.client.post('/api/tools/generate-case-study/', {'prompt': prompt}, secure=True)
+
+    def async_case_study(self, prompt):
+        request = RequestFactory().post('/api/tools/generate-case-study/', {'prompt': prompt}, secure=True)
+        with signed_in(self.user):
+            return async_to_sync(async_views.generate_case_study)(request)
+
+    def test_cache_hits_do_not_need_a_slot(self):
+        with admission.admitted(self.other.pk):  # the only global slot
+            for call in (self.case_study, self.async_case_study):
+                response = call('cached topic')
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response['X-Cache'], 'HIT')
+
+    def test_generation_is_rejected_when_slots_are_taken(self):
+        for holder in (self.user, self.other):  # per-user limit, then global limit
+            with admission.admitted(holder.pk):
+                for call in (self.case_study, self.async_case_study):
+                    response = call('new topic')
+                    self.assertEqual(response.status_code, 429)
+                    self.assertIn('Retry-After', response)
+        self.assertEqual(self.case_study('new topic').status_code, 200)
+
+    def test_streamed_reply_holds_the_slot_until_the_stream_ends(self):
+        chat = mock.Mock(send_message=mock.Mock(return_value=[SimpleNamespace(text='hi')]))
+        with mock.patch('api.llm.get_model', return_value=mock.Mock(start_chat=mock.Mock(return_value=chat))), \
+                signed_in(self.user):
+            response = self.client.post('/api/chatbot/message/', {'message': 'hello', 'stream': 'true'}, secure=True)
+        self.assertEqual(response.status_code, 200)
+        with self.assertRaises(admission.AdmissionRejected):
+            admission.acquire(self.other.pk)
+        self.assertIn('hi', b''.join(response.streaming_content).decode())
+        response.close()
+        admission.acquire(self.other.pk).release()
+
+    @override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+    def test_summary_job_waits_for_its_owners_slot(self):
+        job = MediaSummaryJob.objects.create(user_profile=self.user.profile, file_name='a.mp3', model_name='m',
+                                             status=MediaSummaryJob.STATUS_UPLOADING)
+        job.upload.save('a.mp3', ContentFile(b'media'))
+        with admission.admitted(self.user.pk):
+            self.assertFalse(summary_jobs.run_summary_job(job.pk))
+        job.refresh_from_db()
+        self.assertEqual(job.status, MediaSummaryJob.STATUS_PENDING)
+        self.assertTrue(job.upload)
+
+
+@override_settings(CACHES=LOCAL_CACHES, AI_ADMISSION_ENABLED=True, AI_MAX_CONCURRENT_CALLS=2,
+                   AI_MAX_CONCURRENT_PER_USER=1, AI_ADMISSION_QUEUE_SIZE=1, AI_ADMISSION_QUEUE_TIMEOUT=2)
+class AdmissionLoadTests(TestCase):
+    """ A fake slow upstream saturates the AI slots while the catalog and profile views keep answering. """
+    DELAY = 0.5
+
+    def setUp(self):
+        clear_caches()
+        self.users = {name: User.objects.create_user(username=name) for name in ('a', 'b', 'c', 'd', 'e')}
+        Course.objects.create(topic=LearningTopic.objects.create(title='Maths'), title='Algebra', description='Numbers')
+        patches = [
+            mock.patch('api.llm.configure'), mock.patch('api.llm.get_model', return_value=slow_model(self.DELAY)),
+            mock.patch.object(FirebaseAuthentication, 'authenticate',
+                              side_effect=lambda request: (self.users[request.META['HTTP_X_TEST_USER']], None)),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    async def timed(self, view, request):
+        start = time.perf_counter()
+        response = await view(request)
+        return response, time.perf_counter() - start
+
+    def test_saturated_ai_slots_leave_other_endpoints_responsive(self):
+        factory = RequestFactory()
+        # a and b take the global slots, c queues for one, a's second request and d, e are turned away
+        generations = [
+            factory.post('/api/tools/generate-case-study/', {'prompt': f'topic {i}'}, secure=True,
+                         HTTP_X_TEST_USER=name)
+            for i, name in enumerate('aabcde')
+        ]
+        profile = factory.get('/api/profile/', secure=True, HTTP_X_TEST_USER='a')
+        catalog = factory.get('/api/courses/', secure=True)
+
+        async def load():
+            burst = asyncio.gather(*(self.timed(async_views.generate_case_study, request) for request in generations))
+            await asyncio.sleep(self.DELAY / 5)  # every slot and the queue place are taken by now
+            others = [await self.timed(sync_to_async(view), request) for view, request in (
+                (views.UserProfileView.as_view(), profile), (views.CourseListView.as_view(), catalog))]
+            return await burst, others
+
+        generated, others = async_to_sync(load)()
+
+        for response, elapsed in others:
+            self.assertEqual(response.status_code, 200)
+            self.assertLess(elapsed, self.DELAY / 2)
+        statuses = sorted(response.status_code for response, _ in generated)
+        self.assertEqual(statuses, [200, 200, 200, 429, 429, 429])
+        for response, elapsed in generated:
+            if response.status_code == 429:
+                self.assertEqual(response['Retry-After'], '2')
+                self.assertLess(elapsed, self.DELAY / 2)  # rejected at once, not after queueing
+            else:
+                self.assertLess(elapsed, 3 * self.DELAY)  # the queued request runs once a slot frees up
+
+
+# --- Single-flight coalescing ---
+
+@override_settings(CACHES=LOCAL_CACHES)
+class SingleFlightTests(SimpleTestCase):
+    CALLERS = 8
+
+    def setUp(self):
+        clear_caches()
+        self.flight = SingleFlight('tests')
+        self.upstream_calls = 0
+        self.release = threading.Event()
+
+    def upstream(self, error=None):
+        self.upstream_calls += 1
+        self.release.wait(5)  # stay in flight until every caller has arrived
+        if error:
+            raise error
+        return 'reply'
+
+    def run_threads(self, fn):
+        outcomes = []
+
+        def call():
+            try:
+                outcomes.append(self.flight.do('key', fn))
+            except Exception as e:
+                outcomes.append(e)
+
+        threads = [threading.Thread(target=call) for _ in range(self.CALLERS)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.2)
+        self.release.set()
+        for thread in threads:
+            thread.join()
+        return outcomes
+
+    def test_identical_concurrent_calls_reach_upstream_once(self):
+        outcomes = self.run_threads(self.upstream)
+        self.assertEqual(self.upstream_calls, 1)
+        self.assertCountEqual(outcomes, [('reply', False)] + [('reply', True)] * (self.CALLERS - 1))
+
+    def test_the_leaders_error_reaches_every_waiter(self):
+        error = ValueError('upstream failed')
+        outcomes = self.run_threads(lambda: self.upstream(error))
+        self.assertEqual(self.upstream_calls, 1)
+        self.assertEqual(outcomes, [error] * self.CALLERS)
+        # Errors are not cached: the next call goes upstream again
+        self.release.set()
+        self.assertEqual(self.flight.do('key', self.upstream), ('reply', False))
+        self.assertEqual(self.upstream_calls, 2)
+
+    def test_async_callers_share_one_call_and_its_error(self):
+        async def upstream(error=None):
+            self.upstream_calls += 1
+            await asyncio.sleep(0.1)
+            if error:
+                raise error
+            return 'reply'
+
+        async def gather(key, afn):
+            return await asyncio.gather(*[self.flight.ado(key, afn) for _ in range(self.CALLERS)],
+                                        return_exceptions=True)
+
+        outcomes = async_to_sync(gather)('key', upstream)
+        self.assertEqual(self.upstream_calls, 1)
+        self.assertEqual([result for result, _ in outcomes], ['reply'] * self.CALLERS)
+
+        error = ValueError('upstream failed')
+        outcomes = async_to_sync(gather)('failing key', lambda: upstream(error))
+        self.assertEqual(self.upstream_calls, 2)
+        self.assertEqual(outcomes, [error] * self.CALLERS)
+
+    def test_another_workers_published_result_is_reused(self):
+        self.release.set()
+        self.flight.do('key', self.upstream)
+        other_worker = SingleFlight('tests')
+        self.assertEqual(other_worker.do('key', self.upstream), ('reply', True))
+        self.assertEqual(self.upstream_calls, 1)
+
+
+# --- Quiz submission ---
+
+def build_quiz(module, questions, choices=4):
+    """ A quiz with `questions` questions (the first choice of each is correct) and its all-correct answers. """
+    quiz = Quiz.objects.create(module=module, title=f'{questions} questions', xp_reward=20)
+    created = Question.objects.bulk_create([Question(quiz=quiz, text='?', order=i) for i in range(questions)])
+    Choice.objects.bulk_create([Choice(question=question, text=str(c), is_correct=c == 0)
+                                for question in created for c in range(choices)])
+    correct = Choice.objects.filter(question__quiz=quiz, is_correct=True).values_list('question_id', 'id')
+    return quiz, {str(question_id): choice_id for question_id, choice_id in correct}
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class SubmitQuizTests(TestCase):
+    SIZES = (10, 100, 500)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='student')
+        topic = LearningTopic.objects.create(title='Quizzes')
+        module = Module.objects.create(course=Course.objects.create(topic=topic, title='c', description='d'), title='m')
+        cls.quizzes = {size: build_quiz(module, size) for size in cls.SIZES}
+
+    def setUp(self):
+        clear_caches()
+
+    def submit(self, quiz, answers):
+        with signed_in(self.user):
+            response = self.client.post('/api/quizzes/submit/', {'quiz_id': quiz.pk, 'answers': answers},
+                                        content_type='application/json', secure=True)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    @staticmethod
+    def answer_inserts(size):
+        # bulk_create's statements for `size` Answer rows: one on PostgreSQL, SQLite splits at 999 parameters
+        fields = [field for field in Answer._meta.concrete_fields if not field.primary_key]
+        return math.ceil(size / connection.ops.bulk_batch_size(fields, [None] * size))
+
+    def test_query_count_does_not_grow_with_quiz_size(self):
+        smallest = self.SIZES[0]
+        with CaptureQueriesContext(connection) as cold:
+            self.submit(*self.quizzes[smallest])  # compiles and caches the answer key
+        with CaptureQueriesContext(connection) as warm:
+            self.submit(*self.quizzes[smallest])
+
+        for size in self.SIZES[1:]:
+            quiz, answers = self.quizzes[size]
+            extra_inserts = self.answer_inserts(size) - self.answer_inserts(smallest)
+            with self.assertNumQueries(len(cold) + extra_inserts):
+                self.submit(quiz, answers)
+            with self.assertNumQueries(len(warm) + extra_inserts):
+                result = self.submit(quiz, answers)
+            self.assertEqual((result['score'], result['passed']), (100.0, True))
+            self.assertEqual(quiz.attempts.get(pk=result['id']).answers.filter(is_correct=True).count(), size)
+        self.assertEqual(XPEvent.objects.filter(user_profile=self.user.profile).count(), 2 * len(self.SIZES))
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class AnswerKeyInvalidationTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.topics = [LearningTopic.objects.create(title=f'Topic {i}') for i in range(2)]
+        self.courses = [Course.objects.create(topic=topic, title='c', description='d') for topic in self.topics]
+        self.module = Module.objects.create(course=self.courses[0], title='m')
+        self.quiz, _ = build_quiz(self.module, 2)
+
+    def cached_topic(self):
+        return quiz_grading.get_answer_key(self.quiz.pk)['topic_id']
+
+    def test_moving_a_course_or_module_recompiles_the_topic(self):
+        self.assertEqual(self.cached_topic(), self.topics[0].pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.courses[0].topic = self.topics[1]
+            self.courses[0].save()
+        self.assertEqual(self.cached_topic(), self.topics[1].pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.courses[0].topic = self.topics[0]
+            self.courses[0].save()
+            self.module.course = self.courses[1]
+            self.module.save()
+        self.assertEqual(self.cached_topic(), self.topics[1].pk)
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class ConcurrentXPAwardTests(TransactionTestCase):
+    THREADS = 8
+
+    def setUp(self):
+        clear_caches()
+        self.profile = User.objects.create_user(username='racer').profile
+        User.objects.create_user(username='bystander')
+
+    def award_from_threads(self, awards):
+        """ Runs award_xp(*args) for each args from its own thread and connection, all released at once. """
+        barrier = threading.Barrier(len(awards))
+        errors = []
+
+        def award(args):
+            try:
+                barrier.wait()
+                for attempt in range(50):
+                    try:
+                        xp_ledger.award_xp(*args)
+                        break
+                    except OperationalError:  # SQLite allows one writer and does not wait in shared-cache mode
+                        time.sleep(0.01)
+                else:
+                    raise AssertionError(f"award {args} never got the write lock")
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=award, args=(args,)) for args in awards]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def test_concurrent_awards_fold_to_the_ledger_total(self):
+        awards = [(self.profile.pk, XPEvent.SOURCE_LESSON, source_id, 10 * source_id)
+                  for source_id in range(1, self.THREADS + 1)]
+        self.award_from_threads(awards + awards[:2])  # two retried requests award nothing more
+
+        self.profile.refresh_from_db()
+        total = XPEvent.objects.filter(user_profile=self.profile).aggregate(total=Sum('amount'))['total']
+        self.assertEqual(total, sum(amount for *_, amount in awards))
+        self.assertEqual((self.profile.xp, self.profile.level), (total, xp_ledger.level_for_xp(total)))
+
+        buckets = dict(LeaderboardBucket.objects.exclude(count=0).values_list('xp', 'count'))
+        self.assertEqual(buckets, {0: 1, total: 1})
+        self.assertEqual(sum(buckets.values()), UserProfile.objects.count())
+
+
+class BulkLessonCompletionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        module = Module.objects.create(course=Course.objects.create(
+            topic=LearningTopic.objects.create(title='Topic'), title='Course', description=''), title='Module', order=1)
+        cls.lessons = [Lesson.objects.create(module=module, title=f'Lesson {xp}', order=i, xp_value=xp)
+                       for i, xp in enumerate((10, 25))]
+        cls.ann, cls.bob, cls.nobody = (User.objects.create_user(username=name) for name in ('ann', 'bob', 'nobody'))
+        cls.nobody.profile.delete()
+        UserProgress.objects.create(user_profile=cls.ann.profile, lesson=cls.lessons[0])
+        xp_ledger.award_xp(cls.ann.profile.pk, XPEvent.SOURCE_LESSON, cls.lessons[0].pk, 90)
+        xp_ledger.fold_xp(cls.ann.profile.pk)
+
+    def test_each_item_gets_its_own_status(self):
+        first, second = (lesson.pk for lesson in self.lessons)
+        pairs = [(self.ann.pk, second), (self.ann.pk, second), (str(self.bob.pk), first), (self.bob.pk, second),
+                 (self.ann.pk, first), (999999, first), (self.nobody.pk, first), (self.bob.pk, 999999),
+                 ('x', first), (True, first)]
+        results = lesson_completion.complete_lessons(pairs, batch_size=2)
+        self.assertEqual([(result['status'], result['xp_awarded']) for result in results], [
+            ('completed', 25), ('duplicate', 0), ('completed', 10), ('completed', 25), ('already_completed', 0),
+            ('user_not_found', 0), ('profile_not_found', 0), ('lesson_not_found', 0), ('invalid', 0), ('invalid', 0),
+        ])
+        self.assertEqual(results[2]['user_id'], self.bob.pk)
+
+    def test_xp_is_folded_per_profile_in_one_pass(self):
+        pairs = [(self.ann.pk, self.lessons[1].pk), (self.bob.pk, self.lessons[0].pk),
+                 (self.bob.pk, self.lessons[1].pk)]
+        with mock.patch.object(xp_ledger, 'fold_profiles', wraps=xp_ledger.fold_profiles) as fold_profiles:
+            lesson_completion.complete_lessons(pairs)
+        fold_profiles.assert_called_once_with({self.ann.profile.pk, self.bob.profile.pk})
+        profiles = UserProfile.objects.filter(user__in=[self.ann, self.bob]).order_by('user__username')
+        self.assertEqual(list(profiles.values_list('xp', 'level')), [(115, 2), (35, 1)])
+        self.assertEqual(dict(LeaderboardBucket.objects.filter(xp__gt=0, count__gt=0).values_list('xp', 'count')),
+                         {115: 1, 35: 1})
+        self.assertEqual(dict(DailyUserStats.objects.values_list('user_profile_id').annotate(xp=Sum('xp_earned'))),
+                         {self.ann.profile.pk: 25, self.bob.profile.pk: 35})
+
+        results = lesson_completion.complete_lessons(pairs)  # a retried import awards nothing more
+        self.assertEqual(lesson_completion.summarize(results), {'already_completed': 3})
+        self.assertEqual(list(profiles.values_list('xp', flat=True)), [115, 35])
+
+    def test_view_logs_the_summary(self):
+        request = APIRequestFactory().post('/api/lessons/complete/bulk/', {'items': [
+            {'user_id': self.bob.pk, 'lesson_id': self.lessons[0].pk}, {'user_id': self.bob.pk}]}, format='json')
+        force_authenticate(request, user=User.objects.create_superuser(username='admin', email='a@example.com'))
+        with self.assertLogs('api.views', 'INFO') as logs:
+            response = views.bulk_complete_lessons(request)
+        self.assertEqual(response.data['summary'], {'completed': 1, 'invalid': 1})
+        self.assertEqual(logs.output,
+                         ["INFO:api.views:Bulk lesson completion by admin: {'completed': 1, 'invalid': 1}"])
+
+    def test_command_reads_pairs_from_csv(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = f'{directory}/completions.csv'
+            with open(path, 'w', encoding='utf-8') as fh:
+                fh.write(f'user_id,lesson_id\n{self.bob.pk},{self.lessons[1].pk}\n{self.ann.pk},{self.lessons[0].pk}\n')
+            out = io.StringIO()
+            call_command('complete_lessons', path, stdout=out)
+            self.assertEqual(out.getvalue().strip(),
+                             "Processed 2 pair(s), 25 XP awarded (already_completed: 1, completed: 1).")
+            self.assertEqual(UserProfile.objects.get(user=self.bob).xp, 25)
+
+            with open(path, 'w', encoding='utf-8') as fh:
+                fh.write('user,lesson\n1,2\n')
+            with self.assertRaisesMessage(CommandError, 'user_id and lesson_id'):
+                call_command('complete_lessons', path, stdout=io.StringIO())
+
+
+class BadgeAwardTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.algebra, cls.biology = (LearningTopic.objects.create(title=title) for title in ('Algebra', 'Biology'))
+        cls.quiz, _ = build_quiz(Module.objects.create(course=Course.objects.create(
+            topic=cls.algebra, title='Course', description=''), title='Module', order=1), 1)
+        cls.badges = {
+            name: Badge.objects.create(name=name, description='', rule=rule, threshold=threshold, topic=topic)
+            for name, rule, threshold, topic in [
+                ('algebra lessons', Badge.RULE_LESSONS, 2, cls.algebra),
+                ('any lessons', Badge.RULE_LESSONS, 3, None),
+                ('quizzes', Badge.RULE_QUIZZES_PASSED, 1, None),
+                ('streak', Badge.RULE_QUIZ_STREAK, 2, None),
+                ('xp', Badge.RULE_XP, 100, None),
+            ]
+        }
+        Badge.objects.create(name='by hand', description='')
+
+    def setUp(self):
+        self.profile = User.objects.create_user(username='earner').profile
+
+    def earned(self):
+        return sorted(UserBadge.objects.filter(user_profile=self.profile).values_list('badge__name', flat=True))
+
+    def set_topic_stats(self, topic, **counters):
+        UserTopicStats.objects.update_or_create(user_profile=self.profile, topic=topic, defaults=counters)
+
+    def test_each_rule_awards_once_at_its_threshold(self):
+        self.set_topic_stats(self.algebra, lessons_completed=1)
+        self.set_topic_stats(self.biology, lessons_completed=1)
+        self.assertEqual(badges.evaluate(badges.EVENT_LESSON_COMPLETED, [self.profile.pk]), 0)
+
+        self.set_topic_stats(self.biology, lessons_completed=2)  # 3 in all, but not 2 in algebra
+        self.assertEqual(badges.evaluate(badges.EVENT_LESSON_COMPLETED, [self.profile.pk]), 1)
+        self.set_topic_stats(self.algebra, lessons_completed=2, quizzes_passed=1)
+        self.assertEqual(badges.evaluate(badges.EVENT_LESSON_COMPLETED, [self.profile.pk]), 1)
+        self.assertEqual(badges.evaluate(badges.EVENT_QUIZ_PASSED, [self.profile.pk]), 1)
+        for passed in (True, True):
+            badges.record_quiz_result(self.profile.pk, passed)
+        UserProfile.objects.filter(pk=self.profile.pk).update(xp=100)
+        self.assertEqual(badges.evaluate(badges.EVENT_QUIZ_PASSED, [self.profile.pk]), 1)
+        self.assertEqual(badges.evaluate(badges.EVENT_XP_CHANGED, [self.profile.pk]), 1)
+
+        for event in badges.RULES_BY_EVENT:
+            self.assertEqual(badges.evaluate(event, [self.profile.pk]), 0)
+        self.assertEqual(badges.evaluate_all([self.profile.pk]), 0)
+        self.assertEqual(self.earned(), ['algebra lessons', 'any lessons', 'quizzes', 'streak', 'xp'])
+
+    def test_events_only_check_their_own_rules_and_topics(self):
+        self.set_topic_stats(self.algebra, lessons_completed=5, quizzes_passed=5)
+        UserProfile.objects.filter(pk=self.profile.pk).update(xp=500)
+        badges.evaluate(badges.EVENT_LESSON_COMPLETED, [self.profile.pk], topic_ids=[self.biology.pk])
+        self.assertEqual(self.earned(), ['any lessons'])
+        self.assertEqual(badges.evaluate_all([self.profile.pk]), 3)
+
+    def test_racing_evaluations_award_once(self):
+        UserProfile.objects.filter(pk=self.profile.pk).update(xp=100)
+        badges.evaluate(badges.EVENT_XP_CHANGED, [self.profile.pk])
+        # A concurrent evaluation read the earned badges before this one was committed
+        with mock.patch.object(UserBadge.objects, 'filter', return_value=UserBadge.objects.none()):
+            badges.evaluate(badges.EVENT_XP_CHANGED, [self.profile.pk])
+        self.assertEqual(self.earned(), ['xp'])
+
+    def test_rebuilt_streaks_match_the_incremental_ones(self):
+        other = User.objects.create_user(username='other').profile
+        histories = {self.profile.pk: [True, True, False, True, True, True, False],
+                     other.pk: [False, True, True, True]}
+        for user_profile_id, results in histories.items():
+            for passed in results:
+                QuizAttempt.objects.create(user_profile_id=user_profile_id, quiz=self.quiz, passed=passed,
+                                           is_complete=True)
+                badges.record_quiz_result(user_profile_id, passed)
+            QuizAttempt.objects.create(user_profile_id=user_profile_id, quiz=self.quiz, passed=True)  # unfinished
+        streaks = QuizStreak.objects.filter(pk__in=histories).order_by('pk')
+        incremental = list(streaks.values_list('pk', 'current', 'best'))
+        self.assertEqual(incremental, [(self.profile.pk, 0, 3), (other.pk, 3, 3)])
+        badges.rebuild_streaks(list(histories))
+        self.assertEqual(list(streaks.values_list('pk', 'current', 'best')), incremental)
+
+
+class LeaderboardTests(TestCase):
+    def setUp(self):
+        # xp 50, 30, 30, 30, 10: ranks 1, 2, 2, 2, 5
+        self.profiles = {}
+        for name, xp in (('ann', 50), ('bob', 30), ('cat', 30), ('dan', 30), ('eve', 10)):
+            self.profiles[name] = User.objects.create_user(username=name, email=f'{name}@example.com').profile
+            self.set_xp(self.profiles[name], xp)
+
+    def set_xp(self, profile, xp):
+        with transaction.atomic():
+            leaderboard.move(profile.xp, xp)
+            profile.xp = xp
+            profile.save(update_fields=['xp'])
+
+    def buckets(self):
+        return dict(LeaderboardBucket.objects.exclude(count=0).values_list('xp', 'count'))
+
+    def names(self, entries):
+        return [(entry['rank'], entry['username']) for entry in entries]
+
+    def test_buckets_follow_xp_moves_and_profile_changes(self):
+        self.assertEqual(self.buckets(), {50: 1, 30: 3, 10: 1})
+        self.set_xp(self.profiles['eve'], 30)
+        self.set_xp(self.profiles['bob'], 30)  # no move
+        User.objects.create_user(username='new')
+        self.profiles['ann'].user.delete()
+        self.assertEqual(self.buckets(), {30: 4, 0: 1})
+        expected = self.buckets()
+        leaderboard.rebuild()
+        self.assertEqual(self.buckets(), expected)
+
+    def test_rank_for_xp_counts_profiles_strictly_above(self):
+        self.assertEqual([leaderboard.rank_for_xp(xp) for xp in (60, 50, 40, 30, 10, 0)], [1, 1, 2, 2, 5, 6])
+
+    def test_ties_share_a_rank_and_are_ordered_by_id(self):
+        entries = leaderboard.top(10)
+        self.assertEqual(self.names(entries), [(1, 'ann'), (2, 'bob'), (2, 'cat'), (2, 'dan'), (5, 'eve')])
+        self.assertEqual(set(entries[0]), {'rank', 'user_id', 'username', 'level', 'xp'})
+
+    def test_around_spans_tied_and_neighbouring_xp(self):
+        around = leaderboard.around(self.profiles['cat'], 2)
+        self.assertEqual(self.names([around['me']]), [(2, 'cat')])
+        self.assertEqual(self.names(around['above']), [(1, 'ann'), (2, 'bob')])
+        self.assertEqual(self.names(around['below']), [(2, 'dan'), (5, 'eve')])
+        edge = leaderboard.around(self.profiles['ann'], 1)
+        self.assertEqual((edge['above'], self.names(edge['below'])), ([], [(2, 'bob')]))
+
+    def test_pages_start_anywhere_including_inside_a_tie(self):
+        self.assertEqual(self.names(leaderboard.page(1, 2)), [(1, 'ann'), (2, 'bob')])
+        self.assertEqual(self.names(leaderboard.page(3, 2)), [(2, 'cat'), (2, 'dan')])
+        self.assertEqual(self.names(leaderboard.page(5, 2)), [(5, 'eve')])
+        self.assertEqual(leaderboard.page(6, 2), [])
+
+    def test_page_view_reports_the_next_start(self):
+        response = self.client.get('/api/leaderboard/page/', {'start': 4, 'size': 2}, secure=True)
+        self.assertEqual((response.json()['next_start'], len(response.json()['results'])), (6, 2))
+        response = self.client.get('/api/leaderboard/page/', {'start': 5, 'size': 2}, secure=True)
+        self.assertIsNone(response.json()['next_start'])
+        self.assertEqual(self.client.get('/api/leaderboard/page/', {'start': 0}, secure=True).status_code, 400)
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class ProgressTrackerTests(TestCase):
+    def test_rejected_token_is_served_anonymously(self):
+        leader = User.objects.create_user(username='leader', email='leader@example.com')
+        with mock.patch('api.firebase_auth.keyring') as keyring:
+            keyring.verify_id_token.side_effect = ValueError('Token expired')
+            response = self.client.get('/api/progress-tracker/', HTTP_AUTHORIZATION='Bearer expired', secure=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['my_badges'], [])
+        self.assertEqual(response.json()['leaderboard'],
+                         [{'rank': 1, 'user_id': leader.pk, 'username': 'leader', 'level': 1, 'xp': 0}])
+
+    def test_signed_in_user_reads_their_rollups(self):
+        today = date(2026, 3, 10)
+        user = User.objects.create_user(username='learner')
+        other = User.objects.create_user(username='other')
+        algebra, biology = (LearningTopic.objects.create(title=title) for title in ('Algebra', 'Biology'))
+        for profile, day, topic, xp in [
+            (user.profile, today, algebra, 20), (user.profile, today, biology, 10),
+            (user.profile, date(2026, 3, 8), algebra, 5), (user.profile, date(2026, 2, 15), algebra, 7),
+            (user.profile, date(2025, 10, 5), algebra, 3), (user.profile, date(2025, 9, 30), algebra, 100),
+            (other.profile, today, algebra, 1000),
+        ]:
+            DailyUserStats.objects.create(user_profile=profile, day=day, topic=topic, xp_earned=xp)
+        UserTopicStats.objects.create(user_profile=user.profile, topic=algebra, quiz_score_total=150,
+                                      quizzes_taken=2, lessons_completed=3)
+        UserTopicStats.objects.create(user_profile=user.profile, topic=biology, lessons_completed=1)
+        badge = Badge.objects.create(name='First steps', description='')
+        UserBadge.objects.create(user_profile=user.profile, badge=badge)
+
+        request = APIRequestFactory().get('/api/progress-tracker/')
+        # leaderboard (3), the profile, badges, daily and topic rollups
+        with signed_in(User.objects.get(pk=user.pk)), self.assertNumQueries(7), \
+                mock.patch('api.progress_stats.timezone', localdate=mock.Mock(return_value=today)):
+            response = views.progress_tracker_data(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([badge['badge']['name'] for badge in response.data['my_badges']], ['First steps'])
+        self.assertEqual(response.data['topic_performance'], [
+            {'topic': 'Algebra', 'performance': 75, 'quizzes_taken': 2, 'lessons_completed': 3},
+            {'topic': 'Biology', 'performance': None, 'quizzes_taken': 0, 'lessons_completed': 1},
+        ])
+        self.assertEqual(response.data['weekly_graph'], {
+            'labels': ['Wed', 'Thu', 'Fri', 'Sat', 'Sun', 'Mon', 'Tue'], 'data': [0, 0, 0, 0, 5, 0, 30]})
+        self.assertEqual(response.data['monthly_graph'], {
+            'labels': ['Oct', 'Nov', 'Dec', 'Jan', 'Feb', 'Mar'], 'data': [3, 0, 0, 0, 7, 35]})
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class CatalogCacheTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.course = Course.objects.create(topic=LearningTopic.objects.create(title='Topic'), title='Course',
+                                            description='')
+        self.module = Module.objects.create(course=self.course, title='Module', description='', order=1)
+        self.lesson = Lesson.objects.create(module=self.module, title='Lesson', order=1, content_type='text',
+                                            text_content='Body')
+
+    def get(self, path='/api/courses/', **headers):
+        return self.client.get(path, secure=True, headers=headers)
+
+    def test_matching_if_none_match_is_not_modified(self):
+        etag = self.get()['ETag']
+        with self.assertNumQueries(0):
+            for tag in (etag, f'W/{etag}', f'"other", {etag}', '*'):
+                response = self.get(**{'If-None-Match': tag})
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response['ETag'], etag)
+        self.assertEqual(self.get(**{'If-None-Match': '"other"'}).status_code, 200)
+
+    def test_repeat_request_is_served_from_the_body_cache(self):
+        first = self.get(f'/api/courses/{self.course.pk}/')
+        with self.assertNumQueries(0), \
+                mock.patch.object(views.CourseDetailView, 'serialize', side_effect=AssertionError('rendered')):
+            second = self.get(f'/api/courses/{self.course.pk}/')
+        self.assertEqual((second.status_code, second.content), (200, first.content))
+        self.assertEqual(second['ETag'], first['ETag'])
+        self.assertNotEqual(self.get(f'/api/courses/{self.course.pk}/?fields=id')['ETag'], first['ETag'])
+
+    def test_content_saves_bump_the_version_on_commit(self):
+        for instance in (self.course, self.module, self.lesson):
+            with self.subTest(model=type(instance).__name__):
+                before = catalog_cache.current_version()
+                etag = self.get()['ETag']
+                with self.captureOnCommitCallbacks(execute=True):
+                    instance.title = f'{instance.title}!'
+                    instance.save()
+                    # Not before the transaction commits, so no one caches the old content under a new version
+                    self.assertEqual(catalog_cache.current_version(), before)
+                self.assertNotEqual(catalog_cache.current_version(), before)
+                self.assertEqual(self.get(**{'If-None-Match': etag}).status_code, 200)
+
+
+class SparseFieldsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        topic = LearningTopic.objects.create(title='Topic')
+        cls.course = Course.objects.create(topic=topic, title='Course', description='About it')
+        cls.module = Module.objects.create(course=cls.course, title='Module', description='', order=1)
+        Lesson.objects.create(module=cls.module, title='Lesson', order=1, content_type='text', text_content='Body')
+        cls.quiz, _ = build_quiz(cls.module, 1, choices=2)
+        question = cls.quiz.questions.get()
+        cls.attempt = QuizAttempt.objects.create(user_profile=User.objects.create_user(username='taker').profile,
+                                                 quiz=cls.quiz, score=100, passed=True, is_complete=True)
+        cls.choice = question.choices.get(is_correct=True)
+        Answer.objects.create(quiz_attempt=cls.attempt, question=question, selected_choice=cls.choice, is_correct=True)
+
+    def context(self, **query):
+        return {'request': Request(APIRequestFactory().get('/', query))}
+
+    def never_built(self, *serializer_classes):
+        """ Fails if any of the serializers is instantiated (nested fields are copied by re-instantiating). """
+        patches = contextlib.ExitStack()
+        for serializer_class in serializer_classes:
+            patches.enter_context(mock.patch.object(serializer_class, '__init__',
+                                                    side_effect=AssertionError(f'{serializer_class.__name__} built')))
+        return patches
+
+    def test_field_paths_are_parsed_into_a_tree(self):
+        self.assertEqual(parse_field_paths('id, title,modules.title,modules.lessons.id,,topic.'),
+                         {'id': None, 'title': None, 'topic': None,
+                          'modules': {'title': None, 'lessons': {'id': None}}})
+        self.assertEqual(parse_field_paths('modules,modules.title'), {'modules': None})
+
+    def test_unrequested_nested_serializers_are_never_built(self):
+        courses = Course.objects.all()
+        with self.never_built(ModuleSerializer, LearningTopicSerializer), self.assertNumQueries(1):
+            data = CourseSerializer(courses, many=True, context=self.context(fields='id,title')).data
+        self.assertEqual(data, [{'id': self.course.pk, 'title': 'Course'}])
+
+    def test_nested_fields_are_narrowed_at_every_depth(self):
+        context = self.context(fields='title,modules.title')
+        with self.never_built(LessonSerializer):
+            data = CourseSerializer(self.course, context=context).data
+        self.assertEqual(data, {'title': 'Course', 'modules': [{'title': 'Module'}]})
+        data = CourseSerializer(self.course, context=self.context(fields='modules.lessons.title')).data
+        self.assertEqual(data, {'modules': [{'lessons': [{'title': 'Lesson'}]}]})
+
+    def test_unknown_field_names_are_ignored(self):
+        context = self.context(fields='id,nope,modules.nope,topic.title.deeper')
+        data = CourseSerializer(self.course, context=context).data
+        self.assertEqual(data, {'id': self.course.pk, 'topic': {'title': 'Topic'}, 'modules': [{}]})
+        self.assertEqual(CourseSerializer(self.course, context=self.context(fields='nope')).data, {})
+
+    def test_expand_nests_only_the_named_relations(self):
+        self.assertEqual(QuizSerializer(self.quiz, context=self.context()).data['module'], self.module.pk)
+        expanded = QuizSerializer(self.quiz, context=self.context(expand='module,questions,nope')).data
+        self.assertEqual(expanded['module'], {'id': self.module.pk, 'title': 'Module', 'order': 1,
+                                              'lessons': [{'id': self.module.lessons.get().pk, 'title': 'Lesson',
+                                                           'order': 1, 'content_type': 'text'}]})
+
+        attempt = QuizAttemptSerializer(self.attempt, context=self.context(
+            fields='quiz.title,answers.selected_choice', expand='quiz,answers.selected_choice')).data
+        self.assertEqual(attempt, {'quiz': {'title': self.quiz.title},
+                                   'answers': [{'selected_choice': {'id': self.choice.pk, 'text': self.choice.text,
+                                                                    'is_correct': True}}]})
+
+    def test_unrequested_expansion_is_not_built(self):
+        with self.never_built(ModuleOutlineSerializer, QuestionSerializer):
+            data = QuizSerializer(self.quiz, context=self.context(fields='id', expand='module')).data
+        self.assertEqual(data, {'id': self.quiz.pk})
+
+    def test_writes_use_every_field(self):
+        serializer = UserProgressSerializer(data={'lesson_id': self.module.lessons.get().pk},
+                                            context=self.context(fields='id'))
+        self.assertEqual(set(serializer.fields), {'id', 'user_profile', 'lesson_id', 'completed_at'})
+
+
+class FastSerializerContractTests(TestCase):
+    """ fast_serializers must render byte-identical JSON to the DRF serializers it replaces. """
+    COURSE_FIELDS = ['id,title', 'topic', 'topic.title,modules.title', 'modules.lessons.title,modules.order',
+                     'id,modules.lessons', 'description,modules.id']
+    QUIZ_FIELDS = ['id,title', 'module,questions.text', 'questions.choices', 'questions.choices.text,questions.id']
+
+    @classmethod
+    def setUpTestData(cls):
+        topic = LearningTopic.objects.create(title='Topic', description='About it')
+        for c in range(2):
+            course = Course.objects.create(topic=topic, title=f'Course {c}', description=f'Course {c} "quoted" é')
+            for m in reversed(range(3)):  # created out of order, so ordering is what decides
+                module = Module.objects.create(course=course, title=f'Module {m}', description='', order=m)
+                for n in reversed(range(m + 1)):
+                    Lesson.objects.create(module=module, title=f'Lesson {n}', order=n, xp_value=5 * n,
+                                          content_type='video' if n % 2 else 'text',
+                                          text_content=None if n % 2 else 'Body',
+                                          youtube_video_id='abc' if n % 2 else None)
+        Course.objects.create(topic=topic, title='Empty course', description='')
+        cls.quiz, _ = build_quiz(Module.objects.first(), 3)
+
+    def request(self, **query):
+        return Request(APIRequestFactory().get('/', query))
+
+    def assertSameJSON(self, fast, drf):
+        self.assertEqual(JSONRenderer().render(fast).decode(), JSONRenderer().render(drf).decode())
+
+    def assertCoursesMatch(self, outline, fields=None):
+        request = self.request(**({'fields': fields} if fields else {}))
+        serializer_class = CourseOutlineSerializer if outline else CourseSerializer
+        drf = serializer_class(Course.objects.order_by('id'), many=True, context={'request': request}).data
+        rows = fast_serializers.course_values(outline, requested_fields(request)).order_by('id')
+        self.assertSameJSON(fast_serializers.serialize_courses(rows, outline, requested_fields(request)), drf)
+
+    def test_courses(self):
+        for outline in (False, True):
+            with self.subTest(outline=outline):
+                self.assertCoursesMatch(outline)
+            for fields in self.COURSE_FIELDS:
+                with self.subTest(outline=outline, fields=fields):
+                    self.assertCoursesMatch(outline, fields)
+
+    def test_quiz(self):
+        for fields in [None, *self.QUIZ_FIELDS]:
+            with self.subTest(fields=fields):
+                request = self.request(**({'fields': fields} if fields else {}))
+                drf = QuizSerializer(self.quiz, context={'request': request}).data
+                self.assertSameJSON(fast_serializers.serialize_quiz(self.quiz.pk, requested_fields(request)), drf)
+
+
+@override_settings(REQUEST_METRICS_SLOW_MS=10 ** 6)
+class RequestMetricsMiddlewareTests(TransactionTestCase):
+    def query_count(self, response):
+        return int(re.search(r'desc="(\d+) queries"', response['Server-Timing']).group(1))
+
+    def test_sync(self):
+        def view(request):
+            User.objects.count()
+            return HttpResponse()
+
+        middleware = RequestMetricsMiddleware(view)
+        self.assertFalse(iscoroutinefunction(middleware))
+        self.assertEqual(self.query_count(middleware(RequestFactory().get('/'))), 1)
+
+    def test_async_counts_the_thread_sensitive_queries(self):
+        async def view(request):
+            await sync_to_async(User.objects.count)()
+            await sync_to_async(User.objects.exists)()
+            await sync_to_async(User.objects.count, thread_sensitive=False)()  # another thread's connection
+            return HttpResponse()
+
+        async def serve(request):
+            async with ThreadSensitiveContext():  # as ASGIHandler does per request
+                return await middleware(request)
+
+        middleware = RequestMetricsMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        self.assertEqual(self.query_count(async_to_sync(serve)(RequestFactory().get('/'))), 2)
+
+
+# --- Query plans ---
+
+class PlanProblemsTests(SimpleTestCase):
+    def test_sqlite_plans(self):
+        self.assertEqual(query_plans.plan_problems('3 0 0 SCAN api_userprofile USING INDEX userprofile_xp_rank_idx',
+                                                   'sqlite'), [])
+        self.assertEqual(query_plans.plan_problems('3 0 0 SEARCH api_userbadge USING INDEX x (user_profile_id=?)\n'
+                                                   '9 0 0 SCAN api_badge', 'sqlite'), [])
+        self.assertEqual(query_plans.plan_problems('2 0 0 SCAN api_xpevent\n6 0 0 USE TEMP B-TREE FOR ORDER BY',
+                                                   'sqlite'), ['full scan of api_xpevent', 'sort'])
+
+    def test_postgresql_plans(self):
+        indexed = ('Limit  (cost=0.29..0.87 rows=10 width=24)\n'
+                   '  ->  Index Scan using userprofile_xp_rank_idx on api_userprofile  (cost=0.29..1153.29 rows=20000)')
+        self.assertEqual(query_plans.plan_problems(indexed, 'postgresql'), [])
+        scanned = ('Limit  (cost=1395.29..1395.31 rows=10 width=24)\n'
+                   '  ->  Sort  (cost=1395.29..1445.29 rows=20000 width=24)\n'
+                   '        Sort Key: xp DESC, id\n'
+                   '        ->  Seq Scan on api_userprofile  (cost=0.00..963.00 rows=20000 width=24)')
+        self.assertEqual(query_plans.plan_problems(scanned, 'postgresql'), ['full scan of api_userprofile', 'sort'])
+
+
+class QueryPlanTests(TestCase):
+    """
+    EXPLAINs each hot query (query_plans.py) against a seeded dataset:
+    settings.QUERY_PLAN_PROFILES users with tens of rows each.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.sample = None
+        if connection.vendor in ('sqlite', 'postgresql'):
+            cls.sample = query_plans.seed(getattr(settings, 'QUERY_PLAN_PROFILES', 1000))
+
+    def assertPlansUseIndexes(self):
+        results = query_plans.run_checks(self.sample)
+        self.assertEqual(len(results), 12)
+        for name, plan, problems in results:
+            with self.subTest(query=name):
+                self.assertEqual(problems, [], f"{name}:\n{plan}")
+
+    @skipUnless(connection.vendor == 'sqlite', "SQLite plans")
+    def test_sqlite_plans_use_indexes(self):
+        self.assertPlansUseIndexes()
+
+    @skipUnless(connection.vendor == 'postgresql', "PostgreSQL plans")
+    def test_postgresql_plans_use_indexes(self):
+        self.assertPlansUseIndexes()
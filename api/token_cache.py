@@ -0,0 +1,116 @@
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+
+class VerifiedTokenCache:
+    """
+    Process-local LRU cache of verified Firebase ID tokens.
+
+    Maps a SHA-256 digest of the raw ID token to the Django User it resolved
+    to, so repeat requests carrying the same token skip the signature check,
+    the identity resolution and the user query. Each hit returns its own copy
+    of the cached User, so requests never share a model instance. The profile
+    is not cached (XP and level change without saving the User) and loads on
+    first access. Saving or deleting a User drops its entries in this process;
+    entries never outlive the token's own `exp` claim, and are additionally
+    capped at `max_ttl` seconds so changes made in other processes propagate.
+    """
+
+    def __init__(self, max_size=1024, max_ttl=300):
+        self.max_size = max_size
+        self.max_ttl = max_ttl
+        self._entries = OrderedDict()  # token digest -> (user, expires_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(id_token):
+        return hashlib.sha256(id_token.encode('utf-8')).hexdigest()
+
+    def get(self, id_token):
+        """ Returns a copy of the cached User for this token, or None on miss/expiry. """
+        key = self._key(id_token)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            user, expires_at = entry
+            if expires_at <= now:
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return copy.copy(user)
+
+    def set(self, id_token, user, token_exp=None):
+        """ Caches the resolved User (without its related objects) until min(token exp, now + max_ttl). """
+        now = time.time()
+        expires_at = now + self.max_ttl
+        if token_exp is not None:
+            expires_at = min(expires_at, float(token_exp))
+        if expires_at <= now:
+            return
+        snapshot = copy.copy(user)
+        snapshot._state.fields_cache = {}
+        key = self._key(id_token)
+        with self._lock:
+            self._entries[key] = (snapshot, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    # --- Revocation hooks ---
+
+    def revoke_token(self, id_token):
+        with self._lock:
+            self._entries.pop(self._key(id_token), None)
+
+    def revoke_user(self, user_id):
+        """ Drops every cached token that resolved to the given user. """
+        with self._lock:
+            stale = [key for key, (user, _) in self._entries.items() if user.pk == user_id]
+            for key in stale:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+token_cache = VerifiedTokenCache(
+    max_size=getattr(settings, 'FIREBASE_TOKEN_CACHE_SIZE', 1024),
+    max_ttl=getattr(settings, 'FIREBASE_TOKEN_CACHE_MAX_TTL', 300),
+)
+
+
+# --- Invalidation on user changes ---
+# Drop cached tokens when an account changes (e.g. is deactivated) or is deleted.
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def revoke_cached_tokens_for_user(sender, instance, **kwargs):
+    token_cache.revoke_user(instance.pk)
@@ -1,5 +1,10 @@
+from django.conf import settings
 from django.urls import path
 from . import views # Import views from the current directory
+from . import async_views
+
+# Gemini-backed endpoints: async versions when served over ASGI (see settings.ASYNC_AI_VIEWS)
+ai_views = async_views if settings.ASYNC_AI_VIEWS else views
 
 # Define the application namespace
 app_name = 'api'
@@ -11,32 +16,45 @@ urlpatterns = [
     # Course URLs
     path('courses/', views.CourseListView.as_view(), name='course-list'),
     path('courses/<int:pk>/', views.CourseDetailView.as_view(), name='course-detail'),
+    path('lessons/<int:pk>/', views.LessonDetailView.as_view(), name='lesson-detail'),
 
     # Progress Tracker URL
     path('progress-tracker/', views.progress_tracker_data, name='progress-tracker'),
 
+    # Leaderboard URLs
+    path('leaderboard/top/', views.leaderboard_top, name='leaderboard-top'),
+    path('leaderboard/page/', views.leaderboard_page, name='leaderboard-page'),
+    path('leaderboard/me/', views.leaderboard_me, name='leaderboard-me'),
+
     # Mark Lesson Complete URL
     path('lessons/<int:lesson_id>/complete/', views.mark_lesson_complete, name='lesson-complete'),
+    path('lessons/complete/bulk/', views.bulk_complete_lessons, name='lesson-complete-bulk'),
 
     # Summarization Tool URL
-    path('tools/summarize/', views.summarize_media, name='summarize-media'),
+    path('tools/summarize/', ai_views.summarize_media, name='summarize-media'),
+    path('tools/summarize/jobs/<uuid:job_id>/', views.summarize_job_status, name='summarize-job-status'),
 
     # Case Study Tool URL
-    path('tools/generate-case-study/', views.generate_case_study, name='generate-case-study'),
+    path('tools/generate-case-study/', ai_views.generate_case_study, name='generate-case-study'),
 
     # Quiz URLs
     path('quizzes/<int:pk>/', views.QuizDetailView.as_view(), name='quiz-detail'),
     path('quizzes/submit/', views.submit_quiz, name='quiz-submit'),
 
     # Chatbot URL
-    path('chatbot/message/', views.chatbot_interaction, name='chatbot-message'),
+    path('chatbot/message/', ai_views.chatbot_interaction, name='chatbot-message'),
+    path('chatbot/sessions/', views.ChatSessionListView.as_view(), name='chat-session-list'),
+    path('chatbot/sessions/<uuid:pk>/', views.ChatSessionDetailView.as_view(), name='chat-session-detail'),
 
     # Assignment Checker URL (New)
-    path('assignment-checker/', views.assignment_checker, name='assignment-checker'),
+    path('assignment-checker/', ai_views.assignment_checker, name='assignment-checker'),
 
     # Profile Management URL (New)
     path('profile/', views.UserProfileView.as_view(), name='user-profile'),
 
+    # Request metrics (per-view aggregates of this worker)
+    path('metrics/views/', views.request_metrics_views, name='request-metrics-views'),
+
     # TODO: Add URLs for other features:
     # - Personalized recommendations
     # - Progress tracking (e.g., /progress/, /progress/<lesson_id>/complete/)
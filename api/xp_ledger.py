@@ -0,0 +1,134 @@
+"""
+Append-only XP ledger.
+
+Awards are inserted as XPEvent rows, unique on (profile, source type, source
+id). A retried request therefore cannot award twice, and concurrent awards
+never read-modify-write UserProfile.xp. UserProfile.xp and level are a cached
+fold of the ledger, recomputed by fold_xp():
+
+- incrementally, once the awarding transaction commits;
+- for a batch of profiles by fold_profiles() (bulk lesson completion);
+- in bulk by `manage.py fold_xp` (periodically, or to repair a failed fold).
+
+fold_xp() sums the user's events while holding the profile row lock. The
+last fold to run therefore sees every committed event, and no award is lost
+however awards and folds interleave.
+"""
+import bisect
+import logging
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, PositiveIntegerField, Sum, Value, When
+
+from . import badges, leaderboard
+from .models import UserProfile, XPEvent
+
+logger = logging.getLogger(__name__)
+
+# XP needed to reach level 1, 2, 3, ...
+LEVEL_THRESHOLDS = (0, 100, 250, 500, 1000, 1750, 2750, 4000, 5500, 7500, 10000)
+
+
+def level_for_xp(xp):
+    return max(1, bisect.bisect_right(LEVEL_THRESHOLDS, xp))
+
+
+def award_xp(user_profile_id, source_type, source_id, amount):
+    """
+    Records an award and folds it into the profile once the current
+    transaction commits. Returns False if this source already awarded XP.
+    """
+    try:
+        with transaction.atomic():
+            XPEvent.objects.create(user_profile_id=user_profile_id, source_type=source_type,
+                                   source_id=source_id, amount=amount)
+    except IntegrityError:
+        return False
+    transaction.on_commit(lambda: _fold_quietly(user_profile_id))
+    return True
+
+
+def _fold_quietly(user_profile_id):
+    # The award is committed either way; a failed fold is repaired by the next one
+    try:
+        fold_xp(user_profile_id)
+    except Exception as e:
+        logger.error(f"XP fold failed for profile {user_profile_id}: {e}")
+
+
+def fold_xp(user_profile_id):
+    """ Recomputes the profile's xp and level from its ledger. Returns (xp, level). """
+    with transaction.atomic():
+        profile = UserProfile.objects.select_for_update().only('id', 'xp', 'level').get(pk=user_profile_id)
+        xp = XPEvent.objects.filter(user_profile_id=user_profile_id).aggregate(total=Sum('amount'))['total'] or 0
+        xp = max(xp, 0)
+        level = level_for_xp(xp)
+        if (profile.xp, profile.level) != (xp, level):
+            UserProfile.objects.filter(pk=user_profile_id).update(xp=xp, level=level)
+            leaderboard.move(profile.xp, xp)
+            badges.evaluate(badges.EVENT_XP_CHANGED, [user_profile_id])
+    return xp, level
+
+
+def _changed(profiles, totals):
+    """ (id, old xp, new xp, new level) for (id, xp, level) rows whose fold differs. """
+    changed = []
+    for profile_id, xp, level in profiles:
+        new_xp = max(totals.get(profile_id) or 0, 0)
+        new_level = level_for_xp(new_xp)
+        if (xp, level) != (new_xp, new_level):
+            changed.append((profile_id, xp, new_xp, new_level))
+    return changed
+
+
+def _write_folds(changed, batch_size):
+    # A row is only written if it still holds the xp the fold was computed from
+    for start in range(0, len(changed), batch_size):
+        batch = changed[start:start + batch_size]
+        UserProfile.objects.filter(pk__in=[row[0] for row in batch]).update(
+            xp=Case(*[When(pk=pk, xp=old_xp, then=Value(new_xp)) for pk, old_xp, new_xp, _ in batch],
+                    default=F('xp'), output_field=PositiveIntegerField()),
+            level=Case(*[When(pk=pk, xp=old_xp, then=Value(new_level)) for pk, old_xp, _, new_level in batch],
+                       default=F('level'), output_field=PositiveIntegerField()),
+        )
+
+
+def fold_profiles(user_profile_ids, batch_size=500):
+    """
+    fold_xp() for many profiles in one transaction: the row locks (in id
+    order), one grouped SUM, one CASE/WHEN UPDATE per batch and one
+    leaderboard bucket shift. Returns the number of profiles changed.
+    """
+    with transaction.atomic():
+        profiles = list(UserProfile.objects.select_for_update().filter(pk__in=user_profile_ids)
+                        .order_by('id').values_list('id', 'xp', 'level'))
+        totals = dict(XPEvent.objects.filter(user_profile_id__in=user_profile_ids)
+                      .values_list('user_profile_id').annotate(total=Sum('amount')).order_by())
+        changed = _changed(profiles, totals)
+        _write_folds(changed, batch_size)
+        moves = Counter()
+        for _, old_xp, new_xp, _ in changed:
+            moves[old_xp] -= 1
+            moves[new_xp] += 1
+        leaderboard.shift(moves)
+        badges.evaluate(badges.EVENT_XP_CHANGED, [row[0] for row in changed])
+    return len(changed)
+
+
+def fold_all(batch_size=500):
+    """
+    Folds every profile: one grouped SUM, then one CASE/WHEN UPDATE per batch
+    of changed profiles. A row is only written if it still holds the value
+    read here, so this never overwrites a newer incremental fold. Leaderboard
+    buckets are then recounted and XP badges checked for the changed
+    profiles. Returns the number of out-of-date profiles found.
+    """
+    totals = dict(XPEvent.objects.values_list('user_profile_id').annotate(total=Sum('amount')))
+    changed = _changed(UserProfile.objects.values_list('id', 'xp', 'level').iterator(), totals)
+    _write_folds(changed, batch_size)
+    if changed:
+        leaderboard.rebuild()
+    for start in range(0, len(changed), batch_size):
+        badges.evaluate(badges.EVENT_XP_CHANGED, [row[0] for row in changed[start:start + batch_size]])
+    return len(changed)
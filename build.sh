@@ -11,4 +11,8 @@ python manage.py collectstatic --no-input --clear
 
 # Apply database migrations
 echo "🔄 Running migrations..."
-python manage.py migrate
\ No newline at end of file
+python manage.py migrate
+
+# Create the database cache table used for cross-worker coordination
+echo "🗄️ Creating cache tables..."
+python manage.py createcachetable
\ No newline at end of file
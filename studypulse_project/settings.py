@@ -57,6 +57,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.request_metrics.RequestMetricsMiddleware',  # First, so it times everything below it
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # Add this after security middleware
@@ -93,15 +94,57 @@ WSGI_APPLICATION = 'studypulse_project.wsgi.application'
 # https://docs.djangoproject.com/en/4.0/ref/settings/#databases
 
 # Database Configuration
+# SSL is required for DATABASE_URL (Postgres); the local SQLite fallback
+# (also used by `manage.py test`) takes no sslmode option.
 DATABASES = {
     'default': dj_database_url.config(
         default='sqlite:///db.sqlite3',
         conn_max_age=600,
         conn_health_checks=True,
-        ssl_require=True
+        ssl_require=bool(os.getenv('DATABASE_URL'))
     )
 }
 
+# Cache Configuration
+# 'ai_responses' holds generated AI responses (see api/response_cache.py). The
+# default in-memory cache is per process and evicts least recently used
+# entries beyond MAX_ENTRIES; point AI_RESPONSE_CACHE_BACKEND/LOCATION at a
+# shared backend (e.g. django.core.cache.backends.redis.RedisCache) to share
+# it between workers.
+# 'catalog' holds pre-rendered course catalog responses (see api/catalog_cache.py)
+# under the current content version; per process by default, likewise.
+AI_RESPONSE_CACHE_BACKEND = os.getenv('AI_RESPONSE_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache')
+CATALOG_CACHE_BACKEND = os.getenv('CATALOG_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache')
+COORDINATION_CACHE_BACKEND = os.getenv('COORDINATION_CACHE_BACKEND', 'django.core.cache.backends.db.DatabaseCache')
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'ai_responses': {
+        'BACKEND': AI_RESPONSE_CACHE_BACKEND,
+        'LOCATION': os.getenv('AI_RESPONSE_CACHE_LOCATION', 'ai-responses'),
+    },
+    'catalog': {
+        'BACKEND': CATALOG_CACHE_BACKEND,
+        'LOCATION': os.getenv('CATALOG_CACHE_LOCATION', 'catalog'),
+    },
+    'coordination': {
+        # Cross-worker state (admission slots, in-flight request locks, compiled quiz answer keys, the
+        # catalog content version); must be shared by all workers. Create the table with
+        # `manage.py createcachetable`.
+        'BACKEND': COORDINATION_CACHE_BACKEND,
+        'LOCATION': os.getenv('COORDINATION_CACHE_LOCATION', 'api_coordination_cache'),
+    },
+}
+if 'redis' not in AI_RESPONSE_CACHE_BACKEND:
+    # Redis evicts by its own maxmemory-policy (use allkeys-lru)
+    CACHES['ai_responses']['OPTIONS'] = {'MAX_ENTRIES': int(os.getenv('AI_RESPONSE_CACHE_MAX_ENTRIES', '1000'))}
+if 'redis' not in CATALOG_CACHE_BACKEND:
+    CACHES['catalog']['OPTIONS'] = {'MAX_ENTRIES': int(os.getenv('CATALOG_CACHE_MAX_ENTRIES', '200'))}
+if 'redis' not in COORDINATION_CACHE_BACKEND:
+    # Entries are short-lived; keep culling from ever dropping a live one
+    CACHES['coordination']['OPTIONS'] = {'MAX_ENTRIES': 100000}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.0/ref/settings/#auth-password-validators
@@ -177,3 +220,77 @@ CSRF_TRUSTED_ORIGINS = [
     "https://*.studypulse.vercel.app",
     "https://*.railway.app"
 ]
+
+# Firebase Authentication
+# Verified ID tokens are cached per process (keyed by token hash) so repeat
+# requests skip signature verification and the user lookup.
+FIREBASE_TOKEN_CACHE_SIZE = int(os.getenv('FIREBASE_TOKEN_CACHE_SIZE', '1024'))
+FIREBASE_TOKEN_CACHE_MAX_TTL = int(os.getenv('FIREBASE_TOKEN_CACHE_MAX_TTL', '300'))  # seconds
+
+# ID tokens are verified locally against a keyring loaded when the web server
+# starts (asgi.py/wsgi.py) and refreshed in the background. FIREBASE_CERTS_SOURCE may be an http(s) URL, a
+# file:// URL or a path to a {kid: PEM} JSON file (useful for local testing).
+FIREBASE_LOCAL_TOKEN_VERIFICATION = os.getenv('FIREBASE_LOCAL_TOKEN_VERIFICATION', 'True') == 'True'
+FIREBASE_PROJECT_ID = os.getenv('FIREBASE_PROJECT_ID')
+FIREBASE_CERTS_SOURCE = os.getenv(
+    'FIREBASE_CERTS_SOURCE',
+    'https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com',
+)
+FIREBASE_KEY_REFRESH_MARGIN = int(os.getenv('FIREBASE_KEY_REFRESH_MARGIN', '300'))  # seconds before max-age expiry
+
+# Google Gemini (api/llm.py configures the SDK once per process with this key)
+GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
+
+# Serve the Gemini-backed endpoints with the async views in api/async_views.py.
+# Enable only when running under an ASGI server (see Procfile); under WSGI the
+# sync DRF views are used.
+ASYNC_AI_VIEWS = os.getenv('ASYNC_AI_VIEWS', 'False') == 'True'
+
+# Media summarization jobs (summarize_media with mode=job)
+# In-process worker threads per web process; 0 leaves jobs to `manage.py run_summary_jobs`.
+SUMMARY_JOB_THREADS = int(os.getenv('SUMMARY_JOB_THREADS', '2'))
+SUMMARY_JOB_STALE_AFTER = int(os.getenv('SUMMARY_JOB_STALE_AFTER', '3600'))  # seconds without progress
+SUMMARY_JOB_SWEEP_INTERVAL = int(os.getenv('SUMMARY_JOB_SWEEP_INTERVAL', '60'))  # seconds between recovery sweeps
+# Adaptive polling while Google processes an upload
+SUMMARY_POLL_INITIAL_DELAY = 2.0
+SUMMARY_POLL_BACKOFF_FACTOR = 1.5
+SUMMARY_POLL_MAX_DELAY = 30.0
+SUMMARY_PROCESSING_TIMEOUT = int(os.getenv('SUMMARY_PROCESSING_TIMEOUT', '1800'))  # seconds
+# Deduplication of repeat uploads (keyed on content SHA-256, model and normalized prompt)
+SUMMARY_CACHE_TTL = int(os.getenv('SUMMARY_CACHE_TTL', str(30 * 24 * 3600)))  # seconds
+SUMMARY_CACHE_MAX_ENTRIES = int(os.getenv('SUMMARY_CACHE_MAX_ENTRIES', '5000'))
+
+# Server-side chatbot sessions: older turns are rolled up into a summary once
+# the context exceeds this many (estimated) tokens.
+CHAT_CONTEXT_TOKEN_BUDGET = int(os.getenv('CHAT_CONTEXT_TOKEN_BUDGET', '4000'))
+CHAT_MIN_RECENT_MESSAGES = 4  # always sent verbatim
+
+# Case study response cache (api/response_cache.py)
+CASE_STUDY_CACHE_TTL = int(os.getenv('CASE_STUDY_CACHE_TTL', str(7 * 24 * 3600)))  # seconds
+
+# Admission control for the Gemini-backed endpoints (api/admission.py).
+# Sync workers stay blocked while a request runs or waits in the queue, so
+# under WSGI in-flight + queued must stay well below WEB_CONCURRENCY for the
+# other endpoints to remain responsive; under ASGI waiting costs nothing.
+AI_ADMISSION_ENABLED = os.getenv('AI_ADMISSION_ENABLED', 'True') == 'True'
+AI_MAX_CONCURRENT_CALLS = int(os.getenv('AI_MAX_CONCURRENT_CALLS', '16' if ASYNC_AI_VIEWS else '2'))
+AI_MAX_CONCURRENT_PER_USER = int(os.getenv('AI_MAX_CONCURRENT_PER_USER', '2' if ASYNC_AI_VIEWS else '1'))
+AI_ADMISSION_QUEUE_SIZE = int(os.getenv('AI_ADMISSION_QUEUE_SIZE', '32' if ASYNC_AI_VIEWS else '1'))
+AI_ADMISSION_QUEUE_TIMEOUT = float(os.getenv('AI_ADMISSION_QUEUE_TIMEOUT', '10'))  # seconds
+# Slots are leases so a crashed worker cannot hold one forever; must exceed the longest AI request
+AI_ADMISSION_LEASE = int(os.getenv('AI_ADMISSION_LEASE', '2400'))  # seconds
+
+# Coalescing of identical concurrent case study / assignment check requests (api/singleflight.py)
+SINGLEFLIGHT_WAIT_TIMEOUT = 200  # seconds a duplicate waits for the leader before generating itself
+SINGLEFLIGHT_RESULT_TTL = 30  # seconds a finished result is shared with other workers
+
+# Bulk lesson completion (api/lesson_completion.py)
+BULK_COMPLETION_MAX_ITEMS = int(os.getenv('BULK_COMPLETION_MAX_ITEMS', '5000'))  # items per API request
+
+# Per-request SQL/timing metrics and slow-request log (api/request_metrics.py)
+REQUEST_METRICS_ENABLED = os.getenv('REQUEST_METRICS_ENABLED', 'True') == 'True'
+REQUEST_METRICS_SERVER_TIMING = os.getenv('REQUEST_METRICS_SERVER_TIMING', 'True') == 'True'
+REQUEST_METRICS_SLOW_MS = int(os.getenv('REQUEST_METRICS_SLOW_MS', '500'))
+REQUEST_METRICS_SQL_SAMPLE_RATE = float(os.getenv('REQUEST_METRICS_SQL_SAMPLE_RATE', '0.1'))  # requests keeping statements
+REQUEST_METRICS_TOP_STATEMENTS = int(os.getenv('REQUEST_METRICS_TOP_STATEMENTS', '5'))  # slowest statements logged
+REQUEST_METRICS_WINDOW = int(os.getenv('REQUEST_METRICS_WINDOW', '300'))  # seconds per per-view aggregate window
@@ -13,4 +13,14 @@ from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'studypulse_project.settings')
 
-application = get_wsgi_application() 
\ No newline at end of file
+application = get_wsgi_application()
+
+# Load the Firebase signing keys before serving, so no request waits on a download (see api/firebase_keys.py)
+from api.firebase_keys import start_keyring  # noqa: E402
+
+start_keyring()
+
+# Pick up summary jobs a restart left pending or half-run (see api/summary_jobs.py)
+from api.summary_jobs import start_sweeper  # noqa: E402
+
+start_sweeper() 
\ No newline at end of file